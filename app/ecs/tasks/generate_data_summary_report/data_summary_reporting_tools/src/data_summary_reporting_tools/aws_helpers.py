@@ -1,21 +1,86 @@
 # Imports
 import typing
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional, Any
 
 import pandas as pd
 import boto3
 import json
+from botocore.config import Config
 
 if typing.TYPE_CHECKING:
     from mypy_boto3_dynamodb import DynamoDBClient
+    from mypy_boto3_s3 import S3Client
 
 
 from .globals import (
     DYNAMODB_TABLE_NAME,
-    DYNAMODB_INDEX_NAME
+    DYNAMODB_INDEX_NAME,
+    PACKAGE_MANIFEST_BUCKET_NAME,
+    PACKAGE_MANIFEST_PREFIX,
 )
+from .content_codec import decode_content
+
+# Mirrors the shared client config in the data sharing tools layer (data_sharing_tools.utils.aws_helpers)
+BOTO3_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={
+        "mode": "adaptive",
+        "max_attempts": 10,
+    }
+)
+
+
+@lru_cache(maxsize=None)
+def get_boto3_client(service_name: str) -> Any:
+    """
+    Clients are created once per service and reused for the lifetime of the task
+    :param service_name:
+    :return:
+    """
+    return boto3.client(service_name, config=BOTO3_CLIENT_CONFIG)
+
 
 def get_dynamodb_client() -> "DynamoDBClient":
-    return boto3.client('dynamodb')
+    return get_boto3_client('dynamodb')
+
+
+def get_s3_client() -> "S3Client":
+    return get_boto3_client('s3')
+
+
+def get_package_manifest_df(
+        job_id: str,
+        context: str
+) -> Optional[pd.DataFrame]:
+    """
+    Read the package manifest snapshot for this job / context if one exists
+    :param job_id:
+    :param context:
+    :return:
+    """
+    if PACKAGE_MANIFEST_BUCKET_NAME is None or PACKAGE_MANIFEST_PREFIX is None:
+        return None
+
+    s3_client = get_s3_client()
+    try:
+        manifest_obj = s3_client.get_object(
+            Bucket=PACKAGE_MANIFEST_BUCKET_NAME,
+            Key=f"{PACKAGE_MANIFEST_PREFIX}{job_id}/{context}.parquet"
+        )
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+    manifest_df = pd.read_parquet(
+        BytesIO(manifest_obj['Body'].read()),
+        columns=["content"]
+    )
+
+    return pd.DataFrame(list(map(
+        json.loads,
+        manifest_df["content"].tolist()
+    )))
 
 
 def get_dynamodb_query_response(
@@ -24,7 +89,7 @@ def get_dynamodb_query_response(
 ) -> pd.DataFrame:
     """
         "TableName": "{% $dynamoDbTableName %}",
-        "IndexName": "content-index",
+        "IndexName": "content_attributes-index",
         "KeyConditionExpression": "#context = :context",
         "ExpressionAttributeNames": {
           "#context": "context"
@@ -71,7 +136,7 @@ def get_dynamodb_query_response(
             break
 
     return pd.DataFrame(list(map(
-        lambda items_iter_: json.loads(items_iter_['content']['S']),
+        lambda items_iter_: decode_content(items_iter_['content']),
         items_list
     )))
 
@@ -89,6 +154,14 @@ def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
     :return:
     """
 
+    # Prefer the manifest snapshot, fall back to the content index
+    manifest_df = get_package_manifest_df(
+        job_id,
+        context
+    )
+    if manifest_df is not None:
+        return manifest_df
+
     # If not library, we grab the metadata anyway since we merge it on the other data types.
     return get_dynamodb_query_response(
         job_id,
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+Encoding of the 'content' attribute of the packaging lookup table.
+
+By default content is stored as a plain json string attribute ({"S": "..."}).
+
+File objects carry a lot of repetitive data (bucket names, key prefixes, eTags, storage classes ...),
+so we optionally store the content as a binary attribute ({"B": b"..."}) holding compressed json.
+
+The binary payload is laid out as
+
+  <schema version: 1 byte> <codec: 1 byte> <compressed compact json>
+
+Readers should always go through decode_content, which handles both the string and binary forms.
+
+This module only depends on the standard library, and is shipped as is in both
+the data sharing tools layer (data_sharing_tools/utils/content_codec.py)
+and the report image (data_summary_reporting_tools/content_codec.py).
+The two copies must stay identical, test/content-codec.test.ts fails if they differ.
+"""
+
+# Standard imports
+import json
+import gzip
+from typing import Any, Dict, Literal, Union
+
+# zstd is part of the standard library from python 3.14 onwards
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+# Globals
+ContentEncodingType = Literal[
+    "json",
+    "gzip",
+    "zstd",
+]
+
+CONTENT_SCHEMA_VERSION = 1
+
+CONTENT_CODEC_ID_BY_ENCODING: Dict[ContentEncodingType, int] = {
+    "gzip": 1,
+    "zstd": 2,
+}
+
+CONTENT_ENCODING_BY_CODEC_ID: Dict[int, ContentEncodingType] = {
+    value: key for key, value in CONTENT_CODEC_ID_BY_ENCODING.items()
+}
+
+# Default compression levels, the read path is bound by item size rather than decompression time
+GZIP_COMPRESS_LEVEL = 6
+ZSTD_COMPRESS_LEVEL = 3
+
+
+def _compress(data: bytes, encoding: ContentEncodingType) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_COMPRESS_LEVEL, mtime=0)
+    if encoding == "zstd":
+        if zstd is None:
+            raise ValueError("zstd content encoding requires python 3.14 or later")
+        return zstd.compress(data, level=ZSTD_COMPRESS_LEVEL)
+    raise ValueError(f"Unknown content encoding '{encoding}'")
+
+
+def _decompress(data: bytes, encoding: ContentEncodingType) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "zstd":
+        if zstd is None:
+            raise ValueError("zstd content encoding requires python 3.14 or later")
+        return zstd.decompress(data)
+    raise ValueError(f"Unknown content encoding '{encoding}'")
+
+
+def encode_content(
+        content: Any,
+        encoding: ContentEncodingType = "json"
+) -> Dict[str, Union[str, bytes]]:
+    """
+    Encode an object as a dynamodb attribute value
+    :param content:
+    :param encoding:
+    :return:
+    """
+    content_str = json.dumps(content, separators=(',', ':'))
+
+    if encoding == "json":
+        return {
+            "S": content_str
+        }
+
+    return {
+        "B": (
+            bytes([CONTENT_SCHEMA_VERSION, CONTENT_CODEC_ID_BY_ENCODING[encoding]]) +
+            _compress(content_str.encode(), encoding)
+        )
+    }
+
+
+def decode_content(attribute_value: Dict[str, Union[str, bytes]]) -> Any:
+    """
+    Decode a dynamodb attribute value written by encode_content (or a plain json string attribute)
+    :param attribute_value:
+    :return:
+    """
+    if "S" in attribute_value:
+        return json.loads(attribute_value["S"])
+
+    if "B" not in attribute_value:
+        raise ValueError(f"Cannot decode content attribute with types {list(attribute_value.keys())}")
+
+    payload = bytes(attribute_value["B"])
+    schema_version, codec_id = payload[0], payload[1]
+
+    if schema_version != CONTENT_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported content schema version {schema_version}")
+    if codec_id not in CONTENT_ENCODING_BY_CODEC_ID:
+        raise ValueError(f"Unknown content codec id {codec_id}")
+
+    return json.loads(_decompress(payload[2:], CONTENT_ENCODING_BY_CODEC_ID[codec_id]))
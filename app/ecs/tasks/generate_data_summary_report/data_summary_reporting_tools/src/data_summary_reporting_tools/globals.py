@@ -6,4 +6,8 @@ from os import environ
 SECTION_LEVEL = 2
 
 DYNAMODB_TABLE_NAME = environ['DYNAMODB_TABLE_NAME']
-DYNAMODB_INDEX_NAME = environ['DYNAMODB_INDEX_NAME']  # "content"
+DYNAMODB_INDEX_NAME = environ['DYNAMODB_INDEX_NAME']  # "content_attributes"
+
+# Package manifest snapshot, written at the end of the 'Get Data' step of the packaging sfn
+PACKAGE_MANIFEST_BUCKET_NAME = environ.get('PACKAGE_MANIFEST_BUCKET_NAME', None)
+PACKAGE_MANIFEST_PREFIX = environ.get('PACKAGE_MANIFEST_PREFIX', None)  # "manifests/"
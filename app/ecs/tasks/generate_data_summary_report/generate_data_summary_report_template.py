@@ -41,7 +41,7 @@ if __name__ == "__main__":
 #     environ['AWS_PROFILE'] = 'umccr-development'
 #     environ['AWS_REGION'] = 'ap-southeast-2'
 #     environ['DYNAMODB_TABLE_NAME'] = "DataSharingPackagingLookupTable"
-#     environ['DYNAMODB_INDEX_NAME'] = 'content'
+#     environ['DYNAMODB_INDEX_NAME'] = 'content_attributes'
 #     environ['PACKAGE_NAME'] = "test-package"
 #     environ['JOB_ID'] = "pkg.01K0R65TY55FX9QF36FVSKC9AX"
 #     environ['OUTPUT_URI'] = 's3://data-sharing-artifacts-843407916570-ap-southeast-2/packages/year=2025/month=07/day=22/pkg.01K0R65TY55FX9QF36FVSKC9AX/final/SummaryReport.test-package.html'
@@ -35,7 +35,8 @@ api/v1/package/{package_id}:presign
 # This is also a post request
 # This endpoint requires a body with the following format:
 {
-    "pushLocation": "s3://my-bucket/my-key"
+    "shareDestination": "s3://my-bucket/my-key",
+    "deltaPush": false  # Optional, only push the files that are missing or have changed at the destination
 }
 api/v1/package/{package_id}:push
 """
@@ -393,6 +394,7 @@ async def start_data_push(package_id: str = Depends(sanitise_pkg_orcabus_id), pu
                 "startTime": datetime.now(timezone.utc),
                 "packageId": package_data.id,
                 "shareDestination": push_location.shareDestination,
+                "deltaPush": push_location.deltaPush,
             }
         ).model_dump()
     ))
@@ -405,7 +407,8 @@ async def start_data_push(package_id: str = Depends(sanitise_pkg_orcabus_id), pu
             "packagingJobId": package_data.id,
             "packageName": package_data.package_name,
             "packagingS3SharingPrefix": package_data.package_s3_sharing_prefix,
-            "destinationUri": push_location.shareDestination
+            "destinationUri": push_location.shareDestination,
+            "deltaPush": push_location.deltaPush,
         }
     )
 
@@ -3,7 +3,7 @@ import json
 import typing
 from os import environ
 
-import boto3
+from data_sharing_tools import get_boto3_client
 
 from ..globals import (
     EVENT_BUS_NAME_ENV_VAR,
@@ -19,7 +19,7 @@ def get_event_client() -> 'EventBridgeClient':
     """
     Get the event client for AWS EventBridge.
     """
-    return boto3.client('events')
+    return get_boto3_client('events')
 
 
 def put_event(event_detail_type, event_detail):
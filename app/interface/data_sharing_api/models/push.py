@@ -31,6 +31,7 @@ class PushJobBase(BaseModel):
     start_time: datetime
     package_id: str
     share_destination: str
+    delta_push: Optional[bool] = False
 
 
 class PushJobOrcabusId(BaseModel):
@@ -56,6 +57,7 @@ class PushJobResponseDict(TypedDict):
     startTime: datetime
     packageId: str
     shareDestination: str
+    deltaPush: bool
     logUri: str
     endTime: Optional[datetime]
     errorMessage: Optional[str]
@@ -97,6 +99,8 @@ class PushJobPatch(BaseModel):
 
 class PushLocationBody(BaseModel):
     shareDestination: str
+    # Only push the files that are missing or have changed at the destination (s3 destinations only)
+    deltaPush: Optional[bool] = False
 
 
 class PushJobData(PushJobWithId, Dyntastic):
@@ -7,7 +7,6 @@ from os import environ
 from urllib.parse import urlunparse
 
 import ulid
-import boto3
 import typing
 from datetime import datetime
 
@@ -16,6 +15,8 @@ from pydantic.alias_generators import (
     to_camel as pydantic_to_camel
 )
 
+from data_sharing_tools import get_boto3_client
+
 from .globals import (
     ORCABUS_ULID_REGEX_MATCH, PACKAGE_CONTEXT_PREFIX, PUSH_JOB_CONTEXT_PREFIX
 )
@@ -62,7 +63,7 @@ async def sanitise_status(status: JobStatusType) -> str:
 
 
 def get_aws_lambda_client() -> 'LambdaClient':
-    return boto3.client('lambda')
+    return get_boto3_client('lambda')
 
 
 def run_lambda_function(function_name: str, payload: str) -> str:
@@ -115,11 +116,11 @@ def to_camel(s: str) -> str:
 
 # AWS Things
 def get_sfn_client() -> 'SFNClient':
-    return boto3.client('stepfunctions')
+    return get_boto3_client('stepfunctions')
 
 
 def get_ssm_client() -> 'SSMClient':
-    return boto3.client('ssm')
+    return get_boto3_client('ssm')
 
 
 def get_packaging_endpoint_url() -> str:
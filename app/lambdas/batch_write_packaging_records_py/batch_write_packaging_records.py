@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Batch write packaging records
+
+Given a list of records (library, fastq, workflow or file objects),
+write them to the packaging lookup table with BatchWriteItem.
+
+Replaces the per-item dynamodb:putItem states in the packaging state machine,
+so a single task can write thousands of records.
+"""
+
+# Layer imports
+from data_sharing_tools.utils.dynamodb_write_helpers import batch_write_packaging_records
+
+
+def handler(event, context):
+    """
+    Given the following inputs:
+      * packagingJobId
+      * recordList: A list of objects with the following keys
+        * context: One of 'library', 'fastq', 'workflow', 'file'
+        * id: The id of the record
+        * content: The record object itself
+
+    Write all records to the packaging lookup table and return the throughput statistics
+    :param event:
+    :param context:
+    :return:
+    """
+    packaging_job_id = event.get("packagingJobId")
+    record_list = event.get("recordList", [])
+
+    if not packaging_job_id:
+        raise ValueError("packagingJobId is required")
+
+    return {
+        "batchWriteResult": batch_write_packaging_records(
+            job_id=packaging_job_id,
+            record_list=record_list
+        )
+    }
+
+
+# if __name__ == "__main__":
+#     import json
+#     from os import environ
+#
+#     environ['AWS_PROFILE'] = 'umccr-production'
+#     environ['PACKAGING_TABLE_NAME'] = 'data-sharing-packaging-lookup-table'
+#
+#     print(json.dumps(
+#         handler(
+#             {
+#                 "packagingJobId": "pkg.01JQYYBM52ZDYZ5MFMX7C22QHS",
+#                 "recordList": [
+#                     {
+#                         "context": "library",
+#                         "id": "lib.01JBMVJ2EPCW8W051H82JF4MTX",
+#                         "content": {
+#                             "orcabusId": "lib.01JBMVJ2EPCW8W051H82JF4MTX",
+#                             "libraryId": "L2301517"
+#                         }
+#                     }
+#                 ]
+#             },
+#             None
+#         ),
+#         indent=4
+#     ))
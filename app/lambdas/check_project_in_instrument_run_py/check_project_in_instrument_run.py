@@ -1,31 +1,94 @@
+#!/usr/bin/env python3
 
+"""
+Check if any of the requested projects are found in an instrument run.
+
+The project ids of a run are resolved with one metadata lookup per library, run concurrently.
+Lookups stop as soon as a requested project is found,
+otherwise the complete set of project ids of the run is cached for subsequent checks
+(keyed on the libraries of the run, so a newly linked library is always looked up).
+"""
+
+# Standard imports
+from contextlib import closing
+from typing import List, Set
+
+# Layer imports
 from orcabus_api_tools.sequence import get_libraries_from_instrument_run_id
 from orcabus_api_tools.metadata import get_library_from_library_id
 
-def get_all_project_ids_in_an_instrument_run(instrument_run_id):
+from data_sharing_tools import (
+    iter_concurrently,
+    get_cached_instrument_run_project_ids,
+    put_cached_instrument_run_project_ids,
+)
+
+
+def get_project_ids_in_library(library_id: str) -> List[str]:
+    return list(map(
+        lambda project_iter_: project_iter_["projectId"],
+        get_library_from_library_id(library_id)["projectSet"]
+    ))
+
+
+def get_all_project_ids_in_an_instrument_run(instrument_run_id: str) -> List[str]:
     """
     Retrieve all unique project IDs associated with all the libraries in a given instrument run.
     """
-    lib_ids = get_libraries_from_instrument_run_id(instrument_run_id)
+    library_id_list = list(get_libraries_from_instrument_run_id(instrument_run_id))
+
+    cached_project_ids = get_cached_instrument_run_project_ids(instrument_run_id, library_id_list)
+    if cached_project_ids is not None:
+        return cached_project_ids
 
     project_ids = set()
-    for lib_id in lib_ids:
-        library = get_library_from_library_id(lib_id)
-        for project in library["projectSet"]:
-            project_ids.add(project["projectId"])
+    for _, project_id_list_iter_ in iter_concurrently(
+            get_project_ids_in_library,
+            library_id_list
+    ):
+        project_ids.update(project_id_list_iter_)
+
+    put_cached_instrument_run_project_ids(instrument_run_id, library_id_list, project_ids)
 
     return list(project_ids)
 
-def handler(event, context):
+
+def is_any_project_in_instrument_run(instrument_run_id: str, project_id_list: List[str]) -> bool:
     """
-    Check if any requested projects are found in the specified instrument run.
+    Check if any of the projects are in the instrument run,
+    returning as soon as a library of one of the projects is found
     """
-    project_ids_in_job = event["projectIdList"]
-    project_ids_in_run = get_all_project_ids_in_an_instrument_run(event["instrumentRunId"])
+    requested_project_ids: Set[str] = set(project_id_list)
+
+    library_id_list = list(get_libraries_from_instrument_run_id(instrument_run_id))
+
+    cached_project_ids = get_cached_instrument_run_project_ids(instrument_run_id, library_id_list)
+    if cached_project_ids is not None:
+        return not requested_project_ids.isdisjoint(cached_project_ids)
+
+    project_ids = set()
+    with closing(iter_concurrently(
+            get_project_ids_in_library,
+            library_id_list
+    )) as project_id_list_iter:
+        for _, project_id_list_iter_ in project_id_list_iter:
+            if not requested_project_ids.isdisjoint(project_id_list_iter_):
+                # Not every library has been looked up, so there is nothing to cache
+                return True
+            project_ids.update(project_id_list_iter_)
+
+    put_cached_instrument_run_project_ids(instrument_run_id, library_id_list, project_ids)
 
-    project_ids_in_run_filtered = set(project_ids_in_job).intersection(project_ids_in_run)
-    project_found = len(project_ids_in_run_filtered) > 0
+    return False
 
+
+def handler(event, context):
+    """
+    Check if any requested projects are found in the specified instrument run.
+    """
     return {
-        "project_found": project_found
+        "project_found": is_any_project_in_instrument_run(
+            event["instrumentRunId"],
+            event["projectIdList"]
+        )
     }
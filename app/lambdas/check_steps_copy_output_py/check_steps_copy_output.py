@@ -30,15 +30,17 @@ L2300950_S11_L002_R2_001.fastq.ora,COPIED,79.82039818880112,,s3://umccr-test-des
 import pandas as pd
 import typing
 from typing import Dict, Union, Optional
-import boto3
 from tempfile import NamedTemporaryFile
 
+# Layer imports
+from data_sharing_tools.utils.aws_helpers import get_boto3_client
+
 if typing.TYPE_CHECKING:
     from mypy_boto3_s3 import S3Client
 
 
 def get_s3_client() -> 'S3Client':
-    return boto3.client('s3')
+    return get_boto3_client('s3')
 
 
 def handler(event, context) -> Dict[str, Union[bool, Optional[str]]]:
@@ -1,17 +1,6 @@
 #!/usr/bin/env python
-import typing
 
-import pandas as pd
-from urllib.parse import urlparse
-import boto3
-
-
-if typing.TYPE_CHECKING:
-    from mypy_boto3_s3 import S3Client
-
-
-def get_s3_client() -> 'S3Client':
-    return boto3.client("s3")
+from data_sharing_tools.utils.steps_copy_manifest_helpers import upload_steps_copy_csv_manifest
 
 
 def handler(event, context):
@@ -31,20 +20,9 @@ def handler(event, context):
     if not source_uris_list or not s3_steps_copy_bucket or not s3_steps_copy_key:
         raise ValueError("Missing required parameters: sourceUrisList, s3StepsCopyBucket, s3StepsCopyKey")
 
-    # Generate dataframe
-    s3_steps_copy_df = pd.DataFrame(
-        list(map(
-            lambda source_uri_iter_: {
-                "bucket": urlparse(source_uri_iter_).netloc,
-                "key": urlparse(source_uri_iter_).path.lstrip("/")
-            },
-            source_uris_list
-        ))
-    )
-
-    # Upload to s3
-    get_s3_client().put_object(
-        Bucket=s3_steps_copy_bucket,
-        Key=s3_steps_copy_key,
-        Body=s3_steps_copy_df.to_csv(index=False, header=False).encode("utf-8"),
+    # Stream the bucket,key rows to s3
+    upload_steps_copy_csv_manifest(
+        source_uris_list,
+        bucket=s3_steps_copy_bucket,
+        key=s3_steps_copy_key,
     )
@@ -5,6 +5,10 @@ SFN LAMBDA FUNCTION PLACEHOLDER: __create_script_from_presigned_urls_list_lambda
 
 Given a list of presigned url objects, generate a script that downloads the files from the urls.
 
+The script is streamed to s3 through a multipart upload,
+we first make a (light) pass over the file objects to build the script header (file count, total size, tree),
+then stream the download lines page by page, so memory does not grow with the presigned urls of the package.
+
 METADATA TO ADD TO EACH FILE:
 - library ids
 - primaryAnalysisType
@@ -12,27 +16,27 @@ METADATA TO ADD TO EACH FILE:
 - portalRunId
 """
 
-import typing
-import boto3
-from pathlib import Path
 from textwrap import dedent
-from typing import List, Dict, Tuple
-from directory_tree import DisplayTree
-from tempfile import TemporaryDirectory
+from typing import List, Dict, Tuple, Iterable, Iterator
 from humanfriendly import format_size
 from urllib.parse import urlparse
 
 from data_sharing_tools import (
     FileObjectWithPresignedUrlTypeDef,
-    get_file_objects_with_presigned_urls
+    iter_dynamodb_table,
+    iter_file_objects_with_presigned_urls,
+    upload_str_iter_to_s3,
+    render_tree,
 )
 
-if typing.TYPE_CHECKING:
-    from mypy_boto3_s3 import S3Client
-
-
-def get_s3_client() -> "S3Client":
-    return boto3.client('s3')
+# Globals
+# We only need the relative path and size of each file alongside its presigned url
+FILE_OBJECT_PROJECTION = ["relativePath", "size"]
+# Summarise the tree of very large packages
+TREE_ROOT_NAME = "<DOWNLOAD_PATH>"
+TREE_SUMMARY_FILE_COUNT_THRESHOLD = 10000
+TREE_SUMMARY_MAX_DEPTH = 4
+TREE_SUMMARY_MAX_ENTRIES_PER_DIRECTORY = 100
 
 
 def get_bucket_key_tuple_from_s3_uri(s3_uri: str) -> Tuple[str, str]:
@@ -40,12 +44,12 @@ def get_bucket_key_tuple_from_s3_uri(s3_uri: str) -> Tuple[str, str]:
     return s3_obj.netloc, s3_obj.path.lstrip('/')
 
 
-def upload_file(file_contents: str, s3_uri: str):
+def upload_file(file_contents_iter: Iterable[str], s3_uri: str):
     bucket, key = get_bucket_key_tuple_from_s3_uri(s3_uri)
-    get_s3_client().put_object(
-        Bucket=bucket,
-        Key=key,
-        Body=file_contents,
+    upload_str_iter_to_s3(
+        file_contents_iter,
+        bucket=bucket,
+        key=key,
     )
 
 
@@ -82,6 +86,8 @@ def get_script_template(
     Usage: download-data.sh (--download-path local/download_path/)
                             [--dryrun]
                             [--decompress-ora]
+                            [--parallel N]
+                            [--verify-etag]
                             [--print-tree]
                             [-h | --help]
 
@@ -92,6 +98,12 @@ def get_script_template(
       --decompress-ora   If set, the script will decompress .ora files.
                          orad binrary must be installed and ORADATA_PATH must be set to a valid directory containing the 'refbin' binary.
                          For help on installing orad, see https://sapac.support.illumina.com/sequencing/sequencing_software/DRAGENORA/software-downloads.html
+      --parallel N       Download up to N files (or parts of large files) at once, defaults to 1 (one file at a time).
+                         Files over 1 GiB are split into 256 MiB ranged downloads that are written straight into place.
+                         Completed files and parts are recorded under <download-path>/.download-data-state/,
+                         so an interrupted run can be resumed by rerunning the script. Requires bash 4.3 or later.
+      --verify-etag      Once downloaded, also check the md5sum of each file against its ETag.
+                         Only applies to files downloaded with --parallel that were uploaded in a single part.
       --help             Print this help message and exits
 
     Environment Variables:
@@ -105,7 +117,213 @@ def get_script_template(
     "
     }
 
+    function get_state_path() {
+        : '
+        Completion markers live under the state directory, mirroring the download path
+        '
+        local file_path="$1"
+        echo "${state_dir}/${file_path#"${download_path}/"}"
+    }
+
+    function wait_for_worker_slot() {
+        : '
+        Block until fewer than --parallel downloads are running.
+        Failures are picked up by verify_downloads (a failed download never gets its completion marker)
+        '
+        while [[ "$(jobs -rp | wc -l)" -ge "${parallel}" ]]; do
+            wait -n || true
+        done
+    }
+
+    function download_whole_file() {
+        local file_url="$1"
+        local file_path="$2"
+        local state_path="$3"
+
+        if [[ "${decompress_ora}" == "true" ]] && [[ "${file_path}" == *.ora ]]; then
+            curl --silent --fail --retry 5 --url "${file_url}" | orad --quiet --ora-reference "${ORADATA_PATH}" --force --gz --out "${file_path%.ora}.gz" -
+            touch "${state_path}.done"
+        else
+            curl --silent --fail --retry 5 --create-dirs --continue-at - --etag-save "${state_path}.etag" --output "${file_path}" --url "${file_url}"
+            mv "${state_path}.etag" "${state_path}.done"
+        fi
+    }
+
+    function download_file_part() {
+        : '
+        Download a single range of a file straight into its offset of the partial file
+        '
+        local file_url="$1"
+        local partial_file_path="$2"
+        local state_path="$3"
+        local part_num="$4"
+        local file_size="$5"
+        local range_start="$(( part_num * ranged_download_part_size ))"
+        local range_end="$(( range_start + ranged_download_part_size - 1 ))"
+
+        if [[ -f "${state_path}.part.${part_num}.done" ]]; then
+            return
+        fi
+
+        if [[ "${range_end}" -ge "${file_size}" ]]; then
+            range_end="$(( file_size - 1 ))"
+        fi
+
+        curl --silent --fail --retry 5 --range "${range_start}-${range_end}" --etag-save "${state_path}.part.${part_num}.etag" --url "${file_url}" | dd of="${partial_file_path}" bs=1M seek="$(( range_start / 1048576 ))" conv=notrunc 2>/dev/null
+        mv "${state_path}.part.${part_num}.etag" "${state_path}.part.${part_num}.done"
+    }
+
+    function download_file_parallel() {
+        local file_url="$1"
+        local file_path="$2"
+        local file_size="$3"
+        local hf_file_size="$4"
+        local count_num="$5"
+        local state_path
+        local part_count
+        local part_num
+
+        state_path="$(get_state_path "${file_path}")"
+
+        # Check if the file has already been downloaded
+        if [[ -f "${state_path}.done" ]]; then
+            echo "File already downloaded: ${file_path}" 1>&2
+            return
+        fi
+        if [[ -f "${file_path}" ]] && [[ "$(stat --format %s "${file_path}")" -eq "${file_size}" ]]; then
+            echo "File already exists: ${file_path}" 1>&2
+            return
+        fi
+
+        mkdir -p "$(dirname "${file_path}")" "$(dirname "${state_path}")"
+
+        echo "Downloading ${file_size} bytes (${hf_file_size}) to '${file_path}', ${count_num} / __FILE_COUNT__" 1>&2
+
+        # Small files (and ora files we decompress on the fly) are downloaded whole
+        if [[ ( "${decompress_ora}" == "true" && "${file_path}" == *.ora ) || "${file_size}" -le "${ranged_download_min_size}" ]]; then
+            wait_for_worker_slot
+            download_whole_file "${file_url}" "${file_path}" "${state_path}" &
+            return
+        fi
+
+        # Large files are split into ranged downloads, the file is moved into place once all parts have completed
+        part_count="$(( (file_size + ranged_download_part_size - 1) / ranged_download_part_size ))"
+        for (( part_num = 0; part_num < part_count; part_num++ )); do
+            wait_for_worker_slot
+            download_file_part "${file_url}" "${file_path}.partial" "${state_path}" "${part_num}" "${file_size}" &
+        done
+        ranged_file_paths+=("${file_path}")
+        ranged_file_sizes+=("${file_size}")
+    }
+
+    function complete_ranged_download() {
+        local file_path="$1"
+        local file_size="$2"
+        local state_path
+        local part_count
+        local part_num
+
+        state_path="$(get_state_path "${file_path}")"
+        part_count="$(( (file_size + ranged_download_part_size - 1) / ranged_download_part_size ))"
+
+        for (( part_num = 0; part_num < part_count; part_num++ )); do
+            if [[ ! -f "${state_path}.part.${part_num}.done" ]]; then
+                echo "Error! Part ${part_num} of '${file_path}' did not complete" 1>&2
+                return
+            fi
+        done
+
+        mv "${file_path}.partial" "${file_path}"
+        # Every part holds the same ETag, keep the first as the completion marker
+        mv "${state_path}.part.0.done" "${state_path}.done"
+        rm -f "${state_path}".part.*.done
+    }
+
+    function wait_for_downloads() {
+        local index
+
+        wait || true
+
+        if [[ "${#ranged_file_paths[@]}" -gt 0 ]]; then
+            for index in "${!ranged_file_paths[@]}"; do
+                complete_ranged_download "${ranged_file_paths[${index}]}" "${ranged_file_sizes[${index}]}"
+            done
+        fi
+    }
+
+    function verify_downloads() {
+        : '
+        Check every file in the package is present and the right size (and optionally matches its ETag)
+        '
+        local index
+        local file_path
+        local file_size
+        local state_path
+        local etag
+        local failed_count=0
+
+        if [[ "${#expected_file_paths[@]}" -eq 0 ]]; then
+            return
+        fi
+
+        echo "Verifying ${#expected_file_paths[@]} files" 1>&2
+
+        for index in "${!expected_file_paths[@]}"; do
+            file_path="${expected_file_paths[${index}]}"
+            file_size="${expected_file_sizes[${index}]}"
+
+            # Decompressed ora files can only be checked for their existence
+            if [[ "${decompress_ora}" == "true" ]] && [[ "${file_path}" == *.ora ]]; then
+                if [[ ! -f "${file_path%.ora}.gz" ]]; then
+                    echo "Error! '${file_path%.ora}.gz' is missing" 1>&2
+                    failed_count="$(( failed_count + 1 ))"
+                fi
+                continue
+            fi
+
+            if [[ ! -f "${file_path}" ]] || [[ "$(stat --format %s "${file_path}")" -ne "${file_size}" ]]; then
+                echo "Error! '${file_path}' is missing or is not ${file_size} bytes" 1>&2
+                failed_count="$(( failed_count + 1 ))"
+                continue
+            fi
+
+            if [[ "${verify_etag}" == "true" ]]; then
+                state_path="$(get_state_path "${file_path}")"
+                etag=""
+                if [[ -f "${state_path}.done" ]]; then
+                    etag="$(tr -d '"[:space:]' < "${state_path}.done")"
+                fi
+                # Only single part uploads have the md5sum as their ETag
+                if [[ "${etag}" =~ ^[0-9a-f]{32}$ ]] && [[ "$(md5sum "${file_path}" | cut -d' ' -f1)" != "${etag}" ]]; then
+                    echo "Error! '${file_path}' does not match its ETag, removing it so it is downloaded again on the next run" 1>&2
+                    rm -f "${file_path}" "${state_path}.done"
+                    failed_count="$(( failed_count + 1 ))"
+                fi
+            fi
+        done
+
+        if [[ "${failed_count}" -gt 0 ]]; then
+            echo "Error! ${failed_count} files failed to download, rerun the script to resume" 1>&2
+            exit 1
+        fi
+    }
+
     function download_file() {
+        local file_path="$2"
+        local file_size="$3"
+
+        # Keep track of every file, for the final verification
+        expected_file_paths+=("${file_path}")
+        expected_file_sizes+=("${file_size}")
+
+        if [[ "${parallel}" -gt 1 ]] && [[ "${dryrun}" == "false" ]]; then
+            download_file_parallel "$@"
+        else
+            download_file_sequential "$@"
+        fi
+    }
+
+    function download_file_sequential() {
         local file_url="$1"
         local file_path="$2"
         local file_size="$3"
@@ -155,6 +373,15 @@ def get_script_template(
     download_path=""
     dryrun="false"
     decompress_ora="false"
+    parallel="1"
+    verify_etag="false"
+    # Files over 1 GiB are split into 256 MiB ranges (ranges must be a multiple of 1 MiB)
+    ranged_download_min_size="$(( 1024 * 1024 * 1024 ))"
+    ranged_download_part_size="$(( 256 * 1024 * 1024 ))"
+    expected_file_paths=()
+    expected_file_sizes=()
+    ranged_file_paths=()
+    ranged_file_sizes=()
 
     # Parse the arguments
     while [ $# -gt 0 ]; do
@@ -169,6 +396,13 @@ def get_script_template(
         --decompress-ora)
           decompress_ora="true"
           ;;
+        --parallel)
+          parallel="$2"
+          shift 1
+          ;;
+        --verify-etag)
+          verify_etag="true"
+          ;;
         -h | --help)
           print_help
           exit 0
@@ -208,8 +442,19 @@ def get_script_template(
         fi
     fi
 
+    # Check parallel is a positive integer, and that bash supports 'wait -n'
+    if [[ ! "${parallel}" =~ ^[1-9][0-9]*$ ]]; then
+        echo "Error! --parallel must be a positive integer, got '${parallel}'" 1>&2
+        exit 1
+    fi
+    if [[ "${parallel}" -gt 1 ]] && (( BASH_VERSINFO[0] < 4 || ( BASH_VERSINFO[0] == 4 && BASH_VERSINFO[1] < 3 ) )); then
+        echo "Warning! --parallel requires bash 4.3 or later, downloading one file at a time" 1>&2
+        parallel="1"
+    fi
+
     # Standardise the download path
     download_path="$(dirname "${download_path}")/$(basename "${download_path}")"
+    state_dir="${download_path}/.download-data-state"
 
     # Provide summary
     echo "Downloading __FILE_COUNT__ files to ${download_path}" 1>&2
@@ -227,73 +472,80 @@ def get_script_template(
     )
 
 
-def create_fake_directory(rel_path_list: List[Path]) -> Path:
-    root_path = Path(TemporaryDirectory(delete=False).name)
-
-    root_path = root_path / "<DOWNLOAD_PATH>"
-
-    for rel_path in rel_path_list:
-        # Create the directory
-        (root_path / rel_path).parent.mkdir(parents=True, exist_ok=True)
-        # Touch the file
-        (root_path / rel_path).touch()
+def get_script_footer() -> str:
+    """
+    Tail of the shell script, wait on any parallel downloads, then verify the whole tree
+    :return:
+    """
+    return dedent("""
+    wait_for_downloads
+    if [[ "${dryrun}" == "false" ]]; then
+        verify_downloads
+    fi
 
-    return root_path
+    echo 'Download complete' 1>&2
+    """)
 
 
-def generate_tree(rel_path_list: List[Path]):
+def generate_tree(rel_path_list: List[str]) -> str:
     """
-    Generate a tree of rel_path_list
+    Generate a tree of rel_path_list,
+    packages over TREE_SUMMARY_FILE_COUNT_THRESHOLD files get a summarised tree
     :param rel_path_list:
     :return:
     """
+    if len(rel_path_list) > TREE_SUMMARY_FILE_COUNT_THRESHOLD:
+        return render_tree(
+            rel_path_list,
+            root_name=TREE_ROOT_NAME,
+            max_depth=TREE_SUMMARY_MAX_DEPTH,
+            max_entries_per_directory=TREE_SUMMARY_MAX_ENTRIES_PER_DIRECTORY,
+        )
 
-    root_path = create_fake_directory(rel_path_list)
-
-    tree = DisplayTree(
-        root_path,
-        stringRep=True
+    return render_tree(
+        rel_path_list,
+        root_name=TREE_ROOT_NAME,
     )
 
-    return tree
-
-
-def get_download_file_template(download_url_dicts: List[Dict[str, str]]):
-    # Generate the truee
-    script_template = get_script_template(
-        file_count=len(download_url_dicts),
-        total_data_size=sum(map(
-            lambda download_url_dict_iter_: download_url_dict_iter_['fileSizeInBytes'],
-            download_url_dicts
-        )),
-        display_tree=generate_tree(
-            list(map(
-                lambda download_url_dict_iter_: Path(download_url_dict_iter_['relativePath']),
-                download_url_dicts
-            ))
-        )
+
+def get_download_file_line(download_url_dict: Dict[str, str], count_num: int) -> str:
+    return " ".join(
+        [
+            "download_file",
+            f"\"{download_url_dict['presignedUrl']}\"",
+            f"\"${{download_path}}/{download_url_dict['relativePath']}\"",
+            f"\"{download_url_dict['fileSizeInBytes']}\"",
+            f"\"{format_size(download_url_dict['fileSizeInBytes'], binary=True)}\"",
+            f"\"{count_num}\"",
+        ]
+    ) + "\n"
+
+
+def iter_download_file_template(
+        file_count: int,
+        total_data_size: int,
+        rel_path_list: List[str],
+        download_url_dicts: Iterable[Dict[str, str]]
+) -> Iterator[str]:
+    """
+    Stream the download script, the header followed by one download line per file
+    :param file_count:
+    :param total_data_size:
+    :param rel_path_list:
+    :param download_url_dicts:
+    :return:
+    """
+    yield get_script_template(
+        file_count=file_count,
+        total_data_size=total_data_size,
+        display_tree=generate_tree(rel_path_list)
     )
 
     # Extend the download script with the download commands
-    script_template += '\n'.join(
-        map(
-            lambda download_url_dict_iter_with_index_: " ".join(
-                [
-                    "download_file",
-                    f"\"{download_url_dict_iter_with_index_[1]['presignedUrl']}\"",
-                    f"\"${{download_path}}/{download_url_dict_iter_with_index_[1]['relativePath']}\"",
-                    f"\"{download_url_dict_iter_with_index_[1]['fileSizeInBytes']}\"",
-                    f"\"{format_size(download_url_dict_iter_with_index_[1]['fileSizeInBytes'], binary=True)}\"",
-                    f"\"{(download_url_dict_iter_with_index_[0] + 1)}\"",  # Enumerate
-                ]
-            ),
-            enumerate(download_url_dicts)
-        )
-    ) + "\n\n"
+    for index_iter_, download_url_dict_iter_ in enumerate(download_url_dicts):
+        yield get_download_file_line(download_url_dict_iter_, index_iter_ + 1)
 
-    script_template += "echo 'Download complete' 1>&2\n"
-
-    return script_template
+    yield get_script_footer()
 
 
 def handler(event, context):
@@ -306,25 +558,36 @@ def handler(event, context):
     packaging_job_id = event['packagingJobId']
     output_uri = event['outputUri']
 
-    # Get the presigned urls
-    all_file_objects: List[FileObjectWithPresignedUrlTypeDef] = get_file_objects_with_presigned_urls(
-        job_id=packaging_job_id
-    )
-
-    download_script = get_download_file_template(
-        list(map(
-            lambda file_object_iter_: {
-                "presignedUrl": file_object_iter_['presignedUrl'],
-                "relativePath": file_object_iter_['relativePath'],
-                "fileSizeInBytes": file_object_iter_['size'],
-            },
-            all_file_objects
-        ))
+    # First pass, collect the file count, total size and relative paths for the script header
+    file_count = 0
+    total_data_size = 0
+    rel_path_list: List[str] = []
+    for file_object_iter_ in iter_dynamodb_table(packaging_job_id, "file", projection=FILE_OBJECT_PROJECTION):
+        file_count += 1
+        total_data_size += file_object_iter_['size']
+        rel_path_list.append(file_object_iter_['relativePath'])
+
+    # Second pass, stream the presigned urls into the script
+    all_file_objects: Iterator[FileObjectWithPresignedUrlTypeDef] = iter_file_objects_with_presigned_urls(
+        job_id=packaging_job_id,
+        projection=FILE_OBJECT_PROJECTION
     )
 
     # Upload to s3 bucket
     upload_file(
-        file_contents=download_script,
+        file_contents_iter=iter_download_file_template(
+            file_count=file_count,
+            total_data_size=total_data_size,
+            rel_path_list=rel_path_list,
+            download_url_dicts=map(
+                lambda file_object_iter_: {
+                    "presignedUrl": file_object_iter_['presignedUrl'],
+                    "relativePath": file_object_iter_['relativePath'],
+                    "fileSizeInBytes": file_object_iter_['size'],
+                },
+                all_file_objects
+            )
+        ),
         s3_uri=output_uri
     )
 
@@ -1,7 +1,15 @@
 import json
 import boto3
+from functools import lru_cache
 from urllib.parse import parse_qs
 
+
+@lru_cache(maxsize=None)
+def get_secretsmanager_client():
+    # Created once and reused for the lifetime of the container
+    return boto3.client("secretsmanager")
+
+
 def _event_from_slack_body(slack_body: str) -> dict:
     """
     Convert the raw Slack body (application/x-www-form-urlencoded;
@@ -60,7 +68,7 @@ def _get_allowed_users() -> list[str]:
         ]
       }
     """
-    resp = boto3.client("secretsmanager").get_secret_value(
+    resp = get_secretsmanager_client().get_secret_value(
         SecretId="auto-data-sharing-slack-config"  # pragma: allowlist secret
     )
     secret_str = resp["SecretString"]
@@ -5,70 +5,37 @@ SFN LAMBDA HANDLER: __generate_presigned_url_for_data_objects_lambda_function_ar
 
 Intro:
 
-Generate a presigned url for a data object using the ICAv2 API
+Generate presigned urls for a batch of data objects
 
 """
 
 # Imports
-from urllib.parse import urlunparse, urlparse, parse_qs
 from typing import Dict, List
-from datetime import datetime, timedelta, timezone
+
+# Layer imports
+from data_sharing_tools import (
+    S3ObjectToPresignTypeDef,
+    get_presigned_urls,
+)
+from data_sharing_tools.utils.presign_helpers import get_presigned_url_expiry_as_isoformat
 from orcabus_api_tools.filemanager import get_presigned_urls_from_ingest_ids
 
 # Set logging
 import logging
 
-
-logger = logging.getLogger()
-logger.setLevel("INFO")
-
-# Set loggers
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-def get_s3_uri_from_s3_file_object(s3_file_object: 'FileObject') -> str:
-    return str(urlunparse(
-        (
-            "s3",
-            s3_file_object['bucket'],
-            s3_file_object['key'],
-            None, None, None
-        )
-    ))
-
-
-def extract_query_params_from_presigned_url(presigned_url: str) -> Dict[str, List[str]]:
-    # parse in the url
-    parsed_url = urlparse(presigned_url)
-
-    # Extract the query parameters
-    return parse_qs(parsed_url.query)
-
-
-def extract_amz_expires(presigned_url: str) -> timedelta:
-    # Retrieve the X-Amz-Expires value
-    amz_expires = extract_query_params_from_presigned_url(presigned_url).get('X-Amz-Expires', [None])[0]
-
-    return timedelta(seconds=int(amz_expires))
-
-
-def extract_amz_date(presigned_url: str) -> datetime:
-    # Retrieve the X-Amz-Date value
-    amz_date = extract_query_params_from_presigned_url(presigned_url).get('X-Amz-Date', [None])[0]
-
-    return datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
-
-
-def get_presigned_url_expiry_as_isoformat(presigned_url: str) -> str:
-    return (extract_amz_date(presigned_url) + extract_amz_expires(presigned_url)).isoformat(
-        sep="T", timespec="seconds"
-    ).replace("+00:00", "Z")
-
-
 def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
     """
     Get the presigned url for data objects
+
+    Objects in s3ObjectList (ingestId, bucket and key) reuse any still-valid url in the presigned url cache,
+    the remainder are presigned through the filemanager in a single batch (see data_sharing_tools.utils.presign_helpers).
+    Any remaining ingest ids in ingestIdList (i.e. records written before we stored the bucket and key)
+    are presigned by ingest id.
+    The filemanager sets the expiry of every url (seven days).
     :param event:
     :param context:
     :return:
@@ -76,6 +43,7 @@ def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
 
     # Get the input
     ingest_id_list: List[str] = event.get("ingestIdList", None)
+    s3_object_list: List[S3ObjectToPresignTypeDef] = event.get("s3ObjectList", [])
 
     # Check if s3_uri is None
     if ingest_id_list is None:
@@ -86,14 +54,42 @@ def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
             "ingestIdsWithPresignedUrlDataOutputs": []
         }
 
+    # Batch presign (or reuse cached urls for) the objects we know the location of,
+    # objects without an ingest id, bucket or key (i.e. legacy records) are left to the filemanager
+    ingest_id_list_to_presign = set(ingest_id_list)
+    s3_object_list = list(filter(
+        lambda s3_object_iter_: (
+            s3_object_iter_.get('ingestId', None) in ingest_id_list_to_presign and
+            s3_object_iter_.get('bucket', None) is not None and
+            s3_object_iter_.get('key', None) is not None
+        ),
+        s3_object_list
+    ))
+    presigned_url_list = get_presigned_urls(s3_object_list)
+
+    # And presign the remainder through the filemanager
+    remaining_ingest_id_list = sorted(
+        ingest_id_list_to_presign - set(map(lambda s3_object_iter_: s3_object_iter_.get('ingestId'), s3_object_list))
+    )
+    if len(remaining_ingest_id_list) > 0:
+        logger.info(f"Presigning {len(remaining_ingest_id_list)} objects without a bucket / key through the filemanager")
+        presigned_url_list += list(map(
+            lambda presigned_url_dict_iter_: {
+                "ingestId": presigned_url_dict_iter_['ingestId'],
+                "presignedUrl": presigned_url_dict_iter_['presignedUrl'],
+                "presignedExpiry": get_presigned_url_expiry_as_isoformat(presigned_url_dict_iter_['presignedUrl'])
+            },
+            get_presigned_urls_from_ingest_ids(remaining_ingest_id_list)
+        ))
+
     return {
         "ingestIdsWithPresignedUrlDataOutputs": list(map(
-            lambda presigned_url_dict_iter: {
-                "ingestId": presigned_url_dict_iter['ingestId'],
-                "presignedUrl": presigned_url_dict_iter['presignedUrl'],
-                "presignedExpiry": get_presigned_url_expiry_as_isoformat(presigned_url_dict_iter['presignedUrl'])
+            lambda presigned_url_dict_iter_: {
+                "ingestId": presigned_url_dict_iter_['ingestId'],
+                "presignedUrl": presigned_url_dict_iter_['presignedUrl'],
+                "presignedExpiry": presigned_url_dict_iter_['presignedExpiry'],
             },
-            get_presigned_urls_from_ingest_ids(ingest_id_list)
+            presigned_url_list
         ))
     }
 
@@ -1,88 +1,122 @@
 #!/usr/bin/env python3
-from os import environ
 
-import boto3
+"""
+Plan the chunks of the presigning map, as the exclusive start key of each chunk of the file context.
+
+The file records of a package are read from the context index in order of their id (the ingest id),
+so the start key of each chunk is simply the key of the last file of the previous chunk.
+We derive these from the ingest ids in the package manifest snapshot, a single (cached) s3 read,
+rather than walking the index page by page before the presigning map can start.
+
+Each chunk reads a fixed number of records from the start key on, so the snapshot must hold exactly
+the records in the index, otherwise records would be skipped or read twice.
+We check the number of records in the snapshot against a count of the index (a handful of count queries),
+and fall back to walking the index, one count-only query per chunk, if they differ
+or if the package has no snapshot.
+"""
+
+# Standard imports
+import logging
 import typing
-from typing import List, Union, Optional, Dict
+from typing import List, Optional, Dict
+
+# Layer imports
+from data_sharing_tools.utils.dynamodb_helpers import get_page_token_list, get_item_count, decode_page_token
+from data_sharing_tools.utils.manifest_helpers import load_package_manifest_table
 
 if typing.TYPE_CHECKING:
-    from mypy_boto3_dynamodb import DynamoDBClient
     from mypy_boto3_dynamodb.type_defs import AttributeValueTypeDef
 
     PaginationKeyType = Dict[str, 'AttributeValueTypeDef']
 
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+FILE_CONTEXT = "file"
+DEFAULT_CHUNK_SIZE = 100
+
 
-def get_dynamodb_client() -> 'DynamoDBClient':
-    return boto3.client('dynamodb')
+def get_pagination_key(package_id: str, ingest_id: str) -> 'PaginationKeyType':
+    """
+    The LastEvaluatedKey of a context index query, the index keys alongside the table keys
+    :param package_id:
+    :param ingest_id:
+    :return:
+    """
+    return {
+        "id": {
+            "S": ingest_id
+        },
+        "job_id": {
+            "S": package_id
+        },
+        "context": {
+            "S": f"{package_id}__{FILE_CONTEXT}"
+        }
+    }
 
 
-def get_table_name() -> str:
-    return environ['PACKAGING_TABLE_NAME']
+def get_evaluated_key_list_from_package_manifest(
+        package_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Optional[List[Optional['PaginationKeyType']]]:
+    """
+    :param package_id:
+    :param chunk_size:
+    :return: The start key of each chunk (None for the first chunk),
+      or None if the package has no snapshot, or the snapshot does not match the index
+    """
+    manifest_table = load_package_manifest_table(package_id, FILE_CONTEXT, columns=["ingestId"])
+    if manifest_table is None:
+        return None
+
+    # Strings sort by code point in python, which matches the utf-8 byte order of dynamodb sort keys
+    ingest_id_list = sorted(set(manifest_table.column("ingestId").to_pylist()))
+
+    index_item_count = get_item_count(package_id, FILE_CONTEXT)
+    if len(ingest_id_list) != index_item_count:
+        logger.warning(
+            f"Package manifest snapshot of '{package_id}' holds {len(ingest_id_list)} files, "
+            f"but the index holds {index_item_count}, walking the index instead"
+        )
+        return None
 
+    # Start with None, so that we have the correct number of iterations in the sfn map
+    return [None] + list(map(
+        lambda ingest_id_iter_: get_pagination_key(package_id, ingest_id_iter_),
+        ingest_id_list[chunk_size - 1:-1:chunk_size]
+    ))
 
-def get_index_name() -> str:
-    return environ['CONTEXT_INDEX_NAME']
 
+def get_evaluated_key_list_in_package_query(
+        package_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[Optional['PaginationKeyType']]:
+    """
+    :param package_id:
+    :param chunk_size:
+    :return: The start key of each chunk, None for the first chunk
+    """
+    evaluated_key_list = get_evaluated_key_list_from_package_manifest(package_id, chunk_size)
+    if evaluated_key_list is not None:
+        return evaluated_key_list
 
-def get_evaluated_key_list_in_package_query(package_id: str, chunk_size: int = 100) -> List[Union[None, str]]:
-    starting_item = True
+    # The content and context indexes share the same keys, so a page token of one is a start key of the other
+    _, page_token_list = get_page_token_list(package_id, FILE_CONTEXT, page_size=chunk_size)
 
-    # Start with None, so that we have the correct number of iterations in the sfn map
-    key_list: List[Optional['PaginationKeyType']] = [None]
-    exclusive_start_key = None
-
-    while True:
-        # Not the first iteration
-        # And no exclusive start key so we have reached the end of the results
-        if not exclusive_start_key and not starting_item:
-            break
-        if starting_item:
-            starting_item = False
-            dynamodb_response = get_dynamodb_client().query(
-                TableName=get_table_name(),
-                IndexName=f"{get_index_name()}-index",
-                KeyConditionExpression="#index = :value",
-                ExpressionAttributeNames={
-                    "#index": get_index_name()
-                },
-                ExpressionAttributeValues={
-                    ":value": {
-                        "S": f"{package_id}__file"
-                    }
-                },
-                Limit=chunk_size
-            )
-        else:
-            dynamodb_response = get_dynamodb_client().query(
-                TableName=get_table_name(),
-                IndexName=f"{get_index_name()}-index",
-                KeyConditionExpression="#index = :value",
-                ExpressionAttributeNames={
-                    "#index": get_index_name()
-                },
-                ExpressionAttributeValues={
-                    ":value": {
-                        "S": f"{package_id}__file"
-                    }
-                },
-                ExclusiveStartKey=exclusive_start_key,
-                Limit=chunk_size
-            )
-
-        # Set the new key list for the next iteration
-        exclusive_start_key: Optional['PaginationKeyType'] = dynamodb_response.get('LastEvaluatedKey', None)
-
-        # And add the key to the list
-        if exclusive_start_key is not None:
-            key_list.append(exclusive_start_key)
-
-    return key_list
+    # Start with None, even if the package is empty, so the sfn map always has an iteration
+    return [None] + list(map(decode_page_token, page_token_list[1:]))
 
 
 def handler(event, context):
     # Get inputs
     packaging_id = event.get("packagingJobId")
-    chunk_sizes = event.get("chunkSizes")
+    chunk_sizes = int(event.get("chunkSizes", DEFAULT_CHUNK_SIZE))
+
+    if not packaging_id:
+        raise ValueError("packagingJobId is required")
 
     # Return the evaluated key list
     return {
@@ -2,21 +2,24 @@
 
 """
 Given a fastq id, collect the fastq list row from the fastq id
+
+Given a fastqIdList instead, collect the fastq list row of each fastq id (in the same order),
+with the fastq lookups run concurrently, so a batch of fastqs is a single invocation.
 """
 from typing import Dict, List, Union
+from data_sharing_tools import map_concurrently
 from orcabus_api_tools.fastq import get_fastq
 from orcabus_api_tools.fastq.models import Fastq
 
 
-def handler(event, context) -> Dict[str, Union[List[str], Fastq]]:
+def get_fastq_object_and_ingest_ids(fastq_id: str) -> Dict[str, Union[List[str], Fastq]]:
     """
-    Given a fastq id, collect the fastq list row from the fastq id
-    :param event:
-    :param context:
+    Get the fastq object and the ingest ids of its read set
+    :param fastq_id:
     :return:
     """
     # Get the fastq object
-    fastq_obj = get_fastq(event["fastqId"])
+    fastq_obj = get_fastq(fastq_id)
 
     # Get the s3 ingest ids
     ingest_ids = list(filter(
@@ -35,3 +38,28 @@ def handler(event, context) -> Dict[str, Union[List[str], Fastq]]:
         "fastqObject": fastq_obj,
         "ingestIds": ingest_ids
     }
+
+
+def handler(event, context) -> Dict[str, Union[List[str], Fastq, List[Dict]]]:
+    """
+    Given a fastq id, collect the fastq list row from the fastq id
+    :param event:
+    :param context:
+    :return:
+    """
+    # Batch invocation
+    if "fastqIdList" in event:
+        return {
+            "fastqObjectList": list(map(
+                lambda fastq_id_and_obj_iter_: dict(
+                    fastqId=fastq_id_and_obj_iter_[0],
+                    **fastq_id_and_obj_iter_[1]
+                ),
+                zip(
+                    event["fastqIdList"],
+                    map_concurrently(get_fastq_object_and_ingest_ids, event["fastqIdList"])
+                )
+            ))
+        }
+
+    return get_fastq_object_and_ingest_ids(event["fastqId"])
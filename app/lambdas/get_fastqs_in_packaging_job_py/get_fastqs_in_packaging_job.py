@@ -3,35 +3,49 @@
 """
 Get fastqs in packaging job by packaging job id.
 We assume that fastqs are stored in filemanager monitored location.
+
+Fastqs are read straight from the fastq file index (the <job_id>__file__fastq context),
+a countOnly invocation returns the page token of each page, and each page is then read with a single query.
 """
 
 # Standard imports
 from pathlib import Path
-import pandas as pd
+import logging
+from typing import List
 from urllib.parse import urlparse, urlunparse
 
 # Layered imports
-from data_sharing_tools.utils.dynamodb_helpers import query_dynamodb_table
+from data_sharing_tools.utils.manifest_helpers import load_package_manifest
+from data_sharing_tools.utils.dynamodb_helpers import (
+    FASTQ_FILE_CONTEXT,
+    get_page_token_list,
+    get_page_token_list_from_id_list,
+    query_dynamodb_table_page,
+)
+from data_sharing_tools.utils.dynamodb_write_helpers import write_fastq_file_index
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
 
+# Globals
+DEFAULT_PAGE_SIZE = 50
+FASTQ_FILE_PROJECTION = ["ingestId", "key", "relativePath"]
 
-def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
+
+def backfill_fastq_file_index(packaging_job_id: str) -> List[str]:
     """
-    Given a job id, query the dynamodb table to get all data that belongs to that job id for that given data type,
-    where data type is one of:
-     * library
-     * fastq
-     * workflow
-     * files
-    :param job_id:
-    :param context:
-    :return:
+    Packages written before the fastq file index existed only hold the fastqs in their file context,
+    write the index items for these
+    :param packaging_job_id:
+    :return: The ingest ids of the fastqs indexed
     """
-
-    # If not library, we grab the metadata anyway since we merge it on the other data types.
-    return pd.DataFrame(
-        query_dynamodb_table(
-            job_id,
-            context
+    return write_fastq_file_index(
+        packaging_job_id,
+        load_package_manifest(
+            packaging_job_id,
+            "file",
+            columns=["ingestId", "bucket", "key", "size", "relativePath"]
         )
     )
 
@@ -39,6 +53,15 @@ def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
 def handler(event, context):
     """
     Get fastqs in packaging job by packaging job id.
+
+    Given the following inputs:
+      * packagingJobId
+      * pushLocation
+      * countOnly, or pageToken (null, or not set, for the first page)
+      * pageSize (optional)
+
+    A countOnly invocation returns the listCount and the pageTokenList (one token per page),
+    a page invocation returns the destination uri and ingest id mappings of the fastqs in that page.
     :param event:
     :param context:
     :return:
@@ -48,17 +71,16 @@ def handler(event, context):
     packaging_job_id = event["packagingJobId"]
     push_location = event["pushLocation"]
     count_only = event.get("countOnly", False)
-    pagination_index = event.get("paginationIndex", None)
+    page_size = int(event.get("pageSize", DEFAULT_PAGE_SIZE))
 
     # Check if the jobId and pushLocation are provided
     if not packaging_job_id or not push_location:
         raise ValueError("jobId and pushLocation are required")
 
-    # Check one and only one of count_only and pagination_index are provided
-    if count_only and pagination_index is not None:
-        raise ValueError("Only one of countOnly and paginationIndex can be provided")
-    if not count_only and pagination_index is None:
-        raise ValueError("One of countOnly or paginationIndex must be provided")
+    # Check only one of count_only and page_token are provided
+    # (the first page has no page token)
+    if count_only and event.get("pageToken", None) is not None:
+        raise ValueError("Only one of countOnly and pageToken can be provided")
 
     # Get the push location as a url object
     push_location_url_obj = urlparse(push_location)
@@ -71,30 +93,36 @@ def handler(event, context):
     if not push_location_url_obj.path:
         raise ValueError(f"Error: pushLocation must be a valid s3 url, {push_location} does not have a path")
 
-    # Get the data from DynamoDB
-    data_df = get_data_from_dynamodb(
-        job_id=packaging_job_id,
-        context="file"
-    )
-
-    # Filter out non fastq files
-    data_df = (
-        data_df.query(
-        "key.str.endswith('.fastq.gz') or key.str.endswith('.fastq.ora')",
-        engine="python"
-        )
-        .sort_values(by="key")
-        .reset_index(drop=True)
-    )
-
-    # If count only, return the count of fastqs
+    # If count only, return the count of fastqs and the token of each page
     if count_only:
+        list_count, page_token_list = get_page_token_list(packaging_job_id, FASTQ_FILE_CONTEXT, page_size)
+
+        if list_count == 0:
+            backfilled_ingest_id_list = backfill_fastq_file_index(packaging_job_id)
+            if len(backfilled_ingest_id_list) > 0:
+                logger.info(f"Backfilled the fastq file index for packaging job '{packaging_job_id}'")
+                # The index is only eventually consistent, so do not re-query it straight after the backfill,
+                # the page tokens are built from the ingest ids we have just written instead
+                list_count, page_token_list = get_page_token_list_from_id_list(
+                    packaging_job_id, FASTQ_FILE_CONTEXT,
+                    id_list=backfilled_ingest_id_list,
+                    page_size=page_size,
+                    item_job_id=packaging_job_id + "__" + FASTQ_FILE_CONTEXT
+                )
+
         return {
-            "listCount": data_df.shape[0]
+            "listCount": list_count,
+            "pageTokenList": page_token_list,
         }
 
-    # Filter to pagination tuple
-    data_df = data_df.loc[pagination_index[0]:pagination_index[1]]
+    # Read the page
+    fastq_file_list, _ = query_dynamodb_table_page(
+        packaging_job_id,
+        FASTQ_FILE_CONTEXT,
+        page_size=page_size,
+        page_token=event.get("pageToken", None),
+        projection=FASTQ_FILE_PROJECTION
+    )
 
     return {
         "destinationUriAndIngestIdMappingsList": list(map(
@@ -107,6 +135,6 @@ def handler(event, context):
                 ))),
                 "ingestId": row["ingestId"]
             },
-            data_df.to_dict(orient="records")
+            fastq_file_list
         ))
     }
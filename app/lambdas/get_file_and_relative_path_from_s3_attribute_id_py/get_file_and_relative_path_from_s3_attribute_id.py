@@ -3,15 +3,22 @@
 """
 SFN LAMBDA PLACEHOLDER: __get_file_from_s3_object_id_lambda_function_arn__
 Get file from the s3 object id
+
+Given an s3AttributeIdList instead, get the file of each item (in the same order),
+where each item is an {s3ObjectId} or {ingestId} object, optionally with its own fastqObject / workflowRunObject,
+and all other keys (dataType, path prefixes etc.) are shared from the event.
+Items may instead reference their fastq by fastqId, with each fastq object given once in fastqObjectList
+(a list of {fastqId, fastqObject}), so a fastq object is not repeated for every file of its read set.
+The filemanager lookups are run concurrently, so a batch of files is a single invocation.
 """
 
 # Standard imports
 import typing
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Tuple, Union
 
 # Data sharing tools
-from data_sharing_tools import DataType, PrimaryDataPathPrefixType, SecondaryAnalysisPathPrefixType
+from data_sharing_tools import DataType, PrimaryDataPathPrefixType, SecondaryAnalysisPathPrefixType, map_concurrently
 
 # Orcabus API tools
 from orcabus_api_tools.filemanager import (
@@ -26,24 +33,42 @@ if typing.TYPE_CHECKING:
     from orcabus_api_tools.fastq import FastqListRow
 
 
-def handler(event, context) -> Dict[str, 'FileObjectWithRelativePathTypeDef']:
+def get_s3_attribute(event: Dict) -> Tuple[str, str]:
     """
-    Handler function for getting file from the s3 object id
+    Get the (attribute name, attribute id) pair to look up the file object with
+    :param event:
+    :return:
     """
-
-    # Get the s3 object id from the event
     # Check at least one of 's3ObjectId' or 'ingestId' is in the event
     if 's3ObjectId' not in event and 'ingestId' not in event:
         raise ValueError("Either 's3ObjectId' or 'ingestId' must be in the event object")
 
-    # Get the object from either the s3 object id or the ingest id
     if 's3ObjectId' in event:
+        return 's3ObjectId', event['s3ObjectId']
+    return 'ingestId', event['ingestId']
+
+
+def get_file_object_from_s3_attribute(s3_attribute: Tuple[str, str]) -> 'FileObject':
+    attribute_name, attribute_id = s3_attribute
+
+    # Get the object from either the s3 object id or the ingest id
+    if attribute_name == 's3ObjectId':
         # Get the file object from the s3 object id
-        file_object: 'FileObject' = get_file_object_from_id(event.get('s3ObjectId'))
-    else:
-        # Get the file object from the s3 ingest id
-        file_object: 'FileObject' = get_file_object_from_ingest_id(event.get('ingestId'))
+        return get_file_object_from_id(attribute_id)
+    # Get the file object from the s3 ingest id
+    return get_file_object_from_ingest_id(attribute_id)
 
+
+def get_file_object_with_relative_path(
+        file_object: 'FileObject',
+        event: Dict
+) -> 'FileObjectWithRelativePathTypeDef':
+    """
+    Add the data type and relative path to the file object
+    :param file_object:
+    :param event:
+    :return:
+    """
     # Get the data type
     data_type: DataType = event.get("dataType")
 
@@ -66,7 +91,7 @@ def handler(event, context) -> Dict[str, 'FileObjectWithRelativePathTypeDef']:
         key_relative_to_portal_run_id = "/".join(Path(file_object['key']).parts[portal_run_id_part_index + 1:])
 
         # Generate the file object with presigned url
-        file_object_with_relative_path: 'FileObjectWithRelativePathTypeDef' = dict(
+        return dict(
             **file_object,
             **{
                 'dataType': data_type,
@@ -78,13 +103,10 @@ def handler(event, context) -> Dict[str, 'FileObjectWithRelativePathTypeDef']:
                 )
             }
         )
-        return {
-            "fileObject": file_object_with_relative_path
-        }
 
     elif data_type == 'fastq':
         fastq_obj: 'FastqListRow' = event.get("fastqObject")
-        file_object_with_relative_path: 'FileObjectWithRelativePathTypeDef' = dict(
+        return dict(
             **file_object,
             **{
                 'dataType': data_type,
@@ -97,13 +119,55 @@ def handler(event, context) -> Dict[str, 'FileObjectWithRelativePathTypeDef']:
                 )
             }
         )
-        return {
-            "fileObject": file_object_with_relative_path
-        }
     else:
         raise ValueError(f"Unsupported data type: {data_type}")
 
 
+def handler(event, context) -> Dict[str, Union['FileObjectWithRelativePathTypeDef', List['FileObjectWithRelativePathTypeDef']]]:
+    """
+    Handler function for getting file from the s3 object id
+    """
+    # Batch invocation
+    if 's3AttributeIdList' in event:
+        # Fastq objects referenced by id
+        fastq_object_by_fastq_id: Dict[str, 'FastqListRow'] = dict(map(
+            lambda fastq_object_iter_: (fastq_object_iter_['fastqId'], fastq_object_iter_['fastqObject']),
+            event.get('fastqObjectList', [])
+        ))
+
+        # Each item inherits the shared keys of the event
+        item_list: List[Dict] = list(map(
+            lambda item_iter_: {
+                **{k: v for k, v in event.items() if k not in ['s3AttributeIdList', 'fastqObjectList']},
+                **(
+                    {'fastqObject': fastq_object_by_fastq_id[item_iter_['fastqId']]}
+                    if 'fastqId' in item_iter_ else {}
+                ),
+                **item_iter_
+            },
+            event['s3AttributeIdList']
+        ))
+
+        file_object_list: List['FileObject'] = map_concurrently(
+            get_file_object_from_s3_attribute,
+            list(map(get_s3_attribute, item_list))
+        )
+
+        return {
+            "fileObjectList": list(map(
+                lambda file_object_and_item_iter_: get_file_object_with_relative_path(*file_object_and_item_iter_),
+                zip(file_object_list, item_list)
+            ))
+        }
+
+    return {
+        "fileObject": get_file_object_with_relative_path(
+            get_file_object_from_s3_attribute(get_s3_attribute(event)),
+            event
+        )
+    }
+
+
 # if __name__ == "__main__":
 #     from os import environ
 #     from os import environ
@@ -5,13 +5,17 @@ SFN LAMBDA FUNCTION PLACEHOLDER: __list_files_with_portal_run_id_attribute_lambd
 
 Given a portal run id, this script will return a list of all files associated with that run id.
 
-
+Files are selected by the first file selection rule matching the workflow name and version,
+from the file selection registry, and then from the built-in rules below (REGEX_FILES_BY_WORKFLOW_NAME).
+Each rule is compiled once per container into a single key filter,
+so each file key is tested in one pass rather than once per pattern.
 
 """
 
 import typing
 from typing import List, Dict, Any
 
+from data_sharing_tools import get_file_selector
 from orcabus_api_tools.filemanager import (
     list_files_from_portal_run_id
 )
@@ -19,67 +23,66 @@ from orcabus_api_tools.filemanager import (
 if typing.TYPE_CHECKING:
     from data_sharing_tools.utils.models import WorkflowRunModelSlim
 
-import re
-
+# Patterns are searched (re.search) against each file key
 REGEX_FILES_BY_WORKFLOW_NAME = {
     "umccrise": [
         # Top level reports
-        re.compile(r"multiqc_report\.html$"),
-        re.compile(r"somatic\.pcgr\.html$"),
-        re.compile(r"normal\.cpsr\.html$"),
-        re.compile(r"cancer_report\.html$"),
+        r"multiqc_report\.html$",
+        r"somatic\.pcgr\.html$",
+        r"normal\.cpsr\.html$",
+        r"cancer_report\.html$",
         # Small variants
-        re.compile(r"germline\.predispose_genes\.vcf\.gz$"),
-        re.compile(r"germline\.predispose_genes\.vcf\.gz\.tbi$"),
-        re.compile(r"somatic-PASS\.vcf\.gz$"),
-        re.compile(r"somatic-PASS\.vcf\.gz\.tbi$"),
-        re.compile(r"somatic\.pcgr\.snvs_indels\.tiers\.tsv$"),
+        r"germline\.predispose_genes\.vcf\.gz$",
+        r"germline\.predispose_genes\.vcf\.gz\.tbi$",
+        r"somatic-PASS\.vcf\.gz$",
+        r"somatic-PASS\.vcf\.gz\.tbi$",
+        r"somatic\.pcgr\.snvs_indels\.tiers\.tsv$",
         # Structural variants
-        re.compile(r"manta\.tsv$"),
-        re.compile(r"manta\.vcf\.gz$"),
-        re.compile(r"manta\.vcf\.gz.tbi$"),
+        r"manta\.tsv$",
+        r"manta\.vcf\.gz$",
+        r"manta\.vcf\.gz.tbi$",
         # Purple files
-        re.compile(r"purple\.cnv\.gene\.tsv$"),
-        re.compile(r"purple\.cnv\.somatic\.tsv$"),
+        r"purple\.cnv\.gene\.tsv$",
+        r"purple\.cnv\.somatic\.tsv$",
         # Amber files
-        re.compile(r"\.amber\.baf\.pcf"),
-        re.compile(r"\.amber\.baf\.tsv"),
-        re.compile(r"\.amber\.baf\.vcf\.gz"),
-        re.compile(r"\.amber\.baf\.vcf\.gz\.tbi"),
-        re.compile(r"\.amber\.contamination\.tsv"),
-        re.compile(r"\.amber\.contamination\.vcf\.gz"),
-        re.compile(r"\.amber\.contamination\.vcf\.gz\.tbi"),
-        re.compile(r"\.amber\.qc"),
-        re.compile(r"amber.version"),
+        r"\.amber\.baf\.pcf",
+        r"\.amber\.baf\.tsv",
+        r"\.amber\.baf\.vcf\.gz",
+        r"\.amber\.baf\.vcf\.gz\.tbi",
+        r"\.amber\.contamination\.tsv",
+        r"\.amber\.contamination\.vcf\.gz",
+        r"\.amber\.contamination\.vcf\.gz\.tbi",
+        r"\.amber\.qc",
+        r"amber.version",
         # Cobalt files
-        re.compile(r"\.cobalt\.gc\.median\.tsv"),
-        re.compile(r"\.cobalt\.ratio\.median\.tsv"),
-        re.compile(r"\.cobalt\.ratio\.pcf"),
-        re.compile(r"\.chr\.len"),
-        re.compile(r"\.cobalt\.gc\.median\.tsv"),
-        re.compile(r"\.cobalt\.ratio\.pcf"),
-        re.compile(r"\.cobalt\.ratio\.tsv"),
-        re.compile(r"cobalt\.version"),
+        r"\.cobalt\.gc\.median\.tsv",
+        r"\.cobalt\.ratio\.median\.tsv",
+        r"\.cobalt\.ratio\.pcf",
+        r"\.chr\.len",
+        r"\.cobalt\.gc\.median\.tsv",
+        r"\.cobalt\.ratio\.pcf",
+        r"\.cobalt\.ratio\.tsv",
+        r"cobalt\.version",
         # Signature
-        re.compile(r"-indel\.tsv\.gz"),
-        re.compile(r"-snv_2015\.tsv\.gz"),
-        re.compile(r"-snv_2020\.tsv\.gz"),
+        r"-indel\.tsv\.gz",
+        r"-snv_2015\.tsv\.gz",
+        r"-snv_2020\.tsv\.gz",
     ],
     "tumor-normal": [
-        re.compile(r"tumor\.bam$"),
-        re.compile(r"tumor\.bam\.bai$"),
-        re.compile(r"tumor\.bam\.md5sum$"),
-        re.compile(r"normal\.bam$"),
-        re.compile(r"normal\.bam\.bai$"),
-        re.compile(r"normal\.bam\.md5sum$"),
+        r"tumor\.bam$",
+        r"tumor\.bam\.bai$",
+        r"tumor\.bam\.md5sum$",
+        r"normal\.bam$",
+        r"normal\.bam\.bai$",
+        r"normal\.bam\.md5sum$",
     ],
     "wts": [
-        re.compile(r".bam$"),
-        re.compile(r".bam.bai$"),
-        re.compile(r".bam.md5sum$"),
-        re.compile(r"fusion_candidates.final$"),
-        re.compile(r"quant.genes.sf$"),
-        re.compile(r"quant.sf")
+        r".bam$",
+        r".bam.bai$",
+        r".bam.md5sum$",
+        r"fusion_candidates.final$",
+        r"quant.genes.sf$",
+        r"quant.sf"
     ]
 }
 
@@ -87,6 +90,15 @@ REGEX_FILES_BY_WORKFLOW_NAME = {
 REGEX_FILES_BY_WORKFLOW_NAME["wgs_tumor_normal"] = REGEX_FILES_BY_WORKFLOW_NAME["tumor-normal"]
 REGEX_FILES_BY_WORKFLOW_NAME["wts_tumor_only"] = REGEX_FILES_BY_WORKFLOW_NAME["wts"]
 
+# Built-in include-only rules, used when the registry has no rule for the workflow
+DEFAULT_FILE_SELECTION_RULE_LIST = list(map(
+    lambda workflow_name_and_pattern_list_iter_: {
+        "workflowName": workflow_name_and_pattern_list_iter_[0],
+        "includePatterns": workflow_name_and_pattern_list_iter_[1],
+    },
+    REGEX_FILES_BY_WORKFLOW_NAME.items()
+))
+
 
 def handler(event: Dict, context: Any) -> Dict[str, List[str]]:
     """
@@ -109,17 +121,20 @@ def handler(event: Dict, context: Any) -> Dict[str, List[str]]:
     )
 
     # Filter files by workflow type
-    if (
-            use_workflow_filters and
-            workflow_object['workflowName'] in REGEX_FILES_BY_WORKFLOW_NAME
-    ):
-        file_object_list_filtered = []
-        for file_object_iter_ in file_obj_list:
-            for regex_iter_ in REGEX_FILES_BY_WORKFLOW_NAME[workflow_object['workflowName']]:
-                if regex_iter_.search(file_object_iter_['key']):
-                    file_object_list_filtered.append(file_object_iter_)
-                    # File object is a match no need to check other regexes
-                    break
+    file_selector = (
+        get_file_selector(
+            workflow_name=workflow_object['workflowName'],
+            workflow_version=workflow_object.get('workflowVersion', None),
+            default_rule_list=DEFAULT_FILE_SELECTION_RULE_LIST,
+        )
+        if use_workflow_filters else None
+    )
+
+    if file_selector is not None:
+        file_object_list_filtered = list(filter(
+            file_selector,
+            file_obj_list
+        ))
     else:
         file_object_list_filtered = file_obj_list
 
@@ -5,10 +5,14 @@ LAMBDA_ARN_SFN_PLACEHOLDER: __get_library_object_from_library_orcabus_id_lambda_
 
 
 Get Library Object from Library ID
+
+Given a libraryOrcabusIdList instead, return the library object of each library (in the same order),
+with the metadata lookups run concurrently, so a batch of libraries is a single invocation.
 """
 
 # Imports
-from typing import Dict
+from typing import Dict, List, Union
+from data_sharing_tools import map_concurrently
 from orcabus_api_tools.metadata import (
     get_library_from_library_orcabus_id
 )
@@ -22,26 +26,39 @@ logger = logging.getLogger()
 logger.setLevel("INFO")
 
 
-def handler(event, context) -> Dict[str, Library]:
+def get_library_object(library_orcabus_id: str) -> Library:
+    # Get the library object from the library id
+    library: Library = get_library_from_library_orcabus_id(library_orcabus_id)
+
+    # Assert that the library is not None:
+    assert library is not None, f"Library is None, could not find library with orcabus id: {library_orcabus_id}"
+
+    return library
+
+
+def handler(event, context) -> Dict[str, Union[Library, List[Library]]]:
     """
     Given a library id, return the library object
     :param event:
     :param context:
     :return:
     """
+    # Batch invocation
+    if "libraryOrcabusIdList" in event:
+        return {
+            "libraryList": map_concurrently(
+                get_library_object,
+                event["libraryOrcabusIdList"]
+            )
+        }
+
     # Get the library id from the event input
     library_orcabus_id = event.get("libraryOrcabusId")
 
     # Assert that the library is not None:
     assert library_orcabus_id is not None, "Library ID is None"
 
-    # Get the library object from the library id
-    library: Library = get_library_from_library_orcabus_id(library_orcabus_id)
-
-    # Assert that the library is not None:
-    assert library is not None, f"Library is None, could not find library with orcabus id: {library_orcabus_id}"
-
     # Return the library object
     return {
-        "library": library
+        "library": get_library_object(library_orcabus_id)
     }
@@ -1,17 +1,32 @@
 #!/usr/bin/env python3
 
+"""
+Given a packaging job id and an s3 push location, generate the destination and source uri mappings,
+one mapping per parent folder of the package.
+
+The mappings are computed once, on the countOnly invocation, and written as a push plan
+(see data_sharing_tools.utils.push_plan_helpers), each paginationIndex invocation then reads just its own slice.
+"""
 
 # Imports
 from pathlib import Path
-from urllib.parse import urlunparse, urlparse
+from urllib.parse import urlunparse, urlparse, ParseResult
 
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from data_sharing_tools.utils.manifest_helpers import load_package_manifest
+from data_sharing_tools.utils.push_plan_helpers import (
+    get_push_plan_index,
+    read_push_plan_slice,
+    write_push_plan,
+)
 
-from data_sharing_tools.utils.dynamodb_helpers import query_dynamodb_table
+# Globals
+PUSH_PLAN_NAME = "s3-destination-and-source-uri-mappings"
 
 
-def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
+def get_data_from_dynamodb(job_id: str, context: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Given a job id, query the dynamodb table to get all data that belongs to that job id for that given data type,
     where data type is one of:
@@ -21,18 +36,65 @@ def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
      * files
     :param job_id:
     :param context:
+    :param columns: Only collect these attributes of each record
     :return:
     """
 
     # If not library, we grab the metadata anyway since we merge it on the other data types.
     return pd.DataFrame(
-        query_dynamodb_table(
+        load_package_manifest(
             job_id,
-            context
+            context,
+            columns=columns
         )
     )
 
 
+def get_destination_and_source_uri_mappings_list(
+        job_id: str,
+        push_location_url_obj: ParseResult
+) -> List[Dict[str, str]]:
+    """
+    Group the files of a package by their parent folder, sorted by destination uri
+    :param job_id:
+    :param push_location_url_obj:
+    :return:
+    """
+    # Get the data from DynamoDB
+    data_df = get_data_from_dynamodb(
+        job_id=job_id,
+        context="file",
+        columns=["bucket", "key", "relativePath"]
+    )
+
+    if data_df.empty:
+        return []
+
+    # Calculate the relative parent path for all source files, files at the top level have a parent of '.'
+    data_df["relativePathParent"] = data_df["relativePath"].str.rpartition("/")[0].replace("", ".")
+    data_df["sourceUri"] = "s3://" + data_df["bucket"] + "/" + data_df["key"].str.lstrip("/")
+
+    # Group by parent path and collect the source uris
+    destination_and_source_uri_mappings_list: List[Dict[str, str]] = list(map(
+        lambda group_iter_: {
+            "destinationUri": str(urlunparse((
+                push_location_url_obj.scheme,
+                push_location_url_obj.netloc,
+                str(Path(push_location_url_obj.path) / group_iter_[0]).lstrip("/"),
+                None, None, None
+            ))),
+            "sourceUrisList": group_iter_[1].tolist()
+        },
+        data_df.groupby("relativePathParent")["sourceUri"]
+    ))
+
+    destination_and_source_uri_mappings_list.sort(
+        key=lambda x: x["destinationUri"]
+    )
+
+    return destination_and_source_uri_mappings_list
+
+
 def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
     """
     Given the following inputs:
@@ -46,6 +108,9 @@ def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
     * Queries the files in the dynamodb database for this packaging job id
     * For each subfolder, it generates a destination and source uri mapping based on a common parent location
     * Returns the destination and source uri mappings list for each folder
+
+    On a countOnly invocation, the mappings are written to the push plan and only the count is returned.
+    Paginated invocations read their slice of the push plan (writing the plan first if it does not exist yet).
     :param event:
     :param context:
     :return:
@@ -72,61 +137,45 @@ def handler(event, context) -> Dict[str, List[Dict[str, str]]]:
     if not push_location_url_obj.path:
         raise ValueError(f"Error: pushLocation must be a valid s3 url, {push_location} does not have a path")
 
-    # Initialize the destination and source uri mappings list
-    destination_and_source_uri_mappings_list: List[Dict[str, str]] = []
-
-    # Get the data from DynamoDB
-    data_df = get_data_from_dynamodb(
-        job_id=job_id,
-        context="file"
-    )
-
-    # Calculate the relative parent path for all source files
-    data_df["relativePathParent"] = data_df.apply(
-        lambda row_iter_: str(Path(row_iter_['relativePath']).parent),
-        axis='columns'
-    )
+    # The count only invocation is the first of a push, so (re)compute the plan here
+    push_plan_index = None
+    if not count_only:
+        push_plan_index = get_push_plan_index(job_id, PUSH_PLAN_NAME, push_location)
 
-    # Group by parent path and collect the relative paths
-    for relative_path_parent, relative_path_parent_df in data_df.groupby("relativePathParent"):
-        # Generate the destination and source uri mappings
-        destination_and_source_uri_mappings_list.append(
-            {
-                "destinationUri": str(urlunparse((
-                    push_location_url_obj.scheme,
-                    push_location_url_obj.netloc,
-                    str(Path(push_location_url_obj.path) / relative_path_parent).lstrip("/"),
-                    None, None, None
-                ))),
-                "sourceUrisList": list(relative_path_parent_df.apply(
-                    lambda row_iter_: str(urlunparse((
-                        "s3",
-                        row_iter_['bucket'],
-                        row_iter_['key'],
-                        None, None, None
-                    ))),
-                    axis='columns'
-                ))
-            }
+    if push_plan_index is None:
+        push_plan_index = write_push_plan(
+            job_id,
+            PUSH_PLAN_NAME,
+            push_location,
+            get_destination_and_source_uri_mappings_list(job_id, push_location_url_obj)
         )
 
-    destination_and_source_uri_mappings_list.sort(
-        key=lambda x: x["destinationUri"]
-    )
-
     # If count only is true, return the count of the destination and source uri mappings list
     if count_only:
         return {
-            "listCount": len(destination_and_source_uri_mappings_list)
+            "listCount": push_plan_index['recordCount']
         }
 
     if pagination_index:
         return {
-            "destinationAndSourceUriMappingsList": destination_and_source_uri_mappings_list[pagination_index[0]:pagination_index[1]+1]
+            "destinationAndSourceUriMappingsList": read_push_plan_slice(
+                job_id,
+                PUSH_PLAN_NAME,
+                push_location,
+                push_plan_index,
+                start=pagination_index[0],
+                end=pagination_index[1]
+            )
         }
 
     return {
-        "destinationAndSourceUriMappingsList": destination_and_source_uri_mappings_list
+        "destinationAndSourceUriMappingsList": read_push_plan_slice(
+            job_id,
+            PUSH_PLAN_NAME,
+            push_location,
+            push_plan_index,
+            start=0
+        )
     }
 
 
@@ -5,19 +5,16 @@ SFN LAMBDA FUNCTION PLACEHOLDER: __get_workflow_run_id_from_portal_run_id_lambda
 
 Get workflow for portal run id
 
+Legacy workflows are read from the rows resolved for the whole package by the resolve legacy workflows lambda,
+we only query athena for this portal run if these have not been resolved.
 """
 
 # Standard library imports
 import typing
-from io import BytesIO
 from textwrap import dedent
-from time import sleep
-from typing import Dict, List, Optional, Tuple
-import boto3
+from typing import Dict, List, Optional
 import json
-from urllib.parse import urlparse
 import pandas as pd
-from os import environ
 
 
 # Platform layers
@@ -28,82 +25,58 @@ from orcabus_api_tools.workflow import (
 from orcabus_api_tools.workflow.errors import WorkflowRunNotFoundError
 
 # Data sharing layer
+from data_sharing_tools.utils.athena_helpers import run_athena_sql_query
+from data_sharing_tools.utils.legacy_workflow_helpers import load_legacy_workflow_rows
+
 if typing.TYPE_CHECKING:
-    from mypy_boto3_athena import AthenaClient
     from data_sharing_tools.utils.models import WorkflowRunModelSlim
-    from mypy_boto3_s3 import S3Client
 
 
 # Globals
-# ATHENA
-WORKGROUP_ENV_VAR = 'ATHENA_WORKGROUP_NAME'
-DATA_SOURCE_ENV_VAR = 'ATHENA_DATASOURCE_NAME'
-DATABASE_ENV_VAR = 'ATHENA_DATABASE_NAME'
-
 WORKFLOW_NAME_CONVERSION_MAP = {
     "tumor-normal": "WGS_TUMOR_NORMAL",
     "oncoanalyser_wgs": "oncoanalyser-wgts-dna",
 }
 
 
-def get_athena_client() -> 'AthenaClient':
-    return boto3.client('athena')
-
-
-def get_s3_client() -> 'S3Client':
-    return boto3.client('s3')
-
-
-def get_bucket_key_tuple_from_s3_uri(s3_uri: str) -> Tuple[str, str]:
-    urlobj = urlparse(s3_uri)
-
-    return urlobj.netloc, urlobj.path.lstrip('/')
-
-
-def run_athena_sql_query(sql_query: str) -> pd.DataFrame:
-    athena_query_execution_id = get_athena_client().start_query_execution(
-        QueryString=sql_query,
-        QueryExecutionContext={
-            "Database": environ[DATABASE_ENV_VAR],
-            "Catalog": environ[DATA_SOURCE_ENV_VAR]
-        },
-        WorkGroup=environ[WORKGROUP_ENV_VAR],
-    )['QueryExecutionId']
-
-    while True:
-        status = get_athena_client().get_query_execution(
-            QueryExecutionId=athena_query_execution_id
-        )['QueryExecution']['Status']['State']
-
-        if status in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-            break
-
-        sleep(5)
-
-    if status in ['FAILED', 'CANCELLED']:
-        raise RuntimeError(f"Query failed: {status}")
-
-    # Get the results
-    result_location = get_athena_client().get_query_execution(
-        QueryExecutionId=athena_query_execution_id
-    )['QueryExecution']['ResultConfiguration']['OutputLocation']
+def get_legacy_workflow_df_from_packaging_job(packaging_job_id: str, portal_run_id: str) -> Optional[pd.DataFrame]:
+    """
+    Get the legacy workflow of a portal run from the rows resolved for its packaging job
+    :param packaging_job_id:
+    :param portal_run_id:
+    :return: None if the legacy workflows of this job have not been resolved
+    """
+    legacy_workflow_rows = load_legacy_workflow_rows(packaging_job_id)
+    if legacy_workflow_rows is None:
+        return None
 
-    bucket, key = get_bucket_key_tuple_from_s3_uri(result_location)
+    df = pd.DataFrame(
+        list(filter(
+            lambda row_iter_: row_iter_['portalRunId'] == portal_run_id,
+            legacy_workflow_rows
+        )),
+        columns=['portalRunId', 'workflowName', 'workflowVersion', 'libraryId']
+    )
 
-    return pd.read_csv(
-        BytesIO(
-            get_s3_client().get_object(
-                Bucket=bucket,
-                Key=key
-            )['Body'].read()
-        ),
-        dtype={
-            "portalRunId": "object"
-        }
+    # Match the array_agg of libraries in the athena query
+    return df.groupby(
+        ['portalRunId', 'workflowName', 'workflowVersion'],
+        as_index=False,
+        sort=False,
+    ).agg(
+        libraries=('libraryId', list)
     )
 
 
-def get_workflow_run_from_portal_run_id_legacy(portal_run_id: str) -> Optional[List['WorkflowRunModelSlim']]:
+def get_workflow_run_from_portal_run_id_legacy(
+        portal_run_id: str,
+        packaging_job_id: Optional[str] = None
+) -> Optional[List['WorkflowRunModelSlim']]:
+    if packaging_job_id is not None:
+        df = get_legacy_workflow_df_from_packaging_job(packaging_job_id, portal_run_id)
+        if df is not None:
+            return get_workflows_from_legacy_workflow_df(df)
+
     workflow_query = dedent(
         """
         SELECT
@@ -112,17 +85,29 @@ def get_workflow_run_from_portal_run_id_legacy(portal_run_id: str) -> Optional[L
           workflow_version AS workflowVersion,
           array_agg(CONCAT('"', library_id, '"')) AS libraries
         FROM workflow
-        WHERE portal_run_id = '{__PORTAL_RUN_ID__}'
+        WHERE portal_run_id = ?
         GROUP BY portal_run_id, workflow_name, workflow_version
-        """.format(
-            __PORTAL_RUN_ID__=portal_run_id
-        )
+        """
+    )
+
+    df = pd.DataFrame(
+        run_athena_sql_query(workflow_query, parameters=[portal_run_id]),
+        columns=['portalRunId', 'workflowName', 'workflowVersion', 'libraries']
     )
 
-    df = run_athena_sql_query(
-        workflow_query,
+    df['libraries'] = df['libraries'].apply(
+        lambda library_id_list_iter_: (
+            json.loads(library_id_list_iter_)
+        )
     )
 
+    return get_workflows_from_legacy_workflow_df(df)
+
+
+def get_workflows_from_legacy_workflow_df(df: pd.DataFrame) -> Optional[List['WorkflowRunModelSlim']]:
+    if df.shape[0] == 0:
+        return None
+
     # Coerce workflow names
     df['workflowName'] = df['workflowName'].apply(
         lambda workflow_name_iter_: (
@@ -143,12 +128,6 @@ def get_workflow_run_from_portal_run_id_legacy(portal_run_id: str) -> Optional[L
         lambda portal_run_id_iter_: pd.to_datetime(portal_run_id_iter_[:8]).isoformat() + "Z"
     )
 
-    df['libraries'] = df['libraries'].apply(
-        lambda library_id_list_iter_: (
-            json.loads(library_id_list_iter_)
-        )
-    )
-
     df['libraries'] = df['libraries'].apply(
         lambda library_id_list_iter_: list(map(
             lambda library_id_iter_: ({
@@ -182,6 +161,7 @@ def handler(event, context) -> Dict[str, 'WorkflowRunModelSlim']:
     :return:
     """
     portal_run_id = event['portalRunId']
+    packaging_job_id: Optional[str] = event.get('packagingJobId', None)
 
     try:
         workflow_run: 'WorkflowRun' = get_workflow_run_from_portal_run_id(portal_run_id)
@@ -194,7 +174,7 @@ def handler(event, context) -> Dict[str, 'WorkflowRunModelSlim']:
             "libraries": workflow_run['libraries'],
         }
     except WorkflowRunNotFoundError:
-        workflow_list = get_workflow_run_from_portal_run_id_legacy(portal_run_id)
+        workflow_list = get_workflow_run_from_portal_run_id_legacy(portal_run_id, packaging_job_id)
         if workflow_list is None:
             raise WorkflowRunNotFoundError(
                 f"Workflow with portal run id {portal_run_id} not found in Athena table"
@@ -42,11 +42,11 @@ Secondary Analysis Use Cases:
 2. Given a metadata id AND a list of secondaryAnalysisWorkflowLists, find all secondary analysis objects and share them
 3. Given a list of metadata ids, portal run ids and secondaryAnalysisWorkflowLists, find all secondary analysis objects and share them but share only files in the portal run ids.
 
+Metadata ids are resolved concurrently (each id only once), since project level packages
+may hold hundreds of subjects, each needing its own metadata api calls.
 """
 import typing
-from typing import Optional, List
-from functools import reduce
-from operator import concat
+from typing import Optional, List, Callable
 
 # Layer imports
 from orcabus_api_tools.metadata import (
@@ -57,6 +57,7 @@ from orcabus_api_tools.metadata import (
 from orcabus_api_tools.fastq import (
     get_fastqs_in_library_list
 )
+from data_sharing_tools.utils.concurrency_helpers import map_concurrently, flatten
 
 # Set logging
 import logging
@@ -64,6 +65,7 @@ logger = logging.getLogger()
 logger.setLevel("INFO")
 
 if typing.TYPE_CHECKING:
+    from orcabus_api_tools.metadata import Library
     from data_sharing_tools.utils.models import SecondaryAnalysisDataType, DataType
 
 
@@ -83,6 +85,27 @@ def confirm_input_is_list_str_type(input_variable: Optional[List[str]], input_va
         assert all(isinstance(x, str) for x in input_variable), f"{input_variable_name} must be a list of strings"
 
 
+def list_library_orcabus_ids_in_metadata_id_list(
+        metadata_id_list: List[str],
+        coerce_to_orcabus_id: Callable[[str], str],
+        list_libraries: Callable[[str], List['Library']],
+) -> List[str]:
+    """
+    Resolve the libraries of each subject / individual / project id (or orcabus id) concurrently
+    :param metadata_id_list:
+    :param coerce_to_orcabus_id:
+    :param list_libraries:
+    :return: The unique library orcabus ids, in the order they were first found
+    """
+    return list(dict.fromkeys(map(
+        lambda library_obj_iter_: library_obj_iter_["orcabusId"],
+        flatten(map_concurrently(
+            lambda metadata_id_iter_: list_libraries(coerce_to_orcabus_id(metadata_id_iter_)),
+            metadata_id_list
+        ))
+    )))
+
+
 def handler(event, context):
     """
     Handle the inputs for the aws step function
@@ -132,43 +155,24 @@ def handler(event, context):
     # This is a good litmus test to ensure that all library ids are in the metadata portal
     library_orcabus_id_list = []  # Initialise, since we may not use it if we are using only going off secondary analyses
     if library_id_list is not None:
-        library_orcabus_id_list = list(map(
+        library_orcabus_id_list = list(dict.fromkeys(map_concurrently(
             lambda library_id_iter_: get_library_from_library_id(library_id_iter_)["orcabusId"],
-            list(set(library_id_list))
-        ))
-    if subject_id_list is not None:
-        library_orcabus_id_list = list(set(list(map(
-            lambda library_obj_iter_: library_obj_iter_["orcabusId"],
-            list(reduce(
-                concat,
-                list(map(
-                    lambda subject_iter_: list_libraries_in_subject(coerce_subject_id_or_orcabus_id_to_subject_orcabus_id(subject_iter_)),
-                    subject_id_list
-                ))
-            )),
-        ))))
-    if individual_id_list is not None:
-        library_orcabus_id_list = list(set(list(map(
-            lambda library_obj_iter_: library_obj_iter_["orcabusId"],
-            list(reduce(
-                concat,
-                list(map(
-                    lambda individual_iter_: list_libraries_in_individual(coerce_individual_id_or_orcabus_id_to_individual_orcabus_id(individual_iter_)),
-                    individual_id_list
-                ))
-            )),
-        ))))
-    if project_id_list is not None:
-        library_orcabus_id_list = list(set(list(map(
-            lambda library_obj_iter_: library_obj_iter_["orcabusId"],
-            list(reduce(
-                concat,
-                list(map(
-                    lambda project_iter_: list_libraries_in_project(coerce_project_id_or_orcabus_id_to_project_orcabus_id(project_iter_)),
-                    project_id_list
-                ))
-            )),
-        ))))
+            library_id_list
+        )))
+
+    # Subject, individual and project ids (or orcabus ids) are first coerced to orcabus ids, then listed
+    for metadata_id_list, coerce_to_orcabus_id, list_libraries in [
+        (subject_id_list, coerce_subject_id_or_orcabus_id_to_subject_orcabus_id, list_libraries_in_subject),
+        (individual_id_list, coerce_individual_id_or_orcabus_id_to_individual_orcabus_id, list_libraries_in_individual),
+        (project_id_list, coerce_project_id_or_orcabus_id_to_project_orcabus_id, list_libraries_in_project),
+    ]:
+        if metadata_id_list is not None:
+            library_orcabus_id_list = list_library_orcabus_ids_in_metadata_id_list(
+                metadata_id_list,
+                coerce_to_orcabus_id,
+                list_libraries
+            )
+
     # Coerce data types
     if data_type_list is None:
         logger.error("Data type list must be provided")
@@ -8,101 +8,67 @@ List portal run ids from the library.
 
 We also retrieve the portal run id exclusion list, so we filter out any portal run ids
 that are in the exclusion list.
+
+Legacy workflows are read from the rows resolved for the whole package by the resolve legacy workflows lambda,
+we only query athena for this library if these have not been resolved.
 """
 
 import typing
-from io import BytesIO
-from os import environ
 from textwrap import dedent
-from time import sleep
-from typing import List, Dict, Tuple
-from urllib.parse import urlparse
+from typing import List, Dict, Optional
 
 import pandas as pd
 
-import boto3
 import ulid
 
 from data_sharing_tools.utils.models import WorkflowRunModelSlim
+from data_sharing_tools.utils.athena_helpers import run_athena_sql_query
+from data_sharing_tools.utils.legacy_workflow_helpers import load_legacy_workflow_rows
 from orcabus_api_tools.workflow import (
     get_workflows_from_library_id
 )
 
 if typing.TYPE_CHECKING:
     from orcabus_api_tools.metadata import Library
-    from mypy_boto3_athena import AthenaClient
-    from mypy_boto3_s3 import S3Client
 
 # Globals
-# ATHENA
-WORKGROUP_ENV_VAR = 'ATHENA_WORKGROUP_NAME'
-DATA_SOURCE_ENV_VAR = 'ATHENA_DATASOURCE_NAME'
-DATABASE_ENV_VAR = 'ATHENA_DATABASE_NAME'
-
 WORKFLOW_NAME_CONVERSION_MAP = {
     "tumor-normal": "WGS_TUMOR_NORMAL",
     "oncoanalyser_wgs": "oncoanalyser-wgts-dna",
 }
 
 
-def get_athena_client() -> 'AthenaClient':
-    return boto3.client('athena')
-
-
-def get_s3_client() -> 'S3Client':
-    return boto3.client('s3')
-
-
-def get_bucket_key_tuple_from_s3_uri(s3_uri: str) -> Tuple[str, str]:
-    urlobj = urlparse(s3_uri)
-
-    return urlobj.netloc, urlobj.path.lstrip('/')
-
-
-def run_athena_sql_query(sql_query: str) -> pd.DataFrame:
-    athena_query_execution_id = get_athena_client().start_query_execution(
-        QueryString=sql_query,
-        QueryExecutionContext={
-            "Database": environ[DATABASE_ENV_VAR],
-            "Catalog": environ[DATA_SOURCE_ENV_VAR]
-        },
-        WorkGroup=environ[WORKGROUP_ENV_VAR],
-    )['QueryExecutionId']
-
-    while True:
-        status = get_athena_client().get_query_execution(
-            QueryExecutionId=athena_query_execution_id
-        )['QueryExecution']['Status']['State']
-
-        if status in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-            break
-
-        sleep(5)
-
-    if status in ['FAILED', 'CANCELLED']:
-        raise RuntimeError(f"Query failed: {status}")
-
-    # Get the results
-    result_location = get_athena_client().get_query_execution(
-        QueryExecutionId=athena_query_execution_id
-    )['QueryExecution']['ResultConfiguration']['OutputLocation']
-
-    bucket, key = get_bucket_key_tuple_from_s3_uri(result_location)
-
-    return pd.read_csv(
-        BytesIO(
-            get_s3_client().get_object(
-                Bucket=bucket,
-                Key=key
-            )['Body'].read()
-        ),
-        dtype={
-            "portalRunId": "object"
-        }
-    )
-
+def get_legacy_workflows_df_from_packaging_job(packaging_job_id: str, library_id: str) -> Optional[pd.DataFrame]:
+    """
+    Get the legacy workflows of a library from the rows resolved for its packaging job
+    :param packaging_job_id:
+    :param library_id:
+    :return: None if the legacy workflows of this job have not been resolved
+    """
+    legacy_workflow_rows = load_legacy_workflow_rows(packaging_job_id)
+    if legacy_workflow_rows is None:
+        return None
+
+    return pd.DataFrame(
+        list(filter(
+            lambda row_iter_: row_iter_['libraryId'] == library_id,
+            legacy_workflow_rows
+        )),
+        columns=['portalRunId', 'workflowName', 'workflowVersion', 'libraryId']
+    ).drop(
+        columns='libraryId'
+    ).drop_duplicates()
+
+
+def get_legacy_workflows_from_library_id_legacy(
+        library_id: str,
+        packaging_job_id: Optional[str] = None
+) -> List[WorkflowRunModelSlim]:
+    if packaging_job_id is not None:
+        df = get_legacy_workflows_df_from_packaging_job(packaging_job_id, library_id)
+        if df is not None:
+            return get_workflows_from_legacy_workflows_df(df)
 
-def get_legacy_workflows_from_library_id_legacy(library_id: str) -> List[WorkflowRunModelSlim]:
     workflow_query = dedent(
         """
         SELECT
@@ -111,15 +77,20 @@ def get_legacy_workflows_from_library_id_legacy(library_id: str) -> List[Workflo
             workflow_version AS workflowVersion
         FROM workflow
         WHERE (
-            library_id IN ('{__LIBRARY_ID__}')
+            library_id = ?
         )
-        """.format(
-            __LIBRARY_ID__=library_id
+        """
+    )
+
+    return get_workflows_from_legacy_workflows_df(
+        pd.DataFrame(
+            run_athena_sql_query(workflow_query, parameters=[library_id]),
+            columns=['portalRunId', 'workflowName', 'workflowVersion']
         )
     )
 
-    df = run_athena_sql_query(workflow_query)
 
+def get_workflows_from_legacy_workflows_df(df: pd.DataFrame) -> List[WorkflowRunModelSlim]:
     if df.shape[0] == 0:
         return []
 
@@ -168,6 +139,7 @@ def handler(event, context) -> Dict[str, List[str]]:
 
     # Get library object
     library: 'Library' = event['libraryObject']
+    packaging_job_id: Optional[str] = event.get('packagingJobId', None)
     portal_run_id_exclusion_list: List[str] = event['portalRunIdExclusionList']
     secondary_analyses_type_list: List[str] = event['secondaryAnalysisTypeList']
 
@@ -184,7 +156,7 @@ def handler(event, context) -> Dict[str, List[str]]:
     ))
 
     # Query the datamart for legacy workflows
-    workflows_list.extend(get_legacy_workflows_from_library_id_legacy(library['libraryId']))
+    workflows_list.extend(get_legacy_workflows_from_library_id_legacy(library['libraryId'], packaging_job_id))
 
     # Run athena query to get legacy workflows in the library
 
@@ -1,18 +1,25 @@
 import json
-import urllib.request
 import boto3
+from functools import lru_cache
+import urllib.request
 
 
 from orcabus_api_tools.data_sharing import get_data_sharing_url
 from orcabus_api_tools.utils.requests_helpers import get_request
 
 
+@lru_cache(maxsize=None)
+def get_secretsmanager_client():
+    # Created once and reused for the lifetime of the container
+    return boto3.client("secretsmanager")
+
+
 def _get_slack_bot_token():
-    _sm = boto3.client("secretsmanager")
+    _sm = get_secretsmanager_client()
     return _sm.get_secret_value(SecretId="auto-data-sharing-slack-bot-token")["SecretString"] # pragma: allowlist secret
 
 def _get_slack_channel_id() -> str:
-    resp = boto3.client("secretsmanager").get_secret_value(
+    resp = get_secretsmanager_client().get_secret_value(
         SecretId="auto-data-sharing-slack-config"  # pragma: allowlist secret
     )
     secret_str = resp["SecretString"]
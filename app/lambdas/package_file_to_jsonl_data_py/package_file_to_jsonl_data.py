@@ -1,31 +1,39 @@
 #!/usr/bin/env python3
 
 """
-Either 'count' the number of s3 steps copy we will generate
-OR 'generate' the jsonl and upload to s3 for the given package / file.
+Generate the s3 steps copy jsonl manifests for the given package and upload them to s3.
+
+Files are bin-packed by size (and object count) into shards, one manifest per shard,
+so that each shard can be copied by its own s3 steps copy execution in parallel.
+
+In delta mode, files already at the destination (matched by relative path, size and, where comparable, eTag)
+are left out of the manifests, so a re-push only copies what is missing or has changed.
 """
 # Imports
-import typing
+from typing import List, Optional, Dict, Any
 from pathlib import Path
 from urllib.parse import urlparse
-import pandas as pd
 import re
-from tempfile import NamedTemporaryFile
-import boto3
 
 # Layer imports
-from data_sharing_tools.utils.dynamodb_helpers import query_dynamodb_table
-
-if typing.TYPE_CHECKING:
-    from mypy_boto3_s3 import S3Client
-
+from data_sharing_tools.utils.manifest_helpers import load_package_manifest
+from data_sharing_tools.utils.s3_helpers import list_s3_objects_in_folders
+from data_sharing_tools.utils.steps_copy_manifest_helpers import (
+    get_destination_relative_folder_key,
+    upload_steps_copy_jsonl_manifest,
+)
+from data_sharing_tools.utils.shard_helpers import (
+    DEFAULT_MAX_SHARD_COUNT,
+    get_shard_count,
+    assign_shards,
+)
 
 PORTAL_REGEX = re.compile(
     r"\d{8}[0-9a-f]{8}"
 )
 
 
-def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
+def get_data_from_dynamodb(job_id: str, context: str, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Given a job id, query the dynamodb table to get all data that belongs to that job id for that given data type,
     where data type is one of:
@@ -35,15 +43,14 @@ def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
      * files
     :param job_id:
     :param context:
+    :param columns: Only collect these attributes of each record
     :return:
     """
 
-    # If not library, we grab the metadata anyway since we merge it on the other data types.
-    return pd.DataFrame(
-        query_dynamodb_table(
-            job_id,
-            context
-        )
+    return load_package_manifest(
+        job_id,
+        context,
+        columns=columns
     )
 
 
@@ -60,19 +67,116 @@ def get_instrument_run_id_from_relative_path(relative_path: Path) -> str:
     return relative_path.parts[1]
 
 
-def handler(event, context) -> dict[str, str]:
+def get_shard_key(s3_steps_copy_key: str, shard_id: str) -> str:
+    """
+    Place the shard id before the suffix of the s3 steps copy key, i.e.
+    prefix/package_list.jsonl -> prefix/package_list.shard_0001.jsonl
+    :param s3_steps_copy_key:
+    :param shard_id:
+    :return:
+    """
+    key_prefix, slash, key_name = s3_steps_copy_key.rpartition("/")
+    key_stem, dot, key_suffix = key_name.rpartition(".")
+    if not dot:
+        key_stem, key_suffix = key_name, ""
+    return f"{key_prefix}{slash}{key_stem}.{shard_id}{dot}{key_suffix}"
+
+
+def get_size(size: Any) -> int:
+    # Missing or malformed sizes count as empty files
+    try:
+        return int(size)
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_normalised_etag(etag: Optional[str]) -> str:
+    return str(etag or "").strip('"')
+
+
+def is_file_unchanged_at_destination(
+        file_object: Dict[str, Any],
+        destination_summary: Optional[Dict[str, Any]]
+) -> bool:
+    """
+    A file is unchanged if the sizes match and, where both are single part uploads, the eTags match too.
+    Multipart eTags depend on the part size of the copy, so we cannot compare these across buckets.
+    :param file_object:
+    :param destination_summary:
+    :return:
+    """
+    if destination_summary is None or destination_summary['size'] != file_object['size']:
+        return False
+
+    source_etag = get_normalised_etag(file_object.get("eTag"))
+    destination_etag = get_normalised_etag(destination_summary['eTag'])
+    if (
+        source_etag == "" or destination_etag == "" or
+        "-" in source_etag or "-" in destination_etag
+    ):
+        return True
+
+    return source_etag == destination_etag
+
+
+def drop_files_present_at_destination(
+        file_object_list: List[Dict[str, Any]],
+        destination_bucket: str,
+        destination_prefix: str
+) -> List[Dict[str, Any]]:
+    """
+    Drop the files that have already been pushed to the destination.
+
+    s3 steps copy places each object, under its own name, in its destination relative folder,
+    so we list each of these folders (concurrently) and match on the destination key.
+    :param file_object_list: File objects with their destinationRelativeFolderKey
+    :param destination_bucket:
+    :param destination_prefix:
+    :return: The files that are missing or have changed at the destination
+    """
+    destination_folder_list = list(map(
+        lambda file_object_iter_: destination_prefix + file_object_iter_['destinationRelativeFolderKey'].removeprefix("./"),
+        file_object_list
+    ))
+
+    destination_summaries_by_key = list_s3_objects_in_folders(
+        destination_bucket,
+        list(dict.fromkeys(destination_folder_list))
+    )
+
+    return list(map(
+        lambda zip_iter_: zip_iter_[0],
+        filter(
+            lambda zip_iter_: not is_file_unchanged_at_destination(
+                zip_iter_[0],
+                destination_summaries_by_key.get(zip_iter_[1] + zip_iter_[0]['key'].rpartition("/")[2], None)
+            ),
+            zip(file_object_list, destination_folder_list)
+        )
+    ))
+
+
+def handler(event, context) -> dict[str, Any]:
     """
     Given the following inputs:
-      * jobId
+      * packagingJobId
       * pushLocation
+      * s3StepsCopyBucket
+      * s3StepsCopyKey
+      * maxShardCount (optional)
+      * deltaPush (optional), only push the files that are missing or have changed at the destination
 
     Generate the following outputs:
-      * destinationAndSourceUriMappingsList
+      * destinationBucket
+      * destinationPrefix
+      * shardList, a list of {shardId, s3StepsCopyKey, s3StepsCopyKeyName, fileCount, totalSizeBytes}
+      * skippedFileCount, skippedSizeBytes, the files already present at the destination (delta push only)
 
     This performs the following:
     * Queries the files in the dynamodb database for this packaging job id
-    * For each subfolder, it generates a destination and source uri mapping based on a common parent location
-    * Returns the destination and source uri mappings list for each folder
+    * For a delta push, drops the files already present at the destination
+    * Bin-packs the files into shards by size and object count
+    * Uploads one s3 steps copy jsonl manifest per shard
     :param event:
     :param context:
     :return:
@@ -83,6 +187,8 @@ def handler(event, context) -> dict[str, str]:
     push_location: str = event.get("pushLocation")
     s3_steps_copy_bucket: str = event.get("s3StepsCopyBucket", None)
     s3_steps_copy_key: str = event.get("s3StepsCopyKey", None)
+    max_shard_count: int = int(event.get("maxShardCount", DEFAULT_MAX_SHARD_COUNT))
+    delta_push: bool = event.get("deltaPush", False) or False
 
     # Check if the jobId and pushLocation are provided
     if not packaging_job_id or not push_location:
@@ -99,50 +205,90 @@ def handler(event, context) -> dict[str, str]:
     if not push_location_url_obj.path:
         raise ValueError(f"Error: pushLocation must be a valid s3 url, {push_location} does not have a path")
 
-    # Get the data from DynamoDB
-    data_df = get_data_from_dynamodb(
-        job_id=packaging_job_id,
-        context="file"
+    destination_bucket = push_location_url_obj.netloc
+    destination_prefix = (
+        ( str(Path(push_location_url_obj.path)).lstrip("/") + '/' )
+        if not push_location_url_obj.path == "/" else ""
     )
 
-    # Okay we mean business and were uploading
-    s3_client: S3Client = boto3.client("s3")
+    # Get the data from DynamoDB
+    if delta_push:
+        # The eTag is not a projected attribute, so read it from the record content
+        file_object_list = get_data_from_dynamodb(
+            job_id=packaging_job_id,
+            context="file",
+        )
+    else:
+        file_object_list = get_data_from_dynamodb(
+            job_id=packaging_job_id,
+            context="file",
+            columns=["bucket", "key", "relativePath", "size"]
+        )
 
-    data_df["relativePathPrefix"] = data_df["relativePath"].apply(
-        lambda rel_path_iter_: str(Path(rel_path_iter_).parent) + "/"
-    )
+    file_object_list = list(map(
+        lambda file_object_iter_: {
+            "bucket": file_object_iter_['bucket'],
+            "key": file_object_iter_['key'],
+            "relativePath": file_object_iter_['relativePath'],
+            "destinationRelativeFolderKey": get_destination_relative_folder_key(file_object_iter_['relativePath']),
+            "size": get_size(file_object_iter_.get("size", None)),
+            "eTag": file_object_iter_.get("eTag", None),
+        },
+        file_object_list
+    ))
 
-    # Now generate the jsonl data
-    with NamedTemporaryFile(suffix=".jsonl") as temp_file:
-        data_df[[
-            "bucket",
-            "key",
-            "relativePathPrefix"
-        ]].rename(
-            columns={
-                "bucket": "sourceBucket",
-                "key": "sourceKey",
-                "relativePathPrefix": "destinationRelativeFolderKey"
-            }
-        ).to_json(
-            temp_file,
-            orient="records",
-            lines=True
-        )
+    shard_list: List[Dict[str, Any]] = []
+    skipped_file_count = 0
+    skipped_size_bytes = 0
 
-        temp_file.flush()
+    if delta_push and len(file_object_list) > 0:
+        delta_file_object_list = drop_files_present_at_destination(
+            file_object_list, destination_bucket, destination_prefix
+        )
+        skipped_file_count = len(file_object_list) - len(delta_file_object_list)
+        skipped_size_bytes = (
+            sum(map(lambda file_object_iter_: file_object_iter_['size'], file_object_list)) -
+            sum(map(lambda file_object_iter_: file_object_iter_['size'], delta_file_object_list))
+        )
+        file_object_list = delta_file_object_list
 
-        # Upload the file to S3
-        s3_client.upload_file(
-            Bucket=s3_steps_copy_bucket,
-            Key=s3_steps_copy_key,
-            Filename=temp_file.name
+    if len(file_object_list) > 0:
+        # Bin-pack the files into shards
+        size_list = list(map(lambda file_object_iter_: file_object_iter_['size'], file_object_list))
+        shard_index_list = assign_shards(
+            size_list,
+            shard_count=get_shard_count(size_list, max_shard_count=max_shard_count),
         )
 
+        # Group the files by shard, keeping the files of each shard in package order
+        file_objects_by_shard_index: Dict[int, List[Dict[str, Any]]] = {}
+        for file_object_iter_, shard_index_iter_ in zip(file_object_list, shard_index_list):
+            file_objects_by_shard_index.setdefault(shard_index_iter_, []).append(file_object_iter_)
+
+        for shard_number, shard_index in enumerate(sorted(file_objects_by_shard_index.keys()), start=1):
+            shard_file_object_list = file_objects_by_shard_index[shard_index]
+            shard_id = f"shard_{shard_number:04d}"
+            shard_key = get_shard_key(s3_steps_copy_key, shard_id)
+
+            # Stream the jsonl data to s3
+            upload_steps_copy_jsonl_manifest(
+                shard_file_object_list,
+                bucket=s3_steps_copy_bucket,
+                key=shard_key,
+            )
+
+            shard_list.append({
+                "shardId": shard_id,
+                "s3StepsCopyKey": shard_key,
+                "s3StepsCopyKeyName": Path(shard_key).name,
+                "fileCount": len(shard_file_object_list),
+                "totalSizeBytes": sum(map(lambda file_object_iter_: file_object_iter_['size'], shard_file_object_list)),
+            })
+
     return {
-        "destinationBucket": push_location_url_obj.netloc,
-        "destinationPrefix": (
-            ( str(Path(push_location_url_obj.path)).lstrip("/") + '/' )
-            if not push_location_url_obj.path == "/" else ""
-        ),
+        "destinationBucket": destination_bucket,
+        "destinationPrefix": destination_prefix,
+        "shardList": shard_list,
+        "skippedFileCount": skipped_file_count,
+        "skippedSizeBytes": skipped_size_bytes,
     }
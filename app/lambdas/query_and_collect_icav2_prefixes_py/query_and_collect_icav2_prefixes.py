@@ -5,26 +5,41 @@ Given a job id, and a location uri:
 
 - Query the DynamoDB table to get the data
 - Collect the destination and source uri mappings
+
+Files are grouped into items, one per instrument run id (primary data) then one per portal run id (secondary analysis).
+The items are computed once, on the countOnly invocation, and written as a push plan
+(see data_sharing_tools.utils.push_plan_helpers), so each paginationIndex invocation is a lookup of a single item.
 """
 
 # Standard imports
-from typing import List, Dict
+from typing import List, Dict, Optional, Any, Iterator
 import pandas as pd
-from urllib.parse import urlparse
+from urllib.parse import urlparse, ParseResult
 from pathlib import Path
-import re
 
 # Layer imports
-from data_sharing_tools.utils.dynamodb_helpers import query_dynamodb_table
+from data_sharing_tools.utils.manifest_helpers import load_package_manifest
+from data_sharing_tools.utils.push_plan_helpers import (
+    get_push_plan_index,
+    read_push_plan_slice,
+    write_push_plan,
+)
 
 
 # Globals
-PORTAL_REGEX = re.compile(
-    r"\d{8}[0-9a-f]{8}"
-)
+# The first folder (of the parent path) that starts with a portal run id
+PORTAL_RUN_ID_FOLDER_REGEX = r"(?:^|/)(\d{8}[0-9a-f]{8}[^/]*)/"
+# The second folder of the parent path
+INSTRUMENT_RUN_ID_FOLDER_REGEX = r"^[^/]*/([^/]+)/"
+
+PUSH_PLAN_NAME = "icav2-prefixes"
+
+# Primary data items come before secondary analysis items
+PRIMARY_ITEM_RANK = 0
+SECONDARY_ITEM_RANK = 1
 
 
-def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
+def get_data_from_dynamodb(job_id: str, context: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Given a job id, query the dynamodb table to get all data that belongs to that job id for that given data type,
     where data type is one of:
@@ -34,34 +49,88 @@ def get_data_from_dynamodb(job_id: str, context: str) -> pd.DataFrame:
      * files
     :param job_id:
     :param context:
+    :param columns: Only collect these attributes of each record
     :return:
     """
 
     # If not library, we grab the metadata anyway since we merge it on the other data types.
     return pd.DataFrame(
-        query_dynamodb_table(
+        load_package_manifest(
             job_id,
-            context
+            context,
+            columns=columns
         )
     )
 
 
-def get_portal_run_id_from_relative_path(relative_path: Path) -> str:
-    # Get key relative to portal run id
-    return next(filter(
-        lambda part_iter_: PORTAL_REGEX.match(part_iter_) is not None,
-        relative_path.parts
-    ))
+def get_destination_uri(push_location_url_obj: ParseResult, relative_parent: str) -> str:
+    destination_path = str(Path(push_location_url_obj.path).joinpath(relative_parent)).lstrip("/")
+    return f"{push_location_url_obj.scheme}://{push_location_url_obj.netloc}/{destination_path}/"
+
+
+def iter_icav2_push_items(job_id: str, push_location_url_obj: ParseResult) -> Iterator[Dict[str, Any]]:
+    """
+    Group the files of a package by instrument run id (primary data) or portal run id (secondary analysis),
+    then by parent folder
+    :param job_id:
+    :param push_location_url_obj:
+    :return: One item per run id, sorted by run id, primary data first
+    """
+    # Get the data from DynamoDB
+    data_df = get_data_from_dynamodb(
+        job_id=job_id,
+        context="file",
+        columns=["bucket", "key", "relativePath"]
+    )
 
+    if data_df.empty:
+        return
 
-def get_instrument_run_id_from_relative_path(relative_path: Path) -> str:
-    # Instrument run id will be the second part of the relative path
-    return relative_path.parts[1]
+    # Get the portal run id by the relative path (for secondary analysis)
+    # and the instrument run id by the relative path (for primary data)
+    is_secondary = data_df["relativePath"].str.startswith("secondary-analysis")
+    is_primary = data_df["relativePath"].str.startswith("fastq")
+    data_df = data_df.assign(
+        itemRank=is_secondary.map({False: PRIMARY_ITEM_RANK, True: SECONDARY_ITEM_RANK}),
+        itemId=(
+            data_df["relativePath"].str.extract(INSTRUMENT_RUN_ID_FOLDER_REGEX, expand=False).where(
+                is_primary,
+                data_df["relativePath"].str.extract(PORTAL_RUN_ID_FOLDER_REGEX, expand=False).where(is_secondary)
+            )
+        ),
+        # Get the relative path parent and source uri for each file
+        relativeParent=data_df["relativePath"].str.rpartition("/")[0] + "/",
+        sourceUri="s3://" + data_df["bucket"] + "/" + data_df["key"],
+    ).dropna(subset=["itemId"])
+
+    # Groupby run id and parent paths (sorted)
+    mappings_df = (
+        data_df.groupby(["itemRank", "itemId", "relativeParent"], sort=True)["sourceUri"].
+        agg(list).
+        reset_index().
+        rename(columns={"sourceUri": "sourceUriList"})
+    )
+    mappings_df["destinationUri"] = mappings_df["relativeParent"].map(
+        lambda relative_parent_iter_: get_destination_uri(push_location_url_obj, relative_parent_iter_)
+    )
 
+    for (_, item_id), item_df in mappings_df.groupby(["itemRank", "itemId"], sort=False):
+        yield {
+            "itemId": item_id,
+            "destinationAndSourceUriMappingsList": item_df[["destinationUri", "sourceUriList"]].to_dict("records"),
+        }
 
 
 def handler(event, context):
     """
+    Given the following inputs:
+      * packagingJobId
+      * pushLocation
+      * countOnly (optional)
+      * paginationIndex (the item index, required if countOnly is not set)
+
+    On a countOnly invocation, the items are written to the push plan and only the count is returned.
+    Paginated invocations read their item from the push plan (writing the plan first if it does not exist yet).
     :param event:
     :param context:
     :return:
@@ -88,90 +157,42 @@ def handler(event, context):
     if not push_location_url_obj.path:
         raise ValueError(f"Error: pushLocation must be a valid icav2 url, {push_location} does not have a path")
 
-    # Initialize the destination and source uri mappings list
-    destination_and_source_uri_mappings_list: List[Dict[str, str]] = []
-
-    # Get the data from DynamoDB
-    data_df = get_data_from_dynamodb(
-        job_id=job_id,
-        context="file"
-    )
-
-    # Calculate the relative parent path for all source files
-    # Get the portal run id by the relative path (for secondary analysis)
-    data_df["portalRunId"] = data_df.apply(
-        lambda row_iter_: (
-            get_portal_run_id_from_relative_path(Path(row_iter_['relativePath']).parent)
-            if row_iter_['relativePath'].startswith("secondary-analysis")
-            else None
-        ),
-        axis='columns'
-    )
-
-    data_df["instrumentRunId"] = data_df.apply(
-        lambda row_iter_: (
-            get_instrument_run_id_from_relative_path(Path(row_iter_['relativePath']).parent)
-            if row_iter_['relativePath'].startswith("fastq")
-            else None
-        ),
-        axis='columns'
-    )
+    if not count_only and pagination_index is None:
+        raise ValueError("paginationIndex is required if countOnly is not set")
 
-    # Group by parent path and collect the relative paths
-    secondary_data_df = data_df.query("~portalRunId.isnull()", engine='python')
-    primary_data_df = data_df.query("~instrumentRunId.isnull()", engine='python')
+    # The count only invocation is the first of a push, so (re)compute the plan here
+    push_plan_index = None
+    if not count_only:
+        push_plan_index = get_push_plan_index(job_id, PUSH_PLAN_NAME, push_location)
 
-    # Get the number of primary data folders
-    items_list = (
-            sorted(primary_data_df['instrumentRunId'].unique().tolist()) +
-            sorted(secondary_data_df['portalRunId'].unique().tolist())
-    )
+    if push_plan_index is None:
+        push_plan_index = write_push_plan(
+            job_id,
+            PUSH_PLAN_NAME,
+            push_location,
+            iter_icav2_push_items(job_id, push_location_url_obj)
+        )
 
-    # If count only is true, return the count of the destination and source uri mappings list
+    # If count only is true, return the count of the items
     if count_only:
         return {
-            "listCount": len(items_list)
+            "listCount": push_plan_index['recordCount']
         }
 
-    if pagination_index < len(sorted(primary_data_df['instrumentRunId'].unique().tolist())):
-        instrument_run_id = sorted(primary_data_df['instrumentRunId'].unique().tolist())[pagination_index]
-        data_df = primary_data_df.query("instrumentRunId == @instrument_run_id")
-        # Get the relative path parent for each file
-        data_df["relativeParent"] = data_df['relativePath'].apply(
-            lambda relative_path_iter_: str(Path(relative_path_iter_).parent) + "/"
-        )
-    else:
-        pagination_index -= len(sorted(primary_data_df['instrumentRunId'].unique().tolist()))
-        portal_run_id = sorted(secondary_data_df['portalRunId'].unique().tolist())[pagination_index]
-        data_df = secondary_data_df.query("portalRunId == @portal_run_id")
-        # Get the relative path parent for each file
-        data_df["relativeParent"] = data_df['relativePath'].apply(
-            lambda relative_path_iter_: str(Path(relative_path_iter_).parent) + "/"
+    if not 0 <= pagination_index < push_plan_index['recordCount']:
+        raise ValueError(
+            f"paginationIndex {pagination_index} is out of range, there are {push_plan_index['recordCount']} items"
         )
 
-
-    # Groupby parent paths
-    for parent_path, parent_path_group_df in data_df.groupby("relativeParent"):
-        # Get the destination uri
-        destination_uri = f"{push_location_url_obj.scheme}://{push_location_url_obj.netloc}/{str(Path(push_location_url_obj.path).joinpath(parent_path)).lstrip("/")}/"
-
-        # Get the source uris
-        source_uris = parent_path_group_df[[
-            'bucket',
-            'key'
-        ]].apply(
-            lambda row_iter_: f"s3://{row_iter_['bucket']}/{row_iter_['key']}",
-            axis='columns'
-        ).tolist()
-
-        # Append the destination and source uri mappings to the list
-        destination_and_source_uri_mappings_list.append({
-            "destinationUri": destination_uri,
-            "sourceUriList": source_uris
-        })
-
     return {
-        "destinationAndSourceUriMappingsList": destination_and_source_uri_mappings_list,
+        "destinationAndSourceUriMappingsList": read_push_plan_slice(
+            job_id,
+            PUSH_PLAN_NAME,
+            push_location,
+            push_plan_index,
+            start=pagination_index,
+            end=pagination_index
+        )[0]["destinationAndSourceUriMappingsList"],
     }
 
 # if __name__ == "__main__":
@@ -179,7 +200,7 @@ def handler(event, context):
 #
 #     environ['AWS_PROFILE'] = 'umccr-production'
 #     environ['PACKAGING_TABLE_NAME'] = 'DataSharingPackagingLookupTable'
-#     environ['CONTENT_INDEX_NAME'] = 'content'
+#     environ['CONTENT_INDEX_NAME'] = 'content_attributes'
 #     environ['ICAV2_ACCESS_TOKEN_SECRET_ID'] = 'ICAv2JWTKey-umccr-prod-service-production'
 #
 #     print(
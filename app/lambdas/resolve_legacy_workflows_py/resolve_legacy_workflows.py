@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+SFN LAMBDA PLACEHOLDER: __resolve_legacy_workflows_lambda_function_arn__
+
+Resolve the legacy (datamart) workflows of every library (and requested portal run) in a package,
+with one athena query per chunk of ids rather than one per library / portal run.
+
+The rows are written alongside the package manifests,
+where the list portal run ids in library and get workflow from portal run id lambdas read them.
+"""
+
+# Standard imports
+from typing import List, Optional
+
+# Layer imports
+from data_sharing_tools.utils.dynamodb_helpers import query_dynamodb_table
+from data_sharing_tools.utils.legacy_workflow_helpers import (
+    query_legacy_workflow_rows,
+    write_legacy_workflow_rows,
+)
+
+
+def handler(event, context):
+    """
+    Given the following inputs:
+      * packagingJobId
+      * portalRunIdList (optional), portal run ids requested explicitly
+
+    Generate the following outputs:
+      * libraryCount
+      * portalRunCount, the number of legacy portal runs found
+      * rowCount
+    :param event:
+    :param context:
+    :return:
+    """
+    packaging_job_id: str = event.get("packagingJobId")
+    portal_run_id_list: Optional[List[str]] = event.get("portalRunIdList", None) or []
+
+    if not packaging_job_id:
+        raise ValueError("packagingJobId is required")
+
+    library_id_list = list(map(
+        lambda library_iter_: library_iter_['libraryId'],
+        query_dynamodb_table(packaging_job_id, "library")
+    ))
+
+    rows = query_legacy_workflow_rows(library_id_list, portal_run_id_list)
+
+    write_legacy_workflow_rows(packaging_job_id, rows)
+
+    return {
+        "libraryCount": len(library_id_list),
+        "portalRunCount": len(set(map(lambda row_iter_: row_iter_['portalRunId'], rows))),
+        "rowCount": len(rows),
+    }
@@ -7,10 +7,16 @@ Use the filemanager tools layer to update the ingest id for a file.
 
 We have to do this for each file in the ingest.
 
+Given an s3UriAndIngestIdList (of {s3Uri, ingestId} objects) instead, update each file in the list,
+with the filemanager calls run concurrently, so a page of files is a single invocation.
+
 """
 
 # Standard imports
-from typing import Dict
+from typing import Dict, List, Tuple, Union
+
+# Layer imports
+from data_sharing_tools import map_concurrently
 
 # OrcaBus imports
 from orcabus_api_tools.filemanager import (
@@ -18,17 +24,13 @@ from orcabus_api_tools.filemanager import (
 )
 
 
-def handler(event, context) -> Dict[str, bool]:
+def update_ingest_id_for_s3_uri(s3_uri_and_ingest_id: Tuple[str, str]) -> bool:
     """
-    Not a trivial task, we first need to match the ingest id to the file id
-    and then update the ingest id for the file.
-    Therefore we get all fastqIds from the top-level map, and to match to the bucket, key prefix provided in the bottom-level map.
-    :param event:
-    :param context:
-    :return:
+    Update the ingest id of the file at the s3 uri, if it does not already match
+    :param s3_uri_and_ingest_id:
+    :return: True if the ingest id was updated
     """
-    ingest_id = event["ingestId"]
-    s3_uri = event["s3Uri"]
+    s3_uri, ingest_id = s3_uri_and_ingest_id
 
     # Get the file id from the file manager
     file_manager_file_object = get_file_object_from_s3_uri(
@@ -42,8 +44,35 @@ def handler(event, context) -> Dict[str, bool]:
         ingest_id_updated_complete = True
         update_ingest_id(file_manager_file_object['s3ObjectId'], ingest_id)
 
+    return ingest_id_updated_complete
+
+
+def handler(event, context) -> Dict[str, Union[bool, List[bool]]]:
+    """
+    Not a trivial task, we first need to match the ingest id to the file id
+    and then update the ingest id for the file.
+    Therefore we get all fastqIds from the top-level map, and to match to the bucket, key prefix provided in the bottom-level map.
+    :param event:
+    :param context:
+    :return:
+    """
+    # Batch invocation
+    if "s3UriAndIngestIdList" in event:
+        return {
+            "ingestIdUpdatedCompleteList": map_concurrently(
+                update_ingest_id_for_s3_uri,
+                list(map(
+                    lambda s3_uri_and_ingest_id_iter_: (
+                        s3_uri_and_ingest_id_iter_["s3Uri"],
+                        s3_uri_and_ingest_id_iter_["ingestId"],
+                    ),
+                    event["s3UriAndIngestIdList"]
+                ))
+            )
+        }
+
     return {
-        "ingestIdUpdatedComplete": ingest_id_updated_complete
+        "ingestIdUpdatedComplete": update_ingest_id_for_s3_uri((event["s3Uri"], event["ingestId"]))
     }
 
 
@@ -22,7 +22,6 @@ This involves:
 # Standard library imports
 import typing
 from urllib.parse import urlparse
-import boto3
 from pathlib import Path
 from datetime import datetime
 from tempfile import TemporaryDirectory
@@ -38,7 +37,8 @@ from pyarrow import LargeStringScalar
 from orcabus_api_tools.data_sharing import get_push_job
 
 # Data Sharing layer imports
-from data_sharing_tools.utils.dynamodb_helpers import query_dynamodb_table
+from data_sharing_tools.utils.manifest_helpers import load_package_manifest
+from data_sharing_tools.utils.aws_helpers import get_boto3_client
 
 # Type checking imports
 if typing.TYPE_CHECKING:
@@ -46,7 +46,7 @@ if typing.TYPE_CHECKING:
 
 
 def get_s3_client() -> 'S3Client':
-    return boto3.client('s3')
+    return get_boto3_client('s3')
 
 
 def get_bucket_key_tuple_from_uri(uri: str) -> Tuple[str, str]:
@@ -62,24 +62,24 @@ def get_data(packaging_job_id, context) -> Dict[
     # Get the library information
     return {
         # Library information
-        "library": pd.DataFrame(query_dynamodb_table(
+        "library": pd.DataFrame(load_package_manifest(
             job_id=packaging_job_id,
             context="library"
         )).to_dict(orient='records'),
         # Get the fastq information
-        "fastq": pd.DataFrame(query_dynamodb_table(
+        "fastq": pd.DataFrame(load_package_manifest(
             job_id=packaging_job_id,
             context="fastq"
         )).to_dict(orient='records'),
         # Get the workflow information
-        "workflow": pd.DataFrame(query_dynamodb_table(
+        "workflow": pd.DataFrame(load_package_manifest(
             job_id=packaging_job_id,
             context="workflow"
         )).to_dict(orient='records'),
         # Get the files information
-        "files": pd.DataFrame(query_dynamodb_table(
+        "files": pd.DataFrame(load_package_manifest(
             job_id=packaging_job_id,
-            context="files"
+            context="file"
         )).to_dict(orient='records')
     }
 
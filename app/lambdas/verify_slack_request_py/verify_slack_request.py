@@ -1,13 +1,19 @@
 import time
 import hmac
 import hashlib
-import boto3
 import json
+import boto3
+from functools import lru_cache
+
 
+@lru_cache(maxsize=None)
+def get_secretsmanager_client():
+    # Created once and reused for the lifetime of the container
+    return boto3.client("secretsmanager")
 
 
 def _get_signing_secret():
-    _sm = boto3.client("secretsmanager")
+    _sm = get_secretsmanager_client()
     return _sm.get_secret_value(SecretId="auto-data-sharing-slack-signing-secret")["SecretString"] # pragma: allowlist secret
 
 
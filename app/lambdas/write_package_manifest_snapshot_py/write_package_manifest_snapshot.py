@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+Write package manifest snapshot
+
+Run once at the end of a packaging job, after all library, fastq, workflow and file
+records have been written to the packaging lookup table.
+
+Snapshots each context into an immutable parquet object in the artifacts bucket,
+so that the push, presign and report steps can read the package with a single GET
+rather than re-querying the content index.
+"""
+
+# Layer imports
+from data_sharing_tools.utils.manifest_helpers import write_package_manifest
+
+
+def handler(event, context):
+    """
+    Given the following inputs:
+      * packagingJobId
+
+    Generate the following outputs:
+      * manifestsByContext: A dictionary of context to the manifest uri and record count
+    :param event:
+    :param context:
+    :return:
+    """
+    packaging_job_id = event.get("packagingJobId")
+
+    if not packaging_job_id:
+        raise ValueError("packagingJobId is required")
+
+    return {
+        "manifestsByContext": write_package_manifest(packaging_job_id)
+    }
+
+
+# if __name__ == "__main__":
+#     import json
+#     from os import environ
+#
+#     environ['AWS_PROFILE'] = 'umccr-production'
+#     environ['PACKAGING_TABLE_NAME'] = 'data-sharing-packaging-lookup-table'
+#     environ['CONTENT_INDEX_NAME'] = 'content_attributes'
+#     environ['PACKAGE_MANIFEST_BUCKET_NAME'] = 'data-sharing-artifacts-472057503814-ap-southeast-2'
+#     environ['PACKAGE_MANIFEST_PREFIX'] = 'manifests/'
+#
+#     print(json.dumps(
+#         handler(
+#             {
+#                 "packagingJobId": "pkg.01JQYYBM52ZDYZ5MFMX7C22QHS",
+#             },
+#             None
+#         ),
+#         indent=4
+#     ))
@@ -6,16 +6,100 @@ from .utils.models import (
     SecondaryAnalysisPathPrefixType,
 )
 
+from .utils.aws_helpers import (
+    get_boto3_client,
+)
+
 from .utils.s3_helpers import (
     read_in_s3_json_objects_as_list,
     upload_obj_to_s3,
     upload_str_to_s3,
+    upload_str_iter_to_s3,
+    list_s3_objects_in_folders,
     delete_s3_obj,
     generate_presigned_url,
 )
 
+from .utils.presign_helpers import (
+    S3ObjectToPresignTypeDef,
+    PresignedUrlTypeDef,
+    presign_s3_objects,
+)
+
+from .utils.presigned_url_cache import (
+    get_presigned_urls,
+)
+
 from .utils.dynamodb_helpers import (
-    get_file_objects_with_presigned_urls
+    get_file_objects_with_presigned_urls,
+    iter_file_objects_with_presigned_urls,
+    iter_dynamodb_table,
+    query_dynamodb_table,
+    get_item_count,
+    get_page_token_list,
+    get_page_token_list_from_id_list,
+    query_dynamodb_table_page,
+)
+
+from .utils.content_codec import (
+    encode_content,
+    decode_content,
+)
+
+from .utils.dynamodb_write_helpers import (
+    batch_write_packaging_records,
+    write_fastq_file_index,
+)
+
+from .utils.tree_helpers import (
+    render_tree,
+)
+
+from .utils.manifest_helpers import (
+    load_package_manifest,
+    write_package_manifest,
+)
+
+from .utils.push_plan_helpers import (
+    PushPlanIndexTypeDef,
+    write_push_plan,
+    get_push_plan_index,
+    read_push_plan_slice,
+)
+
+from .utils.concurrency_helpers import (
+    map_concurrently,
+    iter_concurrently,
+)
+
+from .utils.file_filter_helpers import (
+    compile_file_filter,
+    compile_file_filters,
+)
+
+from .utils.file_selection_registry import (
+    get_file_selector,
+)
+
+from .utils.instrument_run_project_cache import (
+    get_cached_instrument_run_project_ids,
+    put_cached_instrument_run_project_ids,
+)
+
+from .utils.athena_helpers import (
+    run_athena_sql_query,
+    run_athena_sql_query_arrow,
+)
+
+from .utils.legacy_workflow_helpers import (
+    query_legacy_workflow_rows,
+    write_legacy_workflow_rows,
+    load_legacy_workflow_rows,
+)
+
+from .utils.steps_copy_manifest_helpers import (
+    upload_steps_copy_jsonl_manifest,
+    upload_steps_copy_csv_manifest,
 )
 
 
@@ -26,11 +110,50 @@ __all__ = [
     "DataType",
     "PrimaryDataPathPrefixType",
     "SecondaryAnalysisPathPrefixType",
+    "S3ObjectToPresignTypeDef",
+    "PresignedUrlTypeDef",
+    "PushPlanIndexTypeDef",
     # Functions
+    "get_boto3_client",
     "read_in_s3_json_objects_as_list",
     "upload_obj_to_s3",
     "upload_str_to_s3",
+    "upload_str_iter_to_s3",
+    "list_s3_objects_in_folders",
     "delete_s3_obj",
     "generate_presigned_url",
-    "get_file_objects_with_presigned_urls"
+    "presign_s3_objects",
+    "get_presigned_urls",
+    "get_file_objects_with_presigned_urls",
+    "iter_file_objects_with_presigned_urls",
+    "iter_dynamodb_table",
+    "query_dynamodb_table",
+    "get_item_count",
+    "get_page_token_list",
+    "get_page_token_list_from_id_list",
+    "query_dynamodb_table_page",
+    "encode_content",
+    "decode_content",
+    "batch_write_packaging_records",
+    "write_fastq_file_index",
+    "render_tree",
+    "load_package_manifest",
+    "write_package_manifest",
+    "write_push_plan",
+    "get_push_plan_index",
+    "read_push_plan_slice",
+    "map_concurrently",
+    "iter_concurrently",
+    "compile_file_filter",
+    "compile_file_filters",
+    "get_file_selector",
+    "get_cached_instrument_run_project_ids",
+    "put_cached_instrument_run_project_ids",
+    "run_athena_sql_query",
+    "run_athena_sql_query_arrow",
+    "query_legacy_workflow_rows",
+    "write_legacy_workflow_rows",
+    "load_legacy_workflow_rows",
+    "upload_steps_copy_jsonl_manifest",
+    "upload_steps_copy_csv_manifest",
 ]
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+Athena queries against the datamart
+
+  * queries are parameterised (ExecutionParameters) rather than string formatted
+  * identical queries within the result reuse window are answered from the previous result
+  * query state is polled with an exponential backoff, capped, so small queries return in well under a second
+  * results are read either
+
+    - as rows, paging through GetQueryResults (no s3 access required),
+    - as rows, from the csv output in s3 (one GET, better suited to large result sets), or
+    - as an arrow table, from the csv output in s3
+
+pyarrow is imported lazily so that consumers of the layer that never read arrow do not need to ship it.
+"""
+
+# Standard imports
+import csv
+import typing
+import logging
+from io import StringIO
+from os import environ
+from time import sleep
+from typing import List, Dict, Optional, Iterator, Literal, Any
+from urllib.parse import urlparse
+
+# Local imports
+from .aws_helpers import get_boto3_client
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_athena import AthenaClient
+    from mypy_boto3_athena.type_defs import QueryExecutionTypeDef
+    from mypy_boto3_s3 import S3Client
+    import pyarrow as pa
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+WORKGROUP_ENV_VAR = 'ATHENA_WORKGROUP_NAME'
+DATA_SOURCE_ENV_VAR = 'ATHENA_DATASOURCE_NAME'
+DATABASE_ENV_VAR = 'ATHENA_DATABASE_NAME'
+
+# Poll after 0.1, 0.2, 0.4 ... seconds, then every 5 seconds
+POLL_INITIAL_DELAY_SECONDS = 0.1
+POLL_BACKOFF_RATE = 2
+POLL_MAX_DELAY_SECONDS = 5
+
+DEFAULT_RESULT_REUSE_MAX_AGE_MINUTES = 60
+
+QUERY_TERMINAL_STATES = ['SUCCEEDED', 'FAILED', 'CANCELLED']
+
+AthenaResultFormatType = Literal[
+    "rows",
+    "csv",
+]
+
+
+def get_athena_client() -> 'AthenaClient':
+    return get_boto3_client('athena')
+
+
+def get_s3_client() -> 'S3Client':
+    return get_boto3_client('s3')
+
+
+def get_sql_string_literal(value: str) -> str:
+    """
+    Execution parameters are substituted as sql literals, so string values must be quoted (and escaped)
+    :param value:
+    :return:
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def start_athena_sql_query(
+        sql_query: str,
+        parameters: Optional[List[str]] = None,
+        result_reuse_max_age_minutes: Optional[int] = DEFAULT_RESULT_REUSE_MAX_AGE_MINUTES,
+) -> str:
+    """
+    Start an athena query
+    :param sql_query: With a '?' placeholder for each parameter
+    :param parameters: String values for each placeholder, in order, quoted as string literals
+    :param result_reuse_max_age_minutes: Reuse the result of an identical query run within this window, None to disable
+    :return: The query execution id
+    """
+    return get_athena_client().start_query_execution(
+        QueryString=sql_query,
+        QueryExecutionContext={
+            "Database": environ[DATABASE_ENV_VAR],
+            "Catalog": environ[DATA_SOURCE_ENV_VAR]
+        },
+        WorkGroup=environ[WORKGROUP_ENV_VAR],
+        **(
+            {
+                "ExecutionParameters": list(map(get_sql_string_literal, parameters))
+            }
+            if parameters else {}
+        ),
+        **(
+            {
+                "ResultReuseConfiguration": {
+                    "ResultReuseByAgeConfiguration": {
+                        "Enabled": True,
+                        "MaxAgeInMinutes": result_reuse_max_age_minutes
+                    }
+                }
+            }
+            if result_reuse_max_age_minutes is not None else {}
+        ),
+    )['QueryExecutionId']
+
+
+def wait_for_athena_sql_query(query_execution_id: str) -> 'QueryExecutionTypeDef':
+    """
+    Poll the query until it reaches a terminal state
+    :param query_execution_id:
+    :return: The query execution
+    :raises RuntimeError: If the query failed or was cancelled
+    """
+    delay_seconds = POLL_INITIAL_DELAY_SECONDS
+
+    while True:
+        query_execution = get_athena_client().get_query_execution(
+            QueryExecutionId=query_execution_id
+        )['QueryExecution']
+
+        if query_execution['Status']['State'] in QUERY_TERMINAL_STATES:
+            break
+
+        sleep(delay_seconds)
+        delay_seconds = min(delay_seconds * POLL_BACKOFF_RATE, POLL_MAX_DELAY_SECONDS)
+
+    if query_execution['Status']['State'] != 'SUCCEEDED':
+        raise RuntimeError(
+            f"Query {query_execution_id} failed: {query_execution['Status']['State']} "
+            f"{query_execution['Status'].get('StateChangeReason', '')}".rstrip()
+        )
+
+    if query_execution.get('Statistics', {}).get('ResultReuseInformation', {}).get('ReusedPreviousResult', False):
+        logger.info(f"Query {query_execution_id} reused a previous result")
+
+    return query_execution
+
+
+def iter_athena_query_result_rows(query_execution_id: str) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    Stream the rows of a query result, one GetQueryResults page at a time
+    :param query_execution_id:
+    :return: One dictionary per row, keyed by column name, null values are None
+    """
+    column_names = None
+
+    for page_iter_ in get_athena_client().get_paginator('get_query_results').paginate(
+            QueryExecutionId=query_execution_id
+    ):
+        rows = page_iter_['ResultSet']['Rows']
+
+        # The first row of the first page is the header
+        if column_names is None:
+            column_names = list(map(
+                lambda column_info_iter_: column_info_iter_['Name'],
+                page_iter_['ResultSet']['ResultSetMetadata']['ColumnInfo']
+            ))
+            rows = rows[1:]
+
+        for row_iter_ in rows:
+            yield dict(zip(
+                column_names,
+                map(
+                    lambda datum_iter_: datum_iter_.get('VarCharValue', None),
+                    row_iter_['Data']
+                )
+            ))
+
+
+def read_athena_query_result_csv(query_execution: 'QueryExecutionTypeDef') -> str:
+    result_location = urlparse(query_execution['ResultConfiguration']['OutputLocation'])
+
+    return get_s3_client().get_object(
+        Bucket=result_location.netloc,
+        Key=result_location.path.lstrip('/')
+    )['Body'].read().decode()
+
+
+def run_athena_sql_query(
+        sql_query: str,
+        parameters: Optional[List[str]] = None,
+        result_format: AthenaResultFormatType = "rows",
+        result_reuse_max_age_minutes: Optional[int] = DEFAULT_RESULT_REUSE_MAX_AGE_MINUTES,
+) -> List[Dict[str, Optional[str]]]:
+    """
+    Run an athena query and collect its rows
+    :param sql_query: With a '?' placeholder for each parameter
+    :param parameters: String values for each placeholder, in order
+    :param result_format: Read the rows from GetQueryResults pages ('rows') or the csv output in s3 ('csv')
+    :param result_reuse_max_age_minutes:
+    :return: One dictionary per row, keyed by column name
+    """
+    query_execution = wait_for_athena_sql_query(
+        start_athena_sql_query(
+            sql_query,
+            parameters=parameters,
+            result_reuse_max_age_minutes=result_reuse_max_age_minutes
+        )
+    )
+
+    if result_format == "rows":
+        return list(iter_athena_query_result_rows(query_execution['QueryExecutionId']))
+
+    if result_format == "csv":
+        return list(csv.DictReader(StringIO(read_athena_query_result_csv(query_execution))))
+
+    raise ValueError(f"Unknown result format '{result_format}', expected one of {list(typing.get_args(AthenaResultFormatType))}")
+
+
+def run_athena_sql_query_arrow(
+        sql_query: str,
+        parameters: Optional[List[str]] = None,
+        result_reuse_max_age_minutes: Optional[int] = DEFAULT_RESULT_REUSE_MAX_AGE_MINUTES,
+        column_types: Optional[Dict[str, Any]] = None,
+) -> 'pa.Table':
+    """
+    Run an athena query and read its csv output as an arrow table
+    :param sql_query: With a '?' placeholder for each parameter
+    :param parameters: String values for each placeholder, in order
+    :param result_reuse_max_age_minutes:
+    :param column_types: Arrow types of any columns that should not be inferred, i.e. {"portalRunId": pa.string()}
+    :return:
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    query_execution = wait_for_athena_sql_query(
+        start_athena_sql_query(
+            sql_query,
+            parameters=parameters,
+            result_reuse_max_age_minutes=result_reuse_max_age_minutes
+        )
+    )
+
+    return pa_csv.read_csv(
+        pa.BufferReader(read_athena_query_result_csv(query_execution).encode()),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types or {}
+        )
+    )
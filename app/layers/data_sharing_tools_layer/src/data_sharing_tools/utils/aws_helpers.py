@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""
+Shared boto3 client factory.
+
+Clients are memoized per service and region for the lifetime of the (warm) container,
+so consecutive calls reuse the same connection pool rather than paying for client construction
+and a fresh TLS handshake each time.
+
+All clients share a single config, with a larger connection pool (for use from thread pools)
+and the adaptive retry mode, whose client-side rate limiter only works if the client is shared.
+
+The config can be tuned through the following environment variables
+
+  * BOTO3_MAX_POOL_CONNECTIONS (default 50)
+  * AWS_RETRY_MODE (default 'adaptive')
+  * AWS_MAX_ATTEMPTS (default 10)
+"""
+
+# Standard imports
+from functools import lru_cache
+from os import environ
+from threading import Lock
+from typing import Optional, Any
+
+import boto3
+from botocore.config import Config
+
+# Globals
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_RETRY_MODE = "adaptive"
+DEFAULT_MAX_ATTEMPTS = 10
+
+# boto3 sessions are not thread safe, so guard client creation
+_CLIENT_LOCK = Lock()
+
+
+@lru_cache(maxsize=None)
+def get_boto3_client_config() -> Config:
+    return Config(
+        max_pool_connections=int(environ.get("BOTO3_MAX_POOL_CONNECTIONS", DEFAULT_MAX_POOL_CONNECTIONS)),
+        retries={
+            "mode": environ.get("AWS_RETRY_MODE", DEFAULT_RETRY_MODE),
+            "max_attempts": int(environ.get("AWS_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+        }
+    )
+
+
+@lru_cache(maxsize=None)
+def get_boto3_session() -> boto3.Session:
+    return boto3.Session()
+
+
+@lru_cache(maxsize=None)
+def _get_cached_boto3_client(service_name: str, region_name: Optional[str]) -> Any:
+    return get_boto3_session().client(
+        service_name,
+        region_name=region_name,
+        config=get_boto3_client_config()
+    )
+
+
+def get_boto3_client(service_name: str, region_name: Optional[str] = None) -> Any:
+    """
+    Get a boto3 client, clients are cached per service and region.
+    Clients themselves are thread safe, so can be shared across a thread pool.
+    :param service_name: i.e. 's3', 'dynamodb', 'athena'
+    :param region_name: Defaults to the region of the session (AWS_REGION in a lambda)
+    :return:
+    """
+    with _CLIENT_LOCK:
+        return _get_cached_boto3_client(service_name, region_name)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""
+Concurrent lookups
+
+Resolve a list of ids (i.e. library ids against the metadata api) with a bounded thread pool,
+so the wall time of n lookups approaches n / max_workers round trips rather than n.
+
+Repeated ids are only resolved once, and results are always returned in input order.
+
+iter_concurrently instead yields results as they complete,
+so a caller looking for a single match can stop early without waiting on (or starting) the remaining lookups.
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from typing import Callable, Hashable, Iterable, Iterator, List, Tuple, TypeVar
+
+# Globals
+DEFAULT_MAX_WORKERS = 10
+
+ItemType = TypeVar("ItemType", bound=Hashable)
+ResultType = TypeVar("ResultType")
+
+
+def map_concurrently(
+        func: Callable[[ItemType], ResultType],
+        item_list: Iterable[ItemType],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+) -> List[ResultType]:
+    """
+    Apply func to each item with a bounded thread pool
+    :param func:
+    :param item_list:
+    :param max_workers:
+    :return: The result of each item, in the same order as the item list.
+      The first exception raised by func is re-raised.
+    """
+    item_list = list(item_list)
+    unique_item_list = list(dict.fromkeys(item_list))
+
+    if len(unique_item_list) == 0:
+        return []
+
+    # No need for a pool for a single lookup
+    if len(unique_item_list) == 1:
+        result_by_item = {unique_item_list[0]: func(unique_item_list[0])}
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_item_list))) as executor:
+            result_by_item = dict(zip(
+                unique_item_list,
+                executor.map(func, unique_item_list)
+            ))
+
+    return list(map(
+        lambda item_iter_: result_by_item[item_iter_],
+        item_list
+    ))
+
+
+def iter_concurrently(
+        func: Callable[[ItemType], ResultType],
+        item_list: Iterable[ItemType],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Iterator[Tuple[ItemType, ResultType]]:
+    """
+    Apply func to each (unique) item with a bounded thread pool, yielding results in completion order.
+    Closing the generator early cancels any lookups that have not yet started.
+    :param func:
+    :param item_list:
+    :param max_workers:
+    :return: Pairs of (item, result).
+      The first exception raised by func is re-raised.
+    """
+    unique_item_list = list(dict.fromkeys(item_list))
+
+    if len(unique_item_list) == 0:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(unique_item_list)))
+    try:
+        item_by_future = dict(map(
+            lambda item_iter_: (executor.submit(func, item_iter_), item_iter_),
+            unique_item_list
+        ))
+        for future_iter_ in as_completed(item_by_future):
+            yield item_by_future[future_iter_], future_iter_.result()
+    finally:
+        # Don't wait on lookups whose result will never be read
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def flatten(list_of_lists: Iterable[Iterable[ResultType]]) -> List[ResultType]:
+    """
+    Concatenate lists in linear time (unlike reduce(concat, ...))
+    :param list_of_lists:
+    :return:
+    """
+    return list(chain.from_iterable(list_of_lists))
@@ -9,17 +9,26 @@ This includes
 - Get fastqs in package
 - Get secondary analyses in package
 
+File items also carry a small set of 'hot' attributes (bucket, key, size ...) as top-level attributes,
+callers that only need these can pass a projection and skip decoding the full file object.
+
+Fastq files are also indexed under their own context (<job_id>__file__fastq), these index items
+hold just the hot attributes (no content) so fastqs can be queried directly, one page at a time,
+with opaque page tokens (the LastEvaluatedKey of the previous page).
 """
 
 # Standard imports
 import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from os import environ
 from datetime import datetime
 import typing
-import boto3
-from typing import List, Dict, Union, TypedDict, NotRequired, cast
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Union, TypedDict, NotRequired, Iterator, Optional, Any, Tuple, cast
 
 # Local imports
+from .aws_helpers import get_boto3_client
+from .content_codec import decode_content
 from .models import FileObjectWithRelativePathTypeDef, FileObjectWithPresignedUrlTypeDef
 
 
@@ -27,6 +36,21 @@ if typing.TYPE_CHECKING:
     from mypy_boto3_dynamodb import DynamoDBClient
 
 
+# Top-level attributes written alongside the content, these are also projected onto the content index
+PROJECTED_ATTRIBUTES_BY_CONTEXT: Dict[str, List[str]] = {
+    "file": ["ingestId", "bucket", "key", "size", "relativePath"],
+    "file__fastq": ["ingestId", "bucket", "key", "size", "relativePath"],
+}
+PROJECTED_NUMERIC_ATTRIBUTES = ["size"]
+
+# BatchGetItem hard limit
+BATCH_GET_MAX_ITEMS = 100
+
+# Fastq file index
+FASTQ_FILE_CONTEXT = "file__fastq"
+FASTQ_FILE_SUFFIXES = (".fastq.gz", ".fastq.ora")
+
+
 class DynamoDbFileObjectWithPresignedUrlTypeDef(TypedDict):
     file_object: FileObjectWithRelativePathTypeDef
     presigned_url: NotRequired[str]
@@ -36,20 +60,235 @@ class DynamoDbFileObjectWithPresignedUrlTypeDef(TypedDict):
 def get_dynamodb_client() -> "DynamoDBClient":
     """
     Get a dynamodb client.
+    The client is shared for the lifetime of the container so that
+    consecutive pages reuse the same connection pool.
     """
-    return boto3.client("dynamodb")
+    return get_boto3_client("dynamodb")
 
 
-def query_dynamodb_table(
-        job_id: str,
+def get_projected_attributes(
         context: str,
-        collect_presigned_url: bool = False
+        content: Dict[str, Any]
+) -> Dict[str, Dict[str, str]]:
+    """
+    Get the top-level attributes to write alongside the content for a given context
+    :param context:
+    :param content:
+    :return:
+    """
+    return {
+        attribute_name_iter_: (
+            {"N": str(content[attribute_name_iter_])}
+            if attribute_name_iter_ in PROJECTED_NUMERIC_ATTRIBUTES
+            else {"S": str(content[attribute_name_iter_])}
+        )
+        for attribute_name_iter_ in PROJECTED_ATTRIBUTES_BY_CONTEXT.get(context, [])
+        if content.get(attribute_name_iter_, None) is not None
+    }
+
+
+def is_fastq_file(file_object: Dict[str, Any]) -> bool:
+    return str(file_object.get("key", "")).endswith(FASTQ_FILE_SUFFIXES)
+
+
+def encode_page_token(last_evaluated_key: Optional[Dict[str, Dict[str, str]]]) -> Optional[str]:
+    """
+    Encode a LastEvaluatedKey as an opaque (url safe) page token
+    :param last_evaluated_key:
+    :return:
+    """
+    if last_evaluated_key is None:
+        return None
+    return urlsafe_b64encode(json.dumps(last_evaluated_key, separators=(",", ":")).encode()).decode()
+
+
+def decode_page_token(page_token: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    if page_token is None:
+        return None
+    try:
+        return json.loads(urlsafe_b64decode(page_token.encode()))
+    except ValueError as e:
+        raise ValueError(f"Invalid page token '{page_token}'") from e
+
+
+def validate_projection(context: str, projection: List[str]):
+    """
+    Ensure we only request attributes that are stored at the top level for this context
+    :param context:
+    :param projection:
+    :return:
+    """
+    unknown_attributes = set(projection) - set(PROJECTED_ATTRIBUTES_BY_CONTEXT.get(context, []))
+    if unknown_attributes:
+        raise ValueError(
+            f"Cannot project {sorted(unknown_attributes)} for context '{context}', "
+            f"projectable attributes are {PROJECTED_ATTRIBUTES_BY_CONTEXT.get(context, [])}"
+        )
+
+
+def _decode_projected_attributes(
+        item: Dict[str, Dict[str, str]],
+        projection: List[str]
+) -> Dict[str, Union[str, int]]:
+    return {
+        attribute_name_iter_: (
+            int(item[attribute_name_iter_]['N'])
+            if 'N' in item[attribute_name_iter_]
+            else item[attribute_name_iter_]['S']
+        )
+        for attribute_name_iter_ in projection
+        if attribute_name_iter_ in item
+    }
+
+
+def _get_contents_by_key(
+        items: List[Dict[str, Dict[str, str]]],
+) -> Dict[tuple[str, str], Any]:
+    """
+    Get the decoded content of each item from the base table.
+    Used for items written before the projected attributes existed.
+    :param items:
+    :return: A dictionary of (id, job_id) to the decoded content
+    """
+    table_name = environ['PACKAGING_TABLE_NAME']
+    contents_by_key = {}
+
+    for i in range(0, len(items), BATCH_GET_MAX_ITEMS):
+        request_items = {
+            table_name: {
+                "Keys": list(map(
+                    lambda item_iter_: {
+                        "id": item_iter_['id'],
+                        "job_id": item_iter_['job_id'],
+                    },
+                    items[i:i + BATCH_GET_MAX_ITEMS]
+                )),
+                "ProjectionExpression": "#id, #job_id, #content",
+                "ExpressionAttributeNames": {
+                    "#id": "id",
+                    "#job_id": "job_id",
+                    "#content": "content",
+                },
+            }
+        }
+
+        while request_items:
+            response = get_dynamodb_client().batch_get_item(RequestItems=request_items)
+            for item_iter_ in response['Responses'].get(table_name, []):
+                contents_by_key[(item_iter_['id']['S'], item_iter_['job_id']['S'])] = decode_content(
+                    item_iter_['content']
+                )
+            request_items = response.get('UnprocessedKeys', {})
+
+    return contents_by_key
+
+
+def _decode_item(
+        item: Dict[str, Dict[str, str]],
+        collect_presigned_url: bool = False,
+        projection: Optional[List[str]] = None,
+        content: Optional[Any] = None,
+) -> Dict[str, Union[Dict, str]]:
+    """
+    Decode a single raw dynamodb item into the file object (and optionally its presigned url attributes)
+    :param item:
+    :param collect_presigned_url:
+    :param projection: If set, the file object only holds these attributes
+    :param content: The already decoded content of the item, if the item itself does not hold it
+    :return:
+    """
+    if projection is None:
+        file_object = decode_content(item['content'])
+    elif content is not None:
+        file_object = {
+            attribute_name_iter_: content[attribute_name_iter_]
+            for attribute_name_iter_ in projection
+            if attribute_name_iter_ in content
+        }
+    else:
+        file_object = _decode_projected_attributes(item, projection)
+
+    if not collect_presigned_url:
+        return file_object
+
+    return {
+        "presigned_url": item.get("presigned_url", {}).get("S", None),
+        "presigned_expiry": item.get("presigned_expiry", {}).get("S", None),
+        "file_object": file_object
+    }
+
+
+def _decode_page(
+        items: List[Dict[str, Dict[str, str]]],
+        collect_presigned_url: bool = False,
+        projection: Optional[List[str]] = None,
 ) -> List[Dict[str, Union[Dict, str]]]:
     """
-    Query a dynamodb table for a key value pair.
+    Decode a page of raw dynamodb items
+    :param items:
+    :param collect_presigned_url:
+    :param projection:
+    :return:
+    """
+    # Items written before the projected attributes existed need their content from the base table
+    contents_by_key = {}
+    if projection is not None:
+        legacy_items = list(filter(
+            lambda item_iter_: not all(map(
+                lambda attribute_name_iter_: attribute_name_iter_ in item_iter_,
+                projection
+            )),
+            items
+        ))
+        if legacy_items:
+            contents_by_key = _get_contents_by_key(legacy_items)
+
+    return list(map(
+        lambda item_iter_: _decode_item(
+            item_iter_,
+            collect_presigned_url=collect_presigned_url,
+            projection=projection,
+            content=(
+                contents_by_key.get((item_iter_['id']['S'], item_iter_['job_id']['S']), None)
+                if contents_by_key else None
+            )
+        ),
+        items
+    ))
+
+
+def _get_projection_expression_kwargs(attribute_names: List[str]) -> Dict[str, Any]:
+    return {
+        "ProjectionExpression": ", ".join(map(
+            lambda attribute_name_iter_: f"#{attribute_name_iter_}",
+            attribute_names
+        )),
+        "ExpressionAttributeNames": {
+            f"#{attribute_name_iter_}": attribute_name_iter_
+            for attribute_name_iter_ in attribute_names
+        }
+    }
+
+
+def iter_dynamodb_table_pages(
+        job_id: str,
+        context: str,
+        projection_attribute_names: Optional[List[str]] = None,
+) -> Iterator[List[Dict[str, Dict[str, str]]]]:
+    """
+    Page through the content index for a job id / context pair, yielding the raw items of each page
+    :param job_id:
+    :param context:
+    :param projection_attribute_names: If set, only return these attributes of each item
+    :return:
     """
     last_evaluated_key = None
-    items_list = []
+
+    projection_kwargs = (
+        _get_projection_expression_kwargs(projection_attribute_names)
+        if projection_attribute_names is not None
+        else {"ExpressionAttributeNames": {}}
+    )
 
     while True:
         dynamodb_query_response = get_dynamodb_client().query(
@@ -59,7 +298,9 @@ def query_dynamodb_table(
                     "TableName": environ['PACKAGING_TABLE_NAME'],
                     "IndexName": f"{environ['CONTENT_INDEX_NAME']}-index",
                     "KeyConditionExpression": "#context = :context",
+                    "ProjectionExpression": projection_kwargs.get("ProjectionExpression", None),
                     "ExpressionAttributeNames": {
+                        **projection_kwargs["ExpressionAttributeNames"],
                         "#context": "context"
                     },
                     "ExpressionAttributeValues": {
@@ -72,51 +313,276 @@ def query_dynamodb_table(
             ))
         )
 
-        # Append the query response
-        items_list.extend(dynamodb_query_response['Items'])
+        yield dynamodb_query_response['Items']
 
         if 'LastEvaluatedKey' in dynamodb_query_response:
             last_evaluated_key = dynamodb_query_response['LastEvaluatedKey']
         else:
             break
 
-    # To determine if this is a primary or secondary data file
 
-    if not collect_presigned_url:
-        return list(map(
-            lambda item_iter_: json.loads(item_iter_['content']['S']),
-            items_list
-        ))
-    else:
-        return list(map(
-            lambda item_iter_: {
-                "presigned_url": item_iter_.get("presigned_url", {}).get("S", None),
-                "presigned_expiry": item_iter_.get("presigned_expiry", {}).get("S", None),
-                "file_object": json.loads(item_iter_['content']['S'])
+def get_item_count(
+        job_id: str,
+        context: str,
+) -> int:
+    """
+    Count the items of a job id / context pair in the content index.
+    Count queries without a limit read up to 1 MB of the index per request,
+    so this takes far fewer requests than walking the index page by page.
+    :param job_id:
+    :param context:
+    :return:
+    """
+    item_count = 0
+    last_evaluated_key = None
+
+    while True:
+        dynamodb_query_response = get_dynamodb_client().query(
+            **dict(filter(
+                lambda kv: kv[1] is not None,
+                {
+                    "TableName": environ['PACKAGING_TABLE_NAME'],
+                    "IndexName": f"{environ['CONTENT_INDEX_NAME']}-index",
+                    "KeyConditionExpression": "#context = :context",
+                    "ExpressionAttributeNames": {
+                        "#context": "context"
+                    },
+                    "ExpressionAttributeValues": {
+                        ":context": {
+                            "S": job_id + "__" + context
+                        }
+                    },
+                    "Select": "COUNT",
+                    "ExclusiveStartKey": last_evaluated_key
+                }.items()
+            ))
+        )
+
+        item_count += dynamodb_query_response['Count']
+
+        if 'LastEvaluatedKey' in dynamodb_query_response:
+            last_evaluated_key = dynamodb_query_response['LastEvaluatedKey']
+        else:
+            break
+
+    return item_count
+
+
+def get_page_token_list(
+        job_id: str,
+        context: str,
+        page_size: int,
+) -> Tuple[int, List[Optional[str]]]:
+    """
+    Count the items of a job id / context pair, collecting the page token of each page along the way.
+    Only the item count is returned by each query, so this is the cheapest way to
+    split the items into pages that can be read independently (i.e. in a distributed map).
+    :param job_id:
+    :param context:
+    :param page_size:
+    :return: The number of items, and the page token of each page (None for the first page)
+    """
+    item_count = 0
+    page_token_list: List[Optional[str]] = []
+    last_evaluated_key = None
+
+    while True:
+        dynamodb_query_response = get_dynamodb_client().query(
+            **dict(filter(
+                lambda kv: kv[1] is not None,
+                {
+                    "TableName": environ['PACKAGING_TABLE_NAME'],
+                    "IndexName": f"{environ['CONTENT_INDEX_NAME']}-index",
+                    "KeyConditionExpression": "#context = :context",
+                    "ExpressionAttributeNames": {
+                        "#context": "context"
+                    },
+                    "ExpressionAttributeValues": {
+                        ":context": {
+                            "S": job_id + "__" + context
+                        }
+                    },
+                    "Select": "COUNT",
+                    "Limit": page_size,
+                    "ExclusiveStartKey": last_evaluated_key
+                }.items()
+            ))
+        )
+
+        # A full last page still has a LastEvaluatedKey, so the page after it is empty
+        if dynamodb_query_response['Count'] > 0:
+            item_count += dynamodb_query_response['Count']
+            page_token_list.append(encode_page_token(last_evaluated_key))
+
+        if 'LastEvaluatedKey' in dynamodb_query_response:
+            last_evaluated_key = dynamodb_query_response['LastEvaluatedKey']
+        else:
+            break
+
+    return item_count, page_token_list
+
+
+def get_page_token_list_from_id_list(
+        job_id: str,
+        context: str,
+        id_list: List[str],
+        page_size: int,
+        item_job_id: Optional[str] = None,
+) -> Tuple[int, List[Optional[str]]]:
+    """
+    As for get_page_token_list, but built from the ids of the items rather than by querying the index,
+    i.e. for items we have only just written and the index may not have caught up with yet.
+    Items are read from the index in order of their id, so the page token of each page
+    is the key of the last item of the previous page.
+    :param job_id:
+    :param context:
+    :param id_list:
+    :param page_size:
+    :param item_job_id: The job_id (sort key) of the items, if not the job id itself (i.e. for the fastq file index)
+    :return: The number of items, and the page token of each page (None for the first page)
+    """
+    if item_job_id is None:
+        item_job_id = job_id
+
+    # Strings sort by code point in python, which matches the utf-8 byte order of dynamodb sort keys
+    id_list = sorted(set(id_list))
+
+    if len(id_list) == 0:
+        return 0, []
+
+    return len(id_list), [None] + list(map(
+        lambda id_iter_: encode_page_token({
+            "id": {
+                "S": id_iter_
+            },
+            "job_id": {
+                "S": item_job_id
             },
-            items_list
+            "context": {
+                "S": job_id + "__" + context
+            }
+        }),
+        id_list[page_size - 1:-1:page_size]
+    ))
+
+
+def query_dynamodb_table_page(
+        job_id: str,
+        context: str,
+        page_size: int,
+        page_token: Optional[str] = None,
+        projection: Optional[List[str]] = None,
+) -> Tuple[List[Dict[str, Union[Dict, str]]], Optional[str]]:
+    """
+    Read a single page of the decoded items for a job id / context pair
+    :param job_id:
+    :param context:
+    :param page_size:
+    :param page_token: The page token of this page, None for the first page
+    :param projection: Only return these attributes of each object, must be in PROJECTED_ATTRIBUTES_BY_CONTEXT
+    :return: The decoded items, and the page token of the next page (None if this is the last page)
+    """
+    projection_kwargs = {"ExpressionAttributeNames": {}}
+    if projection is not None:
+        validate_projection(context, projection)
+        projection_kwargs = _get_projection_expression_kwargs(["id", "job_id"] + projection)
+
+    dynamodb_query_response = get_dynamodb_client().query(
+        **dict(filter(
+            lambda kv: kv[1] is not None,
+            {
+                "TableName": environ['PACKAGING_TABLE_NAME'],
+                "IndexName": f"{environ['CONTENT_INDEX_NAME']}-index",
+                "KeyConditionExpression": "#context = :context",
+                "ProjectionExpression": projection_kwargs.get("ProjectionExpression", None),
+                "ExpressionAttributeNames": {
+                    **projection_kwargs["ExpressionAttributeNames"],
+                    "#context": "context"
+                },
+                "ExpressionAttributeValues": {
+                    ":context": {
+                        "S": job_id + "__" + context
+                    }
+                },
+                "Limit": page_size,
+                "ExclusiveStartKey": decode_page_token(page_token)
+            }.items()
         ))
+    )
 
+    return (
+        _decode_page(dynamodb_query_response['Items'], projection=projection),
+        encode_page_token(dynamodb_query_response.get('LastEvaluatedKey', None))
+    )
 
-def get_file_objects_with_presigned_urls(
+
+def iter_dynamodb_table(
         job_id: str,
-) -> List[FileObjectWithPresignedUrlTypeDef]:
+        context: str,
+        collect_presigned_url: bool = False,
+        projection: Optional[List[str]] = None,
+) -> Iterator[Dict[str, Union[Dict, str]]]:
     """
-    Get the file objects as presigned urls.
-    First we collect all other items, fastqs, secondary_analyses
+    Stream the decoded items for a job id / context pair.
+
+    The next page is fetched on a background thread while the current page is decoded and consumed,
+    so at most two pages are held in memory at any one time.
+    Decoding is CPU bound, so it stays on the calling thread.
+    Items are yielded in the same order as the index returns them.
     :param job_id:
+    :param context:
+    :param collect_presigned_url:
+    :param projection: Only return these attributes of each object, must be in PROJECTED_ATTRIBUTES_BY_CONTEXT
     :return:
     """
-    # Get the file objects with presigned url
-    dynamodb_file_objects_list = (
-        query_dynamodb_table(
-            job_id,
-            "file",
-            collect_presigned_url=True
-        )
-    )
+    projection_attribute_names = None
+    if projection is not None:
+        validate_projection(context, projection)
+        # Always collect the keys, we need these to look up items without the projected attributes
+        projection_attribute_names = ["id", "job_id"] + projection
+        if collect_presigned_url:
+            projection_attribute_names += ["presigned_url", "presigned_expiry"]
 
-    return list(map(
+    page_iter = iter_dynamodb_table_pages(job_id, context, projection_attribute_names)
+
+    # A single worker, so the page iterator is only ever advanced by one thread at a time
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_page: Future = executor.submit(next, page_iter, None)
+
+        while (page := next_page.result()) is not None:
+            # Prefetch the next page before decoding this one
+            next_page = executor.submit(next, page_iter, None)
+            yield from _decode_page(page, collect_presigned_url, projection)
+
+
+def query_dynamodb_table(
+        job_id: str,
+        context: str,
+        collect_presigned_url: bool = False,
+        projection: Optional[List[str]] = None,
+) -> List[Dict[str, Union[Dict, str]]]:
+    """
+    Query a dynamodb table for a key value pair.
+    """
+    return list(iter_dynamodb_table(
+        job_id,
+        context,
+        collect_presigned_url=collect_presigned_url,
+        projection=projection
+    ))
+
+
+def iter_file_objects_with_presigned_urls(
+        job_id: str,
+        projection: Optional[List[str]] = None,
+) -> Iterator[FileObjectWithPresignedUrlTypeDef]:
+    """
+    Stream the file objects of a job alongside their presigned urls
+    :param job_id:
+    :param projection: Only collect these attributes of each file object (alongside the presigned url)
+    :return:
+    """
+    return map(
         lambda item_iter_: cast(
             DynamoDbFileObjectWithPresignedUrlTypeDef,
             dict(
@@ -126,5 +592,24 @@ def get_file_objects_with_presigned_urls(
                 }
             )
         ),
-        dynamodb_file_objects_list
-    ))
+        iter_dynamodb_table(
+            job_id,
+            "file",
+            collect_presigned_url=True,
+            projection=projection
+        )
+    )
+
+
+def get_file_objects_with_presigned_urls(
+        job_id: str,
+        projection: Optional[List[str]] = None,
+) -> List[FileObjectWithPresignedUrlTypeDef]:
+    """
+    Get the file objects as presigned urls.
+    First we collect all other items, fastqs, secondary_analyses
+    :param job_id:
+    :param projection: Only collect these attributes of each file object (alongside the presigned url)
+    :return:
+    """
+    return list(iter_file_objects_with_presigned_urls(job_id, projection=projection))
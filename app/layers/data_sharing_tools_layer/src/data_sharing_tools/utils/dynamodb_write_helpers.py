@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+
+"""
+Batched writes into the packaging lookup table.
+
+Rather than a single putItem per library / fastq / workflow / file,
+we chunk records into BatchWriteItem requests (25 items per request, the DynamoDB maximum),
+send chunks concurrently with bounded parallelism,
+and retry any UnprocessedItems with full-jitter exponential backoff.
+
+Fastq file records are also written to the fastq file index (see dynamodb_helpers).
+
+Each batch also writes the ids of its records to a batch item of the job,
+so the manifest snapshot can check it has read every record back through the content index
+(which is only eventually consistent) before it writes the snapshot.
+"""
+
+# Standard imports
+import json
+import hashlib
+import logging
+import random
+from os import environ
+from time import sleep, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, TypedDict, Iterator, Optional, Union, Set, cast
+
+# Local imports
+from .dynamodb_helpers import (
+    get_dynamodb_client,
+    get_projected_attributes,
+    is_fastq_file,
+    FASTQ_FILE_CONTEXT,
+)
+from .content_codec import encode_content, ContentEncodingType
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+BATCH_WRITE_MAX_ITEMS = 25  # DynamoDB hard limit for BatchWriteItem
+DEFAULT_BATCH_WRITE_WORKERS = 8
+DEFAULT_BATCH_WRITE_MAX_ATTEMPTS = 8
+BATCH_WRITE_BASE_BACKOFF_SECONDS = 0.05
+BATCH_WRITE_MAX_BACKOFF_SECONDS = 5
+PACKAGING_RECORD_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days, matches the packaging sfn
+
+# Sort key prefix of the batch items, these sit under the partition of the job id
+# and have no context attribute, so never appear on the indexes
+PACKAGING_RECORD_BATCH_JOB_ID_PREFIX = "packaging_record_batch__"
+
+# Library and workflow records are read back by the packaging sfn with $parse(content.S),
+# so only fastq and file records may be written with a compact (binary) content encoding
+COMPACT_CONTENT_CONTEXT_LIST = [
+    "fastq",
+    "file",
+]
+
+
+class PackagingRecordTypeDef(TypedDict):
+    # One of 'library', 'fastq', 'workflow', 'file'
+    context: str
+    id: str
+    content: Dict[str, Any]
+
+
+class BatchWriteResultTypeDef(TypedDict):
+    itemCount: int
+    requestCount: int
+    retryCount: int
+    durationSeconds: float
+    itemsPerSecond: float
+
+
+def get_default_content_encoding() -> ContentEncodingType:
+    return cast(ContentEncodingType, environ.get('PACKAGING_CONTENT_ENCODING', 'json'))
+
+
+def build_packaging_item(
+        job_id: str,
+        record: PackagingRecordTypeDef,
+        expire_at: int,
+        content_encoding: ContentEncodingType = "json"
+) -> Dict[str, Dict[str, Union[str, bytes]]]:
+    """
+    Convert a packaging record into a dynamodb item,
+    this mirrors the putItem states in the packaging state machine,
+    with the projected attributes of the context (i.e. bucket / key / size for files) stored at the top level
+    :param job_id:
+    :param record:
+    :param expire_at:
+    :param content_encoding: Only applied to contexts in COMPACT_CONTENT_CONTEXT_LIST
+    :return:
+    """
+    return {
+        "id": {
+            "S": record['id']
+        },
+        "job_id": {
+            "S": job_id
+        },
+        "context": {
+            "S": job_id + "__" + record['context']
+        },
+        "content": encode_content(
+            record['content'],
+            encoding=(
+                content_encoding
+                if record['context'] in COMPACT_CONTENT_CONTEXT_LIST
+                else "json"
+            )
+        ),
+        "expire_at": {
+            "N": str(expire_at)
+        },
+        **get_projected_attributes(record['context'], record['content'])
+    }
+
+
+def build_fastq_file_index_item(
+        job_id: str,
+        file_object: Dict[str, Any],
+        expire_at: int,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Convert a fastq file object into its fastq file index item.
+    Index items share the id of the file record, but sit under their own sort key,
+    and only hold the projected attributes (no content)
+    :param job_id:
+    :param file_object:
+    :param expire_at:
+    :return:
+    """
+    return {
+        "id": {
+            "S": file_object['ingestId']
+        },
+        "job_id": {
+            "S": job_id + "__" + FASTQ_FILE_CONTEXT
+        },
+        "context": {
+            "S": job_id + "__" + FASTQ_FILE_CONTEXT
+        },
+        "expire_at": {
+            "N": str(expire_at)
+        },
+        **get_projected_attributes(FASTQ_FILE_CONTEXT, file_object)
+    }
+
+
+def _chunk_list(items: List[Any], chunk_size: int) -> Iterator[List[Any]]:
+    for i in range(0, len(items), chunk_size):
+        yield items[i:i + chunk_size]
+
+
+def _get_backoff_seconds(attempt: int) -> float:
+    """
+    Full jitter exponential backoff
+    :param attempt:
+    :return:
+    """
+    return random.uniform(
+        0,
+        min(BATCH_WRITE_MAX_BACKOFF_SECONDS, BATCH_WRITE_BASE_BACKOFF_SECONDS * (2 ** attempt))
+    )
+
+
+def _write_chunk(
+        table_name: str,
+        items: List[Dict[str, Dict[str, str]]],
+        max_attempts: int
+) -> Dict[str, int]:
+    """
+    Write up to 25 items, retrying any unprocessed items
+    :param table_name:
+    :param items:
+    :param max_attempts:
+    :return: The number of requests and retries made for this chunk
+    """
+    request_items = {
+        table_name: list(map(
+            lambda item_iter_: {"PutRequest": {"Item": item_iter_}},
+            items
+        ))
+    }
+
+    request_count = 0
+    for attempt in range(max_attempts):
+        if attempt > 0:
+            sleep(_get_backoff_seconds(attempt))
+
+        response = get_dynamodb_client().batch_write_item(
+            RequestItems=request_items
+        )
+        request_count += 1
+
+        request_items = response.get('UnprocessedItems', {})
+        if not request_items:
+            return {
+                "requestCount": request_count,
+                "retryCount": request_count - 1
+            }
+
+    raise RuntimeError(
+        f"Could not write {len(request_items[table_name])} items to {table_name} "
+        f"after {max_attempts} attempts"
+    )
+
+
+def _get_record_batch_sort_key(record_list: List[PackagingRecordTypeDef]) -> str:
+    """
+    The sort key of a batch item is a hash of the record ids in the batch,
+    so a retried invocation of the same batch overwrites its own batch item
+    :param record_list:
+    :return:
+    """
+    return PACKAGING_RECORD_BATCH_JOB_ID_PREFIX + hashlib.sha256(
+        "\n".join(sorted(set(map(lambda record_iter_: record_iter_['id'], record_list)))).encode()
+    ).hexdigest()
+
+
+def write_packaging_record_batch_item(
+        table_name: str,
+        job_id: str,
+        record_list: List[PackagingRecordTypeDef],
+        expire_at: int
+):
+    """
+    Record the ids written by this batch, by context, under the partition of the job id.
+    Ids are stored as sets rather than counts so that records written by more than one batch
+    (or by a retried invocation) are only counted once.
+    :param table_name:
+    :param job_id:
+    :param record_list:
+    :param expire_at:
+    :return:
+    """
+    if not record_list:
+        return
+
+    ids_by_context: Dict[str, Set[str]] = {}
+    for record_iter_ in record_list:
+        ids_by_context.setdefault(record_iter_['context'], set()).add(record_iter_['id'])
+
+    get_dynamodb_client().put_item(
+        TableName=table_name,
+        Item={
+            "id": {
+                "S": job_id
+            },
+            "job_id": {
+                "S": _get_record_batch_sort_key(record_list)
+            },
+            "expire_at": {
+                "N": str(expire_at)
+            },
+            **{
+                context_iter_: {
+                    "SS": sorted(id_set_iter_)
+                }
+                for context_iter_, id_set_iter_ in ids_by_context.items()
+            }
+        }
+    )
+
+
+def get_packaging_record_counts(job_id: str) -> Optional[Dict[str, int]]:
+    """
+    Get the number of distinct records written per context for a packaging job.
+    Batch items are read from the base table with strongly consistent reads.
+    :param job_id:
+    :return: A dictionary of context to record count, or None for jobs written before batch items existed
+    """
+    ids_by_context: Dict[str, Set[str]] = {}
+    batch_item_count = 0
+
+    paginator = get_dynamodb_client().get_paginator('query')
+    for page_iter_ in paginator.paginate(
+            TableName=environ['PACKAGING_TABLE_NAME'],
+            KeyConditionExpression="#id = :job_id AND begins_with(#job_id, :batch_prefix)",
+            ExpressionAttributeNames={
+                "#id": "id",
+                "#job_id": "job_id",
+            },
+            ExpressionAttributeValues={
+                ":job_id": {"S": job_id},
+                ":batch_prefix": {"S": PACKAGING_RECORD_BATCH_JOB_ID_PREFIX},
+            },
+            ConsistentRead=True,
+    ):
+        for item_iter_ in page_iter_['Items']:
+            batch_item_count += 1
+            for attribute_name_iter_, attribute_value_iter_ in item_iter_.items():
+                if 'SS' not in attribute_value_iter_:
+                    continue
+                ids_by_context.setdefault(attribute_name_iter_, set()).update(attribute_value_iter_['SS'])
+
+    if batch_item_count == 0:
+        return None
+
+    return {
+        context_iter_: len(id_set_iter_)
+        for context_iter_, id_set_iter_ in ids_by_context.items()
+    }
+
+
+def batch_write_packaging_records(
+        job_id: str,
+        record_list: List[PackagingRecordTypeDef],
+        max_workers: int = DEFAULT_BATCH_WRITE_WORKERS,
+        max_attempts: int = DEFAULT_BATCH_WRITE_MAX_ATTEMPTS,
+        content_encoding: Optional[ContentEncodingType] = None,
+) -> BatchWriteResultTypeDef:
+    """
+    Write a list of packaging records to the packaging lookup table
+    :param job_id:
+    :param record_list:
+    :param max_workers: Maximum number of BatchWriteItem requests in flight
+    :param max_attempts: Maximum number of attempts per chunk before we give up
+    :param content_encoding: Defaults to the PACKAGING_CONTENT_ENCODING environment variable, or 'json'
+    :return: Throughput statistics for the write
+    """
+    table_name = environ['PACKAGING_TABLE_NAME']
+    if content_encoding is None:
+        content_encoding = get_default_content_encoding()
+    expire_at = round(time()) + PACKAGING_RECORD_TTL_SECONDS
+    start_time = time()
+
+    # Deduplicate on the primary key, BatchWriteItem rejects a request with duplicate keys
+    items_by_key = {
+        (record_iter_['id'], job_id): build_packaging_item(job_id, record_iter_, expire_at, content_encoding)
+        for record_iter_ in record_list
+    }
+
+    # Add the fastq file index items
+    items_by_key.update({
+        (record_iter_['content']['ingestId'], job_id + "__" + FASTQ_FILE_CONTEXT): build_fastq_file_index_item(
+            job_id, record_iter_['content'], expire_at
+        )
+        for record_iter_ in record_list
+        if record_iter_['context'] == "file" and is_fastq_file(record_iter_['content'])
+    })
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunk_results = list(executor.map(
+            lambda chunk_iter_: _write_chunk(table_name, chunk_iter_, max_attempts),
+            _chunk_list(list(items_by_key.values()), BATCH_WRITE_MAX_ITEMS)
+        ))
+
+    # Only record the batch once all of its records have been written
+    write_packaging_record_batch_item(table_name, job_id, record_list, expire_at)
+
+    duration_seconds = time() - start_time
+    batch_write_result: BatchWriteResultTypeDef = {
+        "itemCount": len(items_by_key),
+        "requestCount": sum(map(lambda chunk_iter_: chunk_iter_['requestCount'], chunk_results)),
+        "retryCount": sum(map(lambda chunk_iter_: chunk_iter_['retryCount'], chunk_results)),
+        "durationSeconds": round(duration_seconds, 3),
+        "itemsPerSecond": round(len(items_by_key) / duration_seconds, 1) if duration_seconds > 0 else 0.0,
+    }
+
+    logger.info(f"Batch write for job '{job_id}' complete: {json.dumps(batch_write_result)}")
+
+    return batch_write_result
+
+
+def write_fastq_file_index(
+        job_id: str,
+        file_object_list: List[Dict[str, Any]],
+        max_workers: int = DEFAULT_BATCH_WRITE_WORKERS,
+        max_attempts: int = DEFAULT_BATCH_WRITE_MAX_ATTEMPTS,
+) -> List[str]:
+    """
+    Write the fastq file index items for a list of file objects,
+    used to backfill the index for packages written before it existed
+    :param job_id:
+    :param file_object_list: File objects with (at least) their projected attributes, non fastq files are skipped
+    :param max_workers:
+    :param max_attempts:
+    :return: The ingest ids of the index items written
+    """
+    table_name = environ['PACKAGING_TABLE_NAME']
+    expire_at = round(time()) + PACKAGING_RECORD_TTL_SECONDS
+
+    items_by_id = {
+        file_object_iter_['ingestId']: build_fastq_file_index_item(job_id, file_object_iter_, expire_at)
+        for file_object_iter_ in file_object_list
+        if is_fastq_file(file_object_iter_)
+    }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(
+            lambda chunk_iter_: _write_chunk(table_name, chunk_iter_, max_attempts),
+            _chunk_list(list(items_by_id.values()), BATCH_WRITE_MAX_ITEMS)
+        ))
+
+    return list(items_by_id.keys())
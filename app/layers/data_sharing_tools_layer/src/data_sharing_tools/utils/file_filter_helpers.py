@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+"""
+File filters
+
+Compile a list of regex patterns (searched against each file key) into a single key filter,
+so a key is tested in one pass rather than once per pattern:
+
+  * duplicate patterns are dropped
+  * literal suffix patterns (i.e. r"manta\\.tsv$") become a single str.endswith over a tuple of suffixes
+  * fixed width suffix patterns (literals and '.' only, i.e. r".bam.bai$") are grouped by width,
+    each group is one alternation matched against just the last <width> characters of the key
+  * all other patterns are combined into one compiled alternation searched over the key
+
+A key matches the filter if (and only if) it would match any one of the patterns with re.search.
+
+The module only uses the standard library, so it can be compiled at import time in any lambda.
+"""
+
+# Standard imports
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Globals
+REGEX_METACHARACTERS = frozenset(".^$*+?{}[]|()")
+
+FileKeyFilterType = Callable[[str], bool]
+
+
+def get_suffix_pattern_chars(pattern: str) -> Optional[List[Optional[str]]]:
+    """
+    Get the characters of an anchored, fixed width pattern
+    :param pattern: i.e. r"somatic-PASS\\.vcf\\.gz$" or r".bam$"
+    :return: One item per character the pattern matches, the literal character or None for '.',
+      or None if the pattern is not a fixed width suffix
+      (not anchored, or with any other metacharacter or character class, i.e. r"\\.amber\\.qc" or r"\\d+$")
+    """
+    if not pattern.endswith("$"):
+        return None
+
+    pattern_body = pattern[:-1]
+    char_list: List[Optional[str]] = []
+    char_index = 0
+
+    while char_index < len(pattern_body):
+        char = pattern_body[char_index]
+        if char == "\\":
+            # A trailing backslash escapes the anchor itself, and \d, \b, \s etc. are not literals
+            if char_index + 1 >= len(pattern_body) or pattern_body[char_index + 1].isalnum():
+                return None
+            char_list.append(pattern_body[char_index + 1])
+            char_index += 2
+            continue
+        if char == ".":
+            char_list.append(None)
+        elif char in REGEX_METACHARACTERS:
+            return None
+        else:
+            char_list.append(char)
+        char_index += 1
+
+    return char_list
+
+
+def get_literal_suffix(pattern: str) -> Optional[str]:
+    """
+    Get the literal suffix a pattern matches, if the pattern is just an anchored literal
+    :param pattern: i.e. r"somatic-PASS\\.vcf\\.gz$"
+    :return: i.e. "somatic-PASS.vcf.gz", or None if the pattern is not a literal suffix
+    """
+    char_list = get_suffix_pattern_chars(pattern)
+    if char_list is None or None in char_list:
+        return None
+    return "".join(char_list)
+
+
+def split_file_filter_patterns(
+        pattern_list: Iterable[str]
+) -> Tuple[Tuple[str, ...], Dict[int, List[str]], List[str]]:
+    """
+    Split (unique) patterns into literal suffixes, fixed width suffix patterns and everything else
+    :param pattern_list:
+    :return: The tuple of literal suffixes,
+      the fixed width suffix patterns (without their anchor) by width,
+      and the list of remaining regex patterns
+    """
+    suffix_list = []
+    suffix_pattern_list_by_width: Dict[int, List[str]] = {}
+    regex_pattern_list = []
+
+    for pattern_iter_ in dict.fromkeys(pattern_list):
+        char_list = get_suffix_pattern_chars(pattern_iter_)
+        if char_list is None:
+            regex_pattern_list.append(pattern_iter_)
+        elif None not in char_list:
+            suffix_list.append("".join(char_list))
+        else:
+            suffix_pattern_list_by_width.setdefault(len(char_list), []).append(pattern_iter_[:-1])
+
+    return tuple(dict.fromkeys(suffix_list)), suffix_pattern_list_by_width, regex_pattern_list
+
+
+def _compile_alternation(pattern_list: List[str]) -> re.Pattern:
+    return re.compile(
+        "|".join(map(
+            lambda pattern_iter_: f"(?:{pattern_iter_})",
+            pattern_list
+        ))
+    )
+
+
+def compile_file_filter(pattern_list: Iterable[str]) -> FileKeyFilterType:
+    """
+    Compile a list of patterns into a single key filter
+    :param pattern_list: Regex patterns, as would be passed to re.search
+    :return: A function of a key, returning True if the key matches any of the patterns
+    """
+    suffix_tuple, suffix_pattern_list_by_width, regex_pattern_list = split_file_filter_patterns(pattern_list)
+
+    # Pairs of (width, alternation), shortest first
+    suffix_regex_list = list(map(
+        lambda width_iter_: (width_iter_, _compile_alternation(suffix_pattern_list_by_width[width_iter_])),
+        sorted(suffix_pattern_list_by_width.keys())
+    ))
+
+    combined_regex: Optional[re.Pattern] = None
+    if len(regex_pattern_list) > 0:
+        combined_regex = _compile_alternation(regex_pattern_list)
+
+    def _matches_suffix(key: str) -> bool:
+        if suffix_tuple and key.endswith(suffix_tuple):
+            return True
+        for width_iter_, suffix_regex_iter_ in suffix_regex_list:
+            if len(key) < width_iter_:
+                break
+            if suffix_regex_iter_.fullmatch(key, len(key) - width_iter_) is not None:
+                return True
+        return False
+
+    def _key_filter(key: str) -> bool:
+        if _matches_suffix(key):
+            return True
+        # '$' also matches before a trailing newline
+        if key.endswith("\n") and _matches_suffix(key[:-1]):
+            return True
+        return combined_regex is not None and combined_regex.search(key) is not None
+
+    return _key_filter
+
+
+def compile_file_filters(pattern_list_by_name: Dict[str, Iterable[str]]) -> Dict[str, FileKeyFilterType]:
+    """
+    Compile the patterns of each name (i.e. workflow name) into a key filter
+    :param pattern_list_by_name:
+    :return:
+    """
+    return dict(map(
+        lambda name_and_pattern_list_iter_: (
+            name_and_pattern_list_iter_[0],
+            compile_file_filter(name_and_pattern_list_iter_[1])
+        ),
+        pattern_list_by_name.items()
+    ))
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+"""
+Workflow file selection registry
+
+Which files of a workflow run are packaged is decided by the first rule matching the workflow name and version,
+rules are read from the registry (a json ssm parameter) and then from any built-in defaults of the caller.
+
+Registry layout
+
+  {
+    "version": "<registry version>",
+    "rules": [
+      {
+        "workflowName": "oncoanalyser-*",              # glob
+        "workflowVersion": "2.*",                      # glob, optional, defaults to '*'
+        "includePatterns": [ ... ],                    # optional, if set a file key must match one of these
+        "excludePatterns": [ ... ],                    # optional, a file key matching one of these is dropped
+        "maxFileSizeBytes": 53687091200,               # optional, larger files are dropped ...
+        "maxFileSizeExemptPatterns": [ ... ]           # ... unless their key matches one of these
+      }
+    ]
+  }
+
+Patterns are regexes searched against the file key, as for file_filter_helpers.compile_file_filter.
+
+The registry is cached per container for FILE_SELECTION_REGISTRY_CACHE_SECONDS,
+and each rule is compiled once per container (keyed by its content), so a warm lambda neither re-reads
+the parameter nor recompiles any patterns.
+"""
+
+# Standard imports
+import json
+import typing
+import logging
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from os import environ
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple, TypedDict, NotRequired, Any
+
+# Local imports
+from .aws_helpers import get_boto3_client
+from .file_filter_helpers import compile_file_filter
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_ssm import SSMClient
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+FILE_SELECTION_REGISTRY_SSM_PARAMETER_ENV_VAR = "FILE_SELECTION_REGISTRY_SSM_PARAMETER_NAME"
+FILE_SELECTION_REGISTRY_CACHE_SECONDS = 300
+
+FILE_SELECTION_RULE_PATTERN_LIST_KEYS = ["includePatterns", "excludePatterns", "maxFileSizeExemptPatterns"]
+FILE_SELECTION_RULE_KEYS = ["workflowName", "workflowVersion", "maxFileSizeBytes"] + FILE_SELECTION_RULE_PATTERN_LIST_KEYS
+
+# A function of a file object (with at least its key and size), returning True if the file should be packaged
+FileSelectorType = Callable[[Dict[str, Any]], bool]
+
+# Parameter name to (load time, registry)
+_file_selection_registry_cache: Dict[str, Tuple[float, 'FileSelectionRegistryTypeDef']] = {}
+
+
+class FileSelectionRuleTypeDef(TypedDict):
+    workflowName: str
+    workflowVersion: NotRequired[str]
+    includePatterns: NotRequired[List[str]]
+    excludePatterns: NotRequired[List[str]]
+    maxFileSizeBytes: NotRequired[int]
+    maxFileSizeExemptPatterns: NotRequired[List[str]]
+
+
+class FileSelectionRegistryTypeDef(TypedDict):
+    version: str
+    rules: List[FileSelectionRuleTypeDef]
+
+
+def get_ssm_client() -> 'SSMClient':
+    return get_boto3_client('ssm')
+
+
+def validate_file_selection_rule(rule: FileSelectionRuleTypeDef):
+    """
+    Check a rule before it is compiled, so a bad registry fails loudly rather than silently sharing every file
+    :param rule:
+    :return:
+    :raises ValueError:
+    """
+    if not isinstance(rule, dict):
+        raise ValueError(f"File selection rule must be an object, got {rule}")
+
+    unknown_key_list = list(filter(
+        lambda key_iter_: key_iter_ not in FILE_SELECTION_RULE_KEYS,
+        rule.keys()
+    ))
+    if len(unknown_key_list) > 0:
+        raise ValueError(f"Unknown keys {unknown_key_list} in file selection rule {rule}, expected any of {FILE_SELECTION_RULE_KEYS}")
+
+    if not isinstance(rule.get('workflowName', None), str):
+        raise ValueError(f"File selection rule {rule} does not have a workflowName")
+
+    if not isinstance(rule.get('workflowVersion', '*'), str):
+        raise ValueError(f"workflowVersion of file selection rule {rule} must be a string")
+
+    for pattern_list_key_iter_ in FILE_SELECTION_RULE_PATTERN_LIST_KEYS:
+        pattern_list = rule.get(pattern_list_key_iter_, [])
+        if (
+                not isinstance(pattern_list, list) or
+                not all(map(lambda pattern_iter_: isinstance(pattern_iter_, str), pattern_list))
+        ):
+            raise ValueError(f"{pattern_list_key_iter_} of file selection rule {rule} must be a list of strings")
+
+    max_file_size_bytes = rule.get('maxFileSizeBytes', None)
+    if max_file_size_bytes is not None and (
+            not isinstance(max_file_size_bytes, int) or
+            isinstance(max_file_size_bytes, bool) or
+            max_file_size_bytes < 0
+    ):
+        raise ValueError(f"maxFileSizeBytes of file selection rule {rule} must be a non-negative integer")
+
+
+def validate_file_selection_registry(registry: FileSelectionRegistryTypeDef):
+    """
+    :param registry:
+    :return:
+    :raises ValueError:
+    """
+    if not isinstance(registry, dict) or not isinstance(registry.get('rules', None), list):
+        raise ValueError("File selection registry must be an object with a list of rules")
+    if registry.get('version', None) is None:
+        raise ValueError("File selection registry does not have a version")
+
+    for rule_iter_ in registry['rules']:
+        validate_file_selection_rule(rule_iter_)
+
+
+def compile_file_selection_rule(rule: FileSelectionRuleTypeDef) -> FileSelectorType:
+    """
+    Compile a rule into a file selector
+    :param rule:
+    :return:
+    """
+    validate_file_selection_rule(rule)
+
+    include_filter = (
+        compile_file_filter(rule['includePatterns'])
+        if 'includePatterns' in rule else None
+    )
+    exclude_filter = (
+        compile_file_filter(rule['excludePatterns'])
+        if len(rule.get('excludePatterns', [])) > 0 else None
+    )
+    max_file_size_bytes: Optional[int] = rule.get('maxFileSizeBytes', None)
+    max_file_size_exempt_filter = (
+        compile_file_filter(rule['maxFileSizeExemptPatterns'])
+        if len(rule.get('maxFileSizeExemptPatterns', [])) > 0 else None
+    )
+
+    def _file_selector(file_object: Dict[str, Any]) -> bool:
+        key = file_object['key']
+        if include_filter is not None and not include_filter(key):
+            return False
+        if exclude_filter is not None and exclude_filter(key):
+            return False
+        if max_file_size_bytes is not None and (file_object.get('size', None) or 0) > max_file_size_bytes:
+            return max_file_size_exempt_filter is not None and max_file_size_exempt_filter(key)
+        return True
+
+    return _file_selector
+
+
+@lru_cache(maxsize=None)
+def _compile_file_selection_rule_json(rule_json: str) -> FileSelectorType:
+    return compile_file_selection_rule(json.loads(rule_json))
+
+
+def get_compiled_file_selection_rule(rule: FileSelectionRuleTypeDef) -> FileSelectorType:
+    """
+    Compile a rule, at most once per container
+    :param rule:
+    :return:
+    """
+    return _compile_file_selection_rule_json(json.dumps(rule, sort_keys=True))
+
+
+def load_file_selection_registry(parameter_name: str) -> FileSelectionRegistryTypeDef:
+    """
+    Read and validate the registry from its ssm parameter
+    :param parameter_name:
+    :return:
+    """
+    registry: FileSelectionRegistryTypeDef = json.loads(
+        get_ssm_client().get_parameter(Name=parameter_name)['Parameter']['Value']
+    )
+    validate_file_selection_registry(registry)
+
+    logger.info(
+        f"Loaded file selection registry version {registry['version']} "
+        f"with {len(registry['rules'])} rules from {parameter_name}"
+    )
+
+    return registry
+
+
+def get_file_selection_registry(
+        max_age_seconds: int = FILE_SELECTION_REGISTRY_CACHE_SECONDS
+) -> Optional[FileSelectionRegistryTypeDef]:
+    """
+    Get the registry, re-reading the parameter at most every max_age_seconds
+    :param max_age_seconds:
+    :return: None if no registry is configured (the FILE_SELECTION_REGISTRY_SSM_PARAMETER_NAME env var is not set)
+    """
+    parameter_name = environ.get(FILE_SELECTION_REGISTRY_SSM_PARAMETER_ENV_VAR, None)
+    if parameter_name is None:
+        return None
+
+    cached_registry = _file_selection_registry_cache.get(parameter_name, None)
+    if cached_registry is not None and monotonic() - cached_registry[0] < max_age_seconds:
+        return cached_registry[1]
+
+    registry = load_file_selection_registry(parameter_name)
+    _file_selection_registry_cache[parameter_name] = (monotonic(), registry)
+
+    return registry
+
+
+def is_file_selection_rule_match(
+        rule: FileSelectionRuleTypeDef,
+        workflow_name: str,
+        workflow_version: Optional[str]
+) -> bool:
+    return (
+        fnmatchcase(workflow_name, rule['workflowName']) and
+        fnmatchcase(workflow_version or "", rule.get('workflowVersion', '*'))
+    )
+
+
+def get_file_selector(
+        workflow_name: str,
+        workflow_version: Optional[str] = None,
+        default_rule_list: Optional[List[FileSelectionRuleTypeDef]] = None,
+) -> Optional[FileSelectorType]:
+    """
+    Get the file selector of the first rule matching the workflow,
+    trying the registry rules (in order) before the default rules (in order)
+    :param workflow_name:
+    :param workflow_version:
+    :param default_rule_list: Built-in rules of the caller, used when no registry rule matches
+    :return: None if no rule matches the workflow (every file is selected)
+    """
+    registry = get_file_selection_registry()
+
+    for rule_iter_ in (registry['rules'] if registry is not None else []) + (default_rule_list or []):
+        if is_file_selection_rule_match(rule_iter_, workflow_name, workflow_version):
+            return get_compiled_file_selection_rule(rule_iter_)
+
+    return None
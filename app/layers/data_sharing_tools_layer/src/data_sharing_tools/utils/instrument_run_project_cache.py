@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+Instrument run project cache.
+
+The project ids of an instrument run take one metadata lookup per library of the run,
+so, once resolved, the set of project ids of a run is cached in the packaging lookup table,
+under its own job id so it never collides with the records of a packaging job.
+Cache entries expire (through the table's TTL) after INSTRUMENT_RUN_PROJECT_CACHE_TTL_SECONDS,
+so that any later changes to the library metadata of a run are picked up.
+
+Only a complete set of project ids is ever written to the cache.
+
+Libraries are linked to a run over time (i.e. with each readsets added event),
+so entries are keyed on the run and a hash of its (sorted) library ids,
+a run with a newly linked library misses the cache rather than reading a stale set of project ids.
+
+The cache is best-effort, if the INSTRUMENT_RUN_PROJECT_CACHE_TABLE_NAME environment variable is not set
+or the table cannot be read / written to, we just resolve the project ids from the metadata.
+
+Item layout
+
+  * id: <instrument_run_id>__<library_ids_hash>
+  * job_id: INSTRUMENT_RUN_PROJECT_CACHE_JOB_ID
+  * context: <INSTRUMENT_RUN_PROJECT_CACHE_JOB_ID>__projects
+  * project_id_list: the (sorted) project ids of the run
+  * expire_at: the cache expiry as an epoch
+"""
+
+# Standard imports
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from os import environ
+from typing import List, Optional, Iterable
+
+from botocore.exceptions import ClientError
+
+# Local imports
+from .dynamodb_helpers import get_dynamodb_client
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+INSTRUMENT_RUN_PROJECT_CACHE_JOB_ID = "instrument_run_project_cache"
+INSTRUMENT_RUN_PROJECT_CACHE_CONTEXT = f"{INSTRUMENT_RUN_PROJECT_CACHE_JOB_ID}__projects"
+INSTRUMENT_RUN_PROJECT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+def get_instrument_run_project_cache_table_name() -> Optional[str]:
+    return environ.get("INSTRUMENT_RUN_PROJECT_CACHE_TABLE_NAME", None)
+
+
+def get_instrument_run_project_cache_id(instrument_run_id: str, library_id_list: Iterable[str]) -> str:
+    """
+    The cache id of an instrument run with this set of libraries
+    :param instrument_run_id:
+    :param library_id_list:
+    :return:
+    """
+    libraries_hash = hashlib.sha256(
+        "\n".join(sorted(set(library_id_list))).encode()
+    ).hexdigest()[:16]
+    return f"{instrument_run_id}__{libraries_hash}"
+
+
+def get_cached_instrument_run_project_ids(
+        instrument_run_id: str,
+        library_id_list: Iterable[str],
+) -> Optional[List[str]]:
+    """
+    Get the cached project ids of an instrument run
+    :param instrument_run_id:
+    :param library_id_list: The libraries currently linked to the run
+    :return: None if the instrument run (with these libraries) is not cached
+      (or the cache has expired / is unavailable)
+    """
+    table_name = get_instrument_run_project_cache_table_name()
+    if table_name is None:
+        return None
+
+    try:
+        item = get_dynamodb_client().get_item(
+            TableName=table_name,
+            Key={
+                "id": {"S": get_instrument_run_project_cache_id(instrument_run_id, library_id_list)},
+                "job_id": {"S": INSTRUMENT_RUN_PROJECT_CACHE_JOB_ID},
+            },
+            ProjectionExpression="project_id_list, expire_at",
+        ).get('Item', None)
+    except ClientError as e:
+        logger.warning(f"Could not read the instrument run project cache, skipping: {e}")
+        return None
+
+    if item is None:
+        return None
+
+    # TTL deletion is lazy, so check the expiry ourselves
+    if int(item['expire_at']['N']) < datetime.now(timezone.utc).timestamp():
+        return None
+
+    return list(map(
+        lambda project_id_iter_: project_id_iter_['S'],
+        item['project_id_list']['L']
+    ))
+
+
+def put_cached_instrument_run_project_ids(
+        instrument_run_id: str,
+        library_id_list: Iterable[str],
+        project_id_list: Iterable[str],
+        ttl_seconds: int = INSTRUMENT_RUN_PROJECT_CACHE_TTL_SECONDS,
+):
+    """
+    Write the complete set of project ids of an instrument run to the cache
+    :param instrument_run_id:
+    :param library_id_list: The libraries the project ids were resolved from
+    :param project_id_list:
+    :param ttl_seconds:
+    :return:
+    """
+    table_name = get_instrument_run_project_cache_table_name()
+    if table_name is None:
+        return
+
+    expire_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+
+    try:
+        get_dynamodb_client().put_item(
+            TableName=table_name,
+            Item={
+                "id": {"S": get_instrument_run_project_cache_id(instrument_run_id, library_id_list)},
+                "job_id": {"S": INSTRUMENT_RUN_PROJECT_CACHE_JOB_ID},
+                "context": {"S": INSTRUMENT_RUN_PROJECT_CACHE_CONTEXT},
+                # A list rather than a string set, string sets cannot be empty
+                "project_id_list": {"L": list(map(
+                    lambda project_id_iter_: {"S": project_id_iter_},
+                    sorted(set(project_id_list))
+                ))},
+                "expire_at": {"N": str(round(expire_at.timestamp()))},
+            }
+        )
+    except ClientError as e:
+        logger.warning(f"Could not write to the instrument run project cache, skipping: {e}")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+"""
+Legacy workflows
+
+Workflows run before the workflow manager existed are only found in the (athena) datamart.
+
+Rather than have each library / portal run of a package start its own athena query,
+we resolve the legacy workflows of a whole package up front,
+with one query per chunk of library ids / portal run ids.
+
+Each chunk's result set is cached under its query hash,
+
+  s3://<PACKAGE_MANIFEST_BUCKET_NAME>/<PACKAGE_MANIFEST_PREFIX>legacy-workflows/queries/<query_hash>.json
+
+(the legacy datamart is frozen, so a result set never goes stale),
+and the rows of the package are written alongside its manifests
+
+  s3://<PACKAGE_MANIFEST_BUCKET_NAME>/<PACKAGE_MANIFEST_PREFIX><job_id>/legacy-workflows.json
+
+for the per-library and per-portal-run lambdas to read.
+"""
+
+# Standard imports
+import json
+import typing
+import logging
+from hashlib import sha256
+from os import environ
+from textwrap import dedent
+from typing import List, Dict, Optional, Iterable, TypedDict
+
+from botocore.exceptions import ClientError
+
+# Local imports
+from .aws_helpers import get_boto3_client
+from .athena_helpers import run_athena_sql_query
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+# Keep each IN (...) list, and therefore each query, well within the athena query length limit
+LEGACY_WORKFLOW_QUERY_CHUNK_SIZE = 250
+
+
+class LegacyWorkflowRowTypeDef(TypedDict):
+    portalRunId: str
+    workflowName: str
+    workflowVersion: str
+    libraryId: str
+
+
+def get_s3_client() -> 'S3Client':
+    return get_boto3_client('s3')
+
+
+def get_legacy_workflow_rows_query(library_id_list: List[str], portal_run_id_list: List[str]) -> str:
+    """
+    Get every (portal run, library) row of the legacy workflows that
+    either include one of the libraries or are one of the portal runs.
+    All libraries of a matching portal run are returned, not just those in the list.
+    :param library_id_list:
+    :param portal_run_id_list:
+    :return: The query, with a parameter for each library id followed by each portal run id
+    """
+    def _get_in_list(id_list: List[str]) -> str:
+        # Athena does not accept an empty IN list
+        if len(id_list) == 0:
+            return "NULL"
+        return ", ".join(["?"] * len(id_list))
+
+    return dedent(
+        """
+        SELECT
+            portal_run_id AS portalRunId,
+            workflow_name AS workflowName,
+            workflow_version AS workflowVersion,
+            library_id AS libraryId
+        FROM workflow
+        WHERE portal_run_id IN (
+            SELECT portal_run_id
+            FROM workflow
+            WHERE (
+                library_id IN ({__LIBRARY_ID_LIST__}) OR
+                portal_run_id IN ({__PORTAL_RUN_ID_LIST__})
+            )
+        )
+        ORDER BY portal_run_id, library_id
+        """.format(
+            __LIBRARY_ID_LIST__=_get_in_list(library_id_list),
+            __PORTAL_RUN_ID_LIST__=_get_in_list(portal_run_id_list),
+        )
+    )
+
+
+def get_legacy_workflow_query_cache_bucket_and_key(sql_query: str, parameters: List[str]) -> tuple[str, str]:
+    return (
+        environ['PACKAGE_MANIFEST_BUCKET_NAME'],
+        (
+            f"{environ['PACKAGE_MANIFEST_PREFIX']}legacy-workflows/queries/"
+            f"{sha256(json.dumps([sql_query, parameters]).encode()).hexdigest()}.json"
+        )
+    )
+
+
+def get_legacy_workflow_rows_bucket_and_key(job_id: str) -> tuple[str, str]:
+    return (
+        environ['PACKAGE_MANIFEST_BUCKET_NAME'],
+        f"{environ['PACKAGE_MANIFEST_PREFIX']}{job_id}/legacy-workflows.json"
+    )
+
+
+def _get_json_object(bucket: str, key: str) -> Optional[List[LegacyWorkflowRowTypeDef]]:
+    try:
+        return json.loads(get_s3_client().get_object(
+            Bucket=bucket,
+            Key=key
+        )['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['NoSuchKey', '404']:
+            return None
+        raise
+
+
+def _put_json_object(bucket: str, key: str, rows: List[LegacyWorkflowRowTypeDef]):
+    get_s3_client().put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(rows, separators=(",", ":")).encode(),
+    )
+
+
+def run_cached_legacy_workflow_rows_query(
+        library_id_list: List[str],
+        portal_run_id_list: List[str]
+) -> List[LegacyWorkflowRowTypeDef]:
+    """
+    Run a legacy workflow query, unless its result set has already been cached
+    :param library_id_list:
+    :param portal_run_id_list:
+    :return:
+    """
+    sql_query = get_legacy_workflow_rows_query(library_id_list, portal_run_id_list)
+    parameters = library_id_list + portal_run_id_list
+    bucket, key = get_legacy_workflow_query_cache_bucket_and_key(sql_query, parameters)
+
+    rows = _get_json_object(bucket, key)
+    if rows is not None:
+        return rows
+
+    rows = list(map(
+        lambda row_iter_: {
+            "portalRunId": row_iter_['portalRunId'],
+            "workflowName": row_iter_['workflowName'],
+            "workflowVersion": row_iter_['workflowVersion'],
+            "libraryId": row_iter_['libraryId'],
+        },
+        run_athena_sql_query(sql_query, parameters=parameters)
+    ))
+
+    _put_json_object(bucket, key, rows)
+
+    return rows
+
+
+def _get_chunks(id_list: List[str], chunk_size: int) -> List[List[str]]:
+    return list(map(
+        lambda index_iter_: id_list[index_iter_:index_iter_ + chunk_size],
+        range(0, len(id_list), chunk_size)
+    ))
+
+
+def query_legacy_workflow_rows(
+        library_id_list: Iterable[str],
+        portal_run_id_list: Optional[Iterable[str]] = None,
+        chunk_size: int = LEGACY_WORKFLOW_QUERY_CHUNK_SIZE,
+) -> List[LegacyWorkflowRowTypeDef]:
+    """
+    Resolve the legacy workflow rows for a set of libraries and portal runs,
+    one (cached) query per chunk of ids
+    :param library_id_list:
+    :param portal_run_id_list:
+    :param chunk_size:
+    :return: The unique rows, ordered by portal run id then library id
+    """
+    # Sort the ids, so the same set of ids always gives the same queries (and therefore hits the cache)
+    library_id_list = sorted(set(library_id_list))
+    portal_run_id_list = sorted(set(portal_run_id_list or []))
+
+    # Pairs of (library id list, portal run id list)
+    query_list = (
+        list(map(
+            lambda chunk_iter_: (chunk_iter_, []),
+            _get_chunks(library_id_list, chunk_size)
+        )) +
+        list(map(
+            lambda chunk_iter_: ([], chunk_iter_),
+            _get_chunks(portal_run_id_list, chunk_size)
+        ))
+    )
+
+    rows_by_key: Dict[tuple, LegacyWorkflowRowTypeDef] = {}
+    for query_iter_ in query_list:
+        for row_iter_ in run_cached_legacy_workflow_rows_query(*query_iter_):
+            rows_by_key[(
+                row_iter_['portalRunId'],
+                row_iter_['libraryId'],
+                row_iter_['workflowName'],
+                row_iter_['workflowVersion'],
+            )] = row_iter_
+
+    logger.info(
+        f"Resolved {len(rows_by_key)} legacy workflow rows for {len(library_id_list)} libraries "
+        f"and {len(portal_run_id_list)} portal runs with {len(query_list)} queries"
+    )
+
+    return list(map(
+        lambda key_iter_: rows_by_key[key_iter_],
+        sorted(rows_by_key.keys())
+    ))
+
+
+def write_legacy_workflow_rows(job_id: str, rows: List[LegacyWorkflowRowTypeDef]):
+    _put_json_object(*get_legacy_workflow_rows_bucket_and_key(job_id), rows)
+
+
+def load_legacy_workflow_rows(job_id: str) -> Optional[List[LegacyWorkflowRowTypeDef]]:
+    """
+    Load the legacy workflow rows of a packaging job
+    :param job_id:
+    :return: None if the legacy workflows of this job have not been resolved
+    """
+    return _get_json_object(*get_legacy_workflow_rows_bucket_and_key(job_id))
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+"""
+Package manifest snapshots
+
+Once a packaging job has finished populating the packaging lookup table,
+we write an immutable parquet snapshot of each context (library, fastq, workflow, file)
+to the artifacts bucket under
+
+  s3://<PACKAGE_MANIFEST_BUCKET_NAME>/<PACKAGE_MANIFEST_PREFIX><job_id>/<context>.parquet
+
+Downstream consumers (push, presign, report) can then read the whole context
+with a single GET rather than paging through the content index on every invocation.
+
+The content index is only eventually consistent, so before writing a snapshot we check
+the number of records read back against the number of records counted by the writers,
+and retry until they match. A snapshot is never written from a partial read,
+which is what allows consumers to cache it for the lifetime of their container.
+
+Each snapshot holds the original json 'content' column, so that records round-trip
+exactly as they were stored in the table, alongside a set of flattened 'hot' columns
+that can be read on their own without decoding the json.
+
+pyarrow is imported lazily so that consumers of the layer that never touch
+the snapshot (i.e. the API) do not need to ship it.
+"""
+
+# Standard imports
+import json
+import typing
+import logging
+from os import environ
+from time import sleep
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import List, Dict, Optional, Union, Literal, Any
+from botocore.exceptions import ClientError
+
+# Local imports
+from .aws_helpers import get_boto3_client
+from .dynamodb_helpers import iter_dynamodb_table, validate_projection, PROJECTED_ATTRIBUTES_BY_CONTEXT
+from .dynamodb_write_helpers import get_packaging_record_counts
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+    import pyarrow as pa
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+PackageManifestContextType = Literal[
+    "library",
+    "fastq",
+    "workflow",
+    "file",
+]
+
+PACKAGE_MANIFEST_CONTEXT_LIST: List[PackageManifestContextType] = [
+    "library",
+    "fastq",
+    "workflow",
+    "file",
+]
+
+# Top-level scalar attributes we also store as their own columns
+PACKAGE_MANIFEST_HOT_COLUMNS_BY_CONTEXT: Dict[PackageManifestContextType, List[str]] = {
+    "library": ["orcabusId", "libraryId"],
+    "fastq": ["id", "rgid", "instrumentRunId"],
+    "workflow": ["orcabusId", "portalRunId", "workflowName"],
+    "file": PROJECTED_ATTRIBUTES_BY_CONTEXT["file"],
+}
+
+PACKAGE_MANIFEST_CONTENT_COLUMN = "content"
+PACKAGE_MANIFEST_LOCAL_CACHE_DIR = Path("/tmp/package_manifests")
+
+# Read the content index back up to this many times before giving up on a snapshot
+PACKAGE_MANIFEST_MAX_READ_ATTEMPTS = 6
+PACKAGE_MANIFEST_BASE_BACKOFF_SECONDS = 2
+
+
+class PackageManifestIncompleteError(Exception):
+    """
+    The content index has not (yet) returned every record written for a packaging job context
+    """
+    pass
+
+
+def get_s3_client() -> 'S3Client':
+    return get_boto3_client('s3')
+
+
+def get_package_manifest_bucket_and_key(
+        job_id: str,
+        context: PackageManifestContextType
+) -> tuple[str, str]:
+    """
+    Get the bucket and key of the manifest snapshot for a packaging job id and context
+    :param job_id:
+    :param context:
+    :return:
+    """
+    return (
+        environ['PACKAGE_MANIFEST_BUCKET_NAME'],
+        f"{environ['PACKAGE_MANIFEST_PREFIX']}{job_id}/{context}.parquet"
+    )
+
+
+def get_package_manifest_local_path(
+        job_id: str,
+        context: PackageManifestContextType
+) -> Path:
+    return PACKAGE_MANIFEST_LOCAL_CACHE_DIR.joinpath(job_id, f"{context}.parquet")
+
+
+def _get_hot_column_value(record: Dict[str, Any], column_name: str) -> Optional[Union[str, int]]:
+    """
+    Hot column values are stored as strings, bar 'size' which is stored as an int
+    :param record:
+    :param column_name:
+    :return:
+    """
+    value = record.get(column_name, None)
+    if value is None:
+        return None
+    if column_name == "size":
+        return int(value)
+    return str(value)
+
+
+def build_package_manifest_table(
+        records_list: List[Dict[str, Any]],
+        context: PackageManifestContextType
+) -> 'pa.Table':
+    """
+    Convert a list of decoded records into an arrow table
+    :param records_list:
+    :param context:
+    :return:
+    """
+    import pyarrow as pa
+
+    hot_columns = PACKAGE_MANIFEST_HOT_COLUMNS_BY_CONTEXT[context]
+
+    return pa.table(
+        {
+            **{
+                column_name_iter_: pa.array(
+                    list(map(
+                        lambda record_iter_: _get_hot_column_value(record_iter_, column_name_iter_),
+                        records_list
+                    )),
+                    type=pa.int64() if column_name_iter_ == "size" else pa.string()
+                )
+                for column_name_iter_ in hot_columns
+            },
+            PACKAGE_MANIFEST_CONTENT_COLUMN: pa.array(
+                list(map(
+                    lambda record_iter_: json.dumps(record_iter_),
+                    records_list
+                )),
+                type=pa.string()
+            ),
+        }
+    )
+
+
+def read_package_manifest_records(
+        job_id: str,
+        context: PackageManifestContextType,
+        expected_record_count: Optional[int],
+        max_attempts: int = PACKAGE_MANIFEST_MAX_READ_ATTEMPTS
+) -> List[Dict[str, Any]]:
+    """
+    Read all records of a context from the packaging lookup table,
+    retrying with exponential backoff until we have read back the expected number of records
+    :param job_id:
+    :param context:
+    :param expected_record_count: The number of records counted by the writers, None to skip the check
+    :param max_attempts:
+    :return:
+    """
+    records_list = []
+    for attempt in range(max_attempts):
+        if attempt > 0:
+            sleep(PACKAGE_MANIFEST_BASE_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+
+        records_list = list(iter_dynamodb_table(job_id, context))
+        if expected_record_count is None or len(records_list) == expected_record_count:
+            return records_list
+
+        logger.info(
+            f"Read {len(records_list)} of {expected_record_count} '{context}' records "
+            f"for job '{job_id}' (attempt {attempt + 1} of {max_attempts})"
+        )
+
+    raise PackageManifestIncompleteError(
+        f"Expected {expected_record_count} '{context}' records for job '{job_id}', "
+        f"but read {len(records_list)} from the content index after {max_attempts} attempts"
+    )
+
+
+def write_package_manifest(
+        job_id: str,
+        context_list: Optional[List[PackageManifestContextType]] = None
+) -> Dict[PackageManifestContextType, Dict[str, Union[str, int]]]:
+    """
+    Snapshot each context of a packaging job from the packaging lookup table into s3.
+    Raises a PackageManifestIncompleteError if a context cannot be read back in full,
+    in which case consumers fall back to the packaging lookup table.
+    :param job_id:
+    :param context_list:
+    :return: A dictionary of context to the manifest uri and record count
+    """
+    import pyarrow.parquet as pq
+
+    if context_list is None:
+        context_list = PACKAGE_MANIFEST_CONTEXT_LIST
+
+    record_counts = get_packaging_record_counts(job_id)
+    if record_counts is None:
+        logger.warning(f"No record counts found for job '{job_id}', snapshot completeness will not be checked")
+
+    manifest_outputs = {}
+    for context_iter_ in context_list:
+        records_list = read_package_manifest_records(
+            job_id, context_iter_,
+            expected_record_count=(
+                record_counts.get(context_iter_, 0)
+                if record_counts is not None
+                else None
+            )
+        )
+        bucket, key = get_package_manifest_bucket_and_key(job_id, context_iter_)
+
+        with NamedTemporaryFile(suffix=".parquet") as temp_file_h:
+            pq.write_table(
+                build_package_manifest_table(records_list, context_iter_),
+                temp_file_h.name,
+                compression="zstd"
+            )
+            get_s3_client().upload_file(
+                Filename=temp_file_h.name,
+                Bucket=bucket,
+                Key=key
+            )
+
+        manifest_outputs[context_iter_] = {
+            "manifestUri": f"s3://{bucket}/{key}",
+            "recordCount": len(records_list),
+        }
+
+    return manifest_outputs
+
+
+def download_package_manifest(
+        job_id: str,
+        context: PackageManifestContextType
+) -> Optional[Path]:
+    """
+    Download the manifest into the local cache (if not already there).
+    Snapshots are only written once every record of the job has been read back, and are never rewritten
+    with different contents, so a cached copy is valid for the lifetime of the container.
+    :param job_id:
+    :param context:
+    :return: The local path, or None if no snapshot exists for this job
+    """
+    local_path = get_package_manifest_local_path(job_id, context)
+    if local_path.is_file():
+        return local_path
+
+    bucket, key = get_package_manifest_bucket_and_key(job_id, context)
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Download to a sibling file first, so a partial download is never picked up by the cache
+    temp_path = local_path.with_suffix(".parquet.partial")
+    try:
+        get_s3_client().download_file(
+            Bucket=bucket,
+            Key=key,
+            Filename=str(temp_path)
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ['404', 'NoSuchKey']:
+            return None
+        raise e
+
+    temp_path.rename(local_path)
+    return local_path
+
+
+def load_package_manifest_table(
+        job_id: str,
+        context: PackageManifestContextType,
+        columns: Optional[List[str]] = None
+) -> Optional['pa.Table']:
+    """
+    Read the manifest snapshot as an arrow table, memory-mapped from the local cache
+    :param job_id:
+    :param context:
+    :param columns: Optional subset of columns to read
+    :return: The arrow table, or None if no snapshot exists for this job
+    """
+    import pyarrow.parquet as pq
+
+    local_path = download_package_manifest(job_id, context)
+    if local_path is None:
+        return None
+
+    return pq.read_table(
+        local_path,
+        columns=columns,
+        memory_map=True
+    )
+
+
+def load_package_manifest(
+        job_id: str,
+        context: PackageManifestContextType = "file",
+        columns: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Load all records for a packaging job / context.
+    Reads the manifest snapshot if one exists, otherwise falls back to the packaging lookup table.
+    :param job_id:
+    :param context:
+    :param columns: Only load these attributes of each record, must be in PROJECTED_ATTRIBUTES_BY_CONTEXT.
+      These are read from the hot columns of the snapshot (or the projected attributes of the table)
+      so the json content is never decoded.
+    :return:
+    """
+    if columns is not None:
+        validate_projection(context, columns)
+        manifest_table = load_package_manifest_table(job_id, context, columns=columns)
+        if manifest_table is None:
+            logger.info(f"No manifest snapshot found for job '{job_id}' context '{context}', querying dynamodb")
+            return list(iter_dynamodb_table(job_id, context, projection=columns))
+        # Drop absent attributes, as the dynamodb path does
+        return list(map(
+            lambda row_iter_: {
+                key: value
+                for key, value in row_iter_.items()
+                if value is not None
+            },
+            manifest_table.to_pylist()
+        ))
+
+    manifest_table = load_package_manifest_table(
+        job_id, context,
+        columns=[PACKAGE_MANIFEST_CONTENT_COLUMN]
+    )
+
+    if manifest_table is None:
+        logger.info(f"No manifest snapshot found for job '{job_id}' context '{context}', querying dynamodb")
+        return list(iter_dynamodb_table(job_id, context))
+
+    return list(map(
+        json.loads,
+        manifest_table.column(PACKAGE_MANIFEST_CONTENT_COLUMN).to_pylist()
+    ))
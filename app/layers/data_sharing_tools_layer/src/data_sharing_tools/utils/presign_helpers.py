@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+Batch presigning of s3 objects through the filemanager.
+
+Rather than two filemanager api calls per object (s3 uri -> s3 object id -> presigned url),
+objects are presigned by ingest id in a single batch call.
+Objects without an ingest id are first resolved to their file object (concurrently, one call each),
+and then join the same batch.
+
+The filemanager sets the expiry of the urls it presigns (seven days),
+we do not sign urls ourselves, as no credentials available to a lambda
+(i.e. chained role sessions, capped at one hour) can sign a url that lives that long.
+"""
+
+# Standard imports
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, TypedDict, NotRequired
+from urllib.parse import urlparse, parse_qs
+
+# Orcabus API tools
+from orcabus_api_tools.filemanager import (
+    get_presigned_url,
+    get_presigned_urls_from_ingest_ids,
+    get_file_object_from_s3_uri,
+)
+
+# Local imports
+from .concurrency_helpers import map_concurrently
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+FILEMANAGER_PRESIGNED_URL_EXPIRY_SECONDS = 7 * 24 * 60 * 60  # 7 days
+
+
+class S3ObjectToPresignTypeDef(TypedDict):
+    bucket: str
+    key: str
+    ingestId: NotRequired[str]
+
+
+class PresignedUrlTypeDef(TypedDict):
+    bucket: NotRequired[str]
+    key: NotRequired[str]
+    ingestId: NotRequired[str]
+    presignedUrl: str
+    presignedExpiry: str
+
+
+def datetime_to_isoformat(dt: datetime) -> str:
+    return dt.isoformat(sep="T", timespec="seconds").replace("+00:00", "Z")
+
+
+def get_presigned_url_expiry_as_isoformat(presigned_url: str) -> str:
+    """
+    Read the expiry of a SigV4 presigned url from its X-Amz-Date and X-Amz-Expires query parameters
+    :param presigned_url:
+    :return:
+    """
+    query_params = parse_qs(urlparse(presigned_url).query)
+    amz_date = datetime.strptime(
+        query_params['X-Amz-Date'][0], "%Y%m%dT%H%M%SZ"
+    ).replace(tzinfo=timezone.utc)
+    return datetime_to_isoformat(amz_date + timedelta(seconds=int(query_params['X-Amz-Expires'][0])))
+
+
+def _get_ingest_id_or_s3_object_id_from_s3_uri(s3_uri: str) -> Dict[str, Optional[str]]:
+    file_object = get_file_object_from_s3_uri(s3_uri)
+    return {
+        "ingestId": file_object.get('ingestId', None),
+        "s3ObjectId": file_object['s3ObjectId'],
+    }
+
+
+def presign_s3_objects(
+        s3_object_list: List[S3ObjectToPresignTypeDef],
+) -> List[PresignedUrlTypeDef]:
+    """
+    Presign a list of s3 objects through the filemanager.
+    Objects with an ingest id are presigned in a single batch call,
+    objects without one are first looked up by their s3 uri.
+    :param s3_object_list:
+    :return: The s3 objects, in the same order, with their presigned url and expiry
+    """
+    if len(s3_object_list) == 0:
+        return []
+
+    # Resolve the objects without an ingest id
+    s3_uri_list = list(map(
+        lambda s3_object_iter_: f"s3://{s3_object_iter_['bucket']}/{s3_object_iter_['key']}",
+        s3_object_list
+    ))
+    s3_uris_to_resolve = list(dict.fromkeys(
+        s3_uri_iter_
+        for s3_uri_iter_, s3_object_iter_ in zip(s3_uri_list, s3_object_list)
+        if s3_object_iter_.get('ingestId', None) is None
+    ))
+    if len(s3_uris_to_resolve) > 0:
+        logger.info(f"Looking up the ingest ids of {len(s3_uris_to_resolve)} objects through the filemanager")
+    file_ids_by_s3_uri = dict(zip(
+        s3_uris_to_resolve,
+        map_concurrently(_get_ingest_id_or_s3_object_id_from_s3_uri, s3_uris_to_resolve)
+    ))
+
+    ingest_id_list = [
+        (
+            s3_object_iter_['ingestId']
+            if s3_object_iter_.get('ingestId', None) is not None
+            else file_ids_by_s3_uri[s3_uri_iter_]['ingestId']
+        )
+        for s3_uri_iter_, s3_object_iter_ in zip(s3_uri_list, s3_object_list)
+    ]
+
+    # Presign everything with an ingest id in a single batch call
+    presigned_url_by_ingest_id = {}
+    unique_ingest_id_list = list(dict.fromkeys(filter(
+        lambda ingest_id_iter_: ingest_id_iter_ is not None,
+        ingest_id_list
+    )))
+    if len(unique_ingest_id_list) > 0:
+        presigned_url_by_ingest_id = {
+            presigned_url_dict_iter_['ingestId']: presigned_url_dict_iter_['presignedUrl']
+            for presigned_url_dict_iter_ in get_presigned_urls_from_ingest_ids(unique_ingest_id_list)
+        }
+
+    # Objects the filemanager has no ingest id for are presigned one by one by their s3 object id
+    presigned_url_list = []
+    for s3_uri_iter_, s3_object_iter_, ingest_id_iter_ in zip(s3_uri_list, s3_object_list, ingest_id_list):
+        presigned_url = presigned_url_by_ingest_id.get(ingest_id_iter_, None)
+        if presigned_url is None:
+            if s3_uri_iter_ not in file_ids_by_s3_uri:
+                file_ids_by_s3_uri[s3_uri_iter_] = _get_ingest_id_or_s3_object_id_from_s3_uri(s3_uri_iter_)
+            presigned_url = get_presigned_url(
+                s3_object_id=file_ids_by_s3_uri[s3_uri_iter_]['s3ObjectId']
+            )
+        presigned_url_list.append({
+            **s3_object_iter_,
+            "presignedUrl": presigned_url,
+            "presignedExpiry": get_presigned_url_expiry_as_isoformat(presigned_url),
+        })
+
+    return presigned_url_list
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+"""
+Presigned url cache.
+
+Presigned urls are cached in the packaging lookup table, keyed by (bucket, key, version),
+under their own job id so they never collide with the records of a packaging job.
+Cache entries expire (through the table's TTL) at the same time as their url.
+
+get_presigned_urls is the single lookup api, it returns any cached urls that are still valid
+for at least min_validity_seconds, presigns only the stale or missing objects in a single batch
+and writes those back to the cache.
+
+The cache is best-effort, if the PRESIGNED_URL_CACHE_TABLE_NAME environment variable is not set
+or the table cannot be read / written to, we just presign everything.
+
+Item layout
+
+  * id: s3://<bucket>/<key> (with ?versionId=<version_id> if the object is versioned)
+  * job_id: PRESIGNED_URL_CACHE_JOB_ID
+  * context: <PRESIGNED_URL_CACHE_JOB_ID>__url
+  * presigned_url / presigned_expiry: as for file records in the presigning state machine
+  * expire_at: the url expiry as an epoch
+"""
+
+# Standard imports
+import logging
+from datetime import datetime, timedelta, timezone
+from os import environ
+from typing import List, Dict, Optional, NotRequired
+
+from botocore.exceptions import ClientError
+
+# Local imports
+from .dynamodb_helpers import get_dynamodb_client, BATCH_GET_MAX_ITEMS
+from .dynamodb_write_helpers import (
+    BATCH_WRITE_MAX_ITEMS,
+    DEFAULT_BATCH_WRITE_MAX_ATTEMPTS,
+    _chunk_list,
+    _write_chunk,
+)
+from .presign_helpers import (
+    S3ObjectToPresignTypeDef,
+    PresignedUrlTypeDef,
+    FILEMANAGER_PRESIGNED_URL_EXPIRY_SECONDS,
+    presign_s3_objects,
+)
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+# Globals
+PRESIGNED_URL_CACHE_JOB_ID = "presigned_url_cache"
+PRESIGNED_URL_CACHE_CONTEXT = f"{PRESIGNED_URL_CACHE_JOB_ID}__url"
+
+
+class CachedS3ObjectToPresignTypeDef(S3ObjectToPresignTypeDef):
+    versionId: NotRequired[Optional[str]]
+
+
+def get_presigned_url_cache_table_name() -> Optional[str]:
+    return environ.get("PRESIGNED_URL_CACHE_TABLE_NAME", None)
+
+
+def get_presigned_url_cache_id(bucket: str, key: str, version_id: Optional[str] = None) -> str:
+    cache_id = f"s3://{bucket}/{key}"
+    if version_id is not None:
+        cache_id += f"?versionId={version_id}"
+    return cache_id
+
+
+def _get_cache_id(s3_object: CachedS3ObjectToPresignTypeDef) -> str:
+    return get_presigned_url_cache_id(
+        s3_object['bucket'],
+        s3_object['key'],
+        s3_object.get('versionId', None)
+    )
+
+
+def _isoformat_to_datetime(isoformat_str: str) -> datetime:
+    return datetime.fromisoformat(isoformat_str.replace("Z", "+00:00"))
+
+
+def get_cached_presigned_urls(
+        cache_id_list: List[str],
+        min_validity_seconds: int,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Get the cached urls for a list of cache ids
+    :param cache_id_list:
+    :param min_validity_seconds: Only return urls valid for at least this many more seconds
+    :return: A dictionary of cache id to {presignedUrl, presignedExpiry}
+    """
+    table_name = get_presigned_url_cache_table_name()
+    valid_after = datetime.now(timezone.utc) + timedelta(seconds=min_validity_seconds)
+    cached_urls_by_id = {}
+
+    cache_id_list = list(dict.fromkeys(cache_id_list))
+    for i in range(0, len(cache_id_list), BATCH_GET_MAX_ITEMS):
+        request_items = {
+            table_name: {
+                "Keys": list(map(
+                    lambda cache_id_iter_: {
+                        "id": {"S": cache_id_iter_},
+                        "job_id": {"S": PRESIGNED_URL_CACHE_JOB_ID},
+                    },
+                    cache_id_list[i:i + BATCH_GET_MAX_ITEMS]
+                )),
+                "ProjectionExpression": "#id, presigned_url, presigned_expiry",
+                "ExpressionAttributeNames": {
+                    "#id": "id",
+                },
+            }
+        }
+
+        while request_items:
+            response = get_dynamodb_client().batch_get_item(RequestItems=request_items)
+            for item_iter_ in response['Responses'].get(table_name, []):
+                # TTL deletion is lazy, so check the expiry ourselves
+                if _isoformat_to_datetime(item_iter_['presigned_expiry']['S']) < valid_after:
+                    continue
+                cached_urls_by_id[item_iter_['id']['S']] = {
+                    "presignedUrl": item_iter_['presigned_url']['S'],
+                    "presignedExpiry": item_iter_['presigned_expiry']['S'],
+                }
+            request_items = response.get('UnprocessedKeys', {})
+
+    return cached_urls_by_id
+
+
+def put_cached_presigned_urls(presigned_url_by_id: Dict[str, PresignedUrlTypeDef]):
+    """
+    Write presigned urls to the cache
+    :param presigned_url_by_id: A dictionary of cache id to presigned url
+    :return:
+    """
+    table_name = get_presigned_url_cache_table_name()
+
+    item_list = list(map(
+        lambda kv_iter_: {
+            "id": {"S": kv_iter_[0]},
+            "job_id": {"S": PRESIGNED_URL_CACHE_JOB_ID},
+            "context": {"S": PRESIGNED_URL_CACHE_CONTEXT},
+            "presigned_url": {"S": kv_iter_[1]['presignedUrl']},
+            "presigned_expiry": {"S": kv_iter_[1]['presignedExpiry']},
+            "expire_at": {"N": str(round(_isoformat_to_datetime(kv_iter_[1]['presignedExpiry']).timestamp()))},
+        },
+        presigned_url_by_id.items()
+    ))
+
+    for chunk_iter_ in _chunk_list(item_list, BATCH_WRITE_MAX_ITEMS):
+        _write_chunk(table_name, chunk_iter_, DEFAULT_BATCH_WRITE_MAX_ATTEMPTS)
+
+
+def get_presigned_urls(
+        s3_object_list: List[CachedS3ObjectToPresignTypeDef],
+        min_validity_seconds: Optional[int] = None,
+) -> List[PresignedUrlTypeDef]:
+    """
+    Get presigned urls for a list of s3 objects, reusing cached urls where they are still valid
+    :param s3_object_list:
+    :param min_validity_seconds: Reuse cached urls that are valid for at least this many more seconds,
+      defaults to six sevenths of the filemanager expiry (i.e. six days)
+    :return: The s3 objects, in the same order, with their presigned url and expiry
+    """
+    if min_validity_seconds is None:
+        min_validity_seconds = FILEMANAGER_PRESIGNED_URL_EXPIRY_SECONDS * 6 // 7
+
+    if len(s3_object_list) == 0:
+        return []
+
+    cache_id_list = list(map(_get_cache_id, s3_object_list))
+
+    cached_urls_by_id = {}
+    if get_presigned_url_cache_table_name() is not None:
+        try:
+            cached_urls_by_id = get_cached_presigned_urls(cache_id_list, min_validity_seconds)
+        except ClientError as e:
+            logger.warning(f"Could not read from the presigned url cache, presigning all objects: {e}")
+
+    # Presign the stale objects (once per cache id)
+    stale_s3_objects_by_id = {
+        cache_id_iter_: s3_object_iter_
+        for cache_id_iter_, s3_object_iter_ in zip(cache_id_list, s3_object_list)
+        if cache_id_iter_ not in cached_urls_by_id
+    }
+    presigned_urls_by_id = dict(zip(
+        stale_s3_objects_by_id.keys(),
+        presign_s3_objects(list(stale_s3_objects_by_id.values()))
+    ))
+
+    logger.info(
+        f"Reused {len(s3_object_list) - len(stale_s3_objects_by_id)} cached presigned urls, "
+        f"presigned {len(stale_s3_objects_by_id)}"
+    )
+
+    if get_presigned_url_cache_table_name() is not None and len(presigned_urls_by_id) > 0:
+        try:
+            put_cached_presigned_urls(presigned_urls_by_id)
+        except (ClientError, RuntimeError) as e:
+            logger.warning(f"Could not write to the presigned url cache: {e}")
+
+    return list(map(
+        lambda kv_iter_: {
+            **kv_iter_[1],
+            "presignedUrl": (
+                presigned_urls_by_id[kv_iter_[0]]['presignedUrl']
+                if kv_iter_[0] in presigned_urls_by_id
+                else cached_urls_by_id[kv_iter_[0]]['presignedUrl']
+            ),
+            "presignedExpiry": (
+                presigned_urls_by_id[kv_iter_[0]]['presignedExpiry']
+                if kv_iter_[0] in presigned_urls_by_id
+                else cached_urls_by_id[kv_iter_[0]]['presignedExpiry']
+            ),
+        },
+        zip(cache_id_list, s3_object_list)
+    ))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+"""
+Push plans
+
+The push state machines first ask a lambda how many items (i.e. destination / source uri mappings) a push has,
+then invoke it again for each slice of those items.
+Rather than have every invocation re-query and re-group the whole package,
+we compute the items once, and write them (in order) as json lines alongside the package manifest under
+
+  s3://<PACKAGE_MANIFEST_BUCKET_NAME>/<PACKAGE_MANIFEST_PREFIX><job_id>/plans/<plan_name>/<push_location_hash>.jsonl
+
+with an index of the byte offset of each line
+
+  s3://<PACKAGE_MANIFEST_BUCKET_NAME>/<PACKAGE_MANIFEST_PREFIX><job_id>/plans/<plan_name>/<push_location_hash>.index.json
+
+so that each slice is a single ranged GET of just its own lines.
+"""
+
+# Standard imports
+import json
+import typing
+import logging
+from hashlib import sha256
+from os import environ
+from typing import List, Dict, Optional, Iterable, Iterator, TypedDict, Any
+
+from botocore.exceptions import ClientError
+
+# Local imports
+from .aws_helpers import get_boto3_client
+from .s3_helpers import upload_str_iter_to_s3
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+# Set logging
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+
+class PushPlanIndexTypeDef(TypedDict):
+    recordCount: int
+    # The offset of each line, followed by the size of the plan
+    byteOffsets: List[int]
+
+
+def get_s3_client() -> 'S3Client':
+    return get_boto3_client('s3')
+
+
+def get_push_plan_bucket_and_key_prefix(
+        job_id: str,
+        plan_name: str,
+        push_location: str
+) -> tuple[str, str]:
+    """
+    Get the bucket and key prefix (less the extension) of a push plan
+    :param job_id:
+    :param plan_name:
+    :param push_location:
+    :return:
+    """
+    return (
+        environ['PACKAGE_MANIFEST_BUCKET_NAME'],
+        (
+            f"{environ['PACKAGE_MANIFEST_PREFIX']}{job_id}/plans/{plan_name}/"
+            f"{sha256(push_location.encode()).hexdigest()[:16]}"
+        )
+    )
+
+
+def write_push_plan(
+        job_id: str,
+        plan_name: str,
+        push_location: str,
+        record_iter: Iterable[Dict[str, Any]],
+) -> PushPlanIndexTypeDef:
+    """
+    Write the records of a push plan, in order, as json lines alongside their byte offset index
+    :param job_id:
+    :param plan_name:
+    :param push_location:
+    :param record_iter:
+    :return: The index of the plan
+    """
+    bucket, key_prefix = get_push_plan_bucket_and_key_prefix(job_id, plan_name, push_location)
+    byte_offsets = [0]
+
+    def _iter_lines() -> Iterator[str]:
+        for record_iter_ in record_iter:
+            line = json.dumps(record_iter_, separators=(",", ":")) + "\n"
+            byte_offsets.append(byte_offsets[-1] + len(line.encode()))
+            yield line
+
+    upload_str_iter_to_s3(
+        _iter_lines(),
+        bucket=bucket,
+        key=f"{key_prefix}.jsonl",
+    )
+
+    # Write the index last, a plan without an index is treated as missing
+    push_plan_index: PushPlanIndexTypeDef = {
+        "recordCount": len(byte_offsets) - 1,
+        "byteOffsets": byte_offsets,
+    }
+    get_s3_client().put_object(
+        Bucket=bucket,
+        Key=f"{key_prefix}.index.json",
+        Body=json.dumps(push_plan_index, separators=(",", ":")).encode(),
+    )
+
+    logger.info(f"Wrote push plan s3://{bucket}/{key_prefix}.jsonl with {push_plan_index['recordCount']} records")
+
+    return push_plan_index
+
+
+def get_push_plan_index(
+        job_id: str,
+        plan_name: str,
+        push_location: str
+) -> Optional[PushPlanIndexTypeDef]:
+    """
+    Get the index of a push plan
+    :param job_id:
+    :param plan_name:
+    :param push_location:
+    :return: None if the plan has not been written
+    """
+    bucket, key_prefix = get_push_plan_bucket_and_key_prefix(job_id, plan_name, push_location)
+
+    try:
+        response = get_s3_client().get_object(
+            Bucket=bucket,
+            Key=f"{key_prefix}.index.json",
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] in ['NoSuchKey', '404']:
+            return None
+        raise
+
+    return json.loads(response['Body'].read())
+
+
+def read_push_plan_slice(
+        job_id: str,
+        plan_name: str,
+        push_location: str,
+        push_plan_index: PushPlanIndexTypeDef,
+        start: int,
+        end: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read the records start to end (inclusive) of a push plan with a single ranged GET
+    :param job_id:
+    :param plan_name:
+    :param push_location:
+    :param push_plan_index:
+    :param start:
+    :param end: Defaults to the last record
+    :return:
+    """
+    bucket, key_prefix = get_push_plan_bucket_and_key_prefix(job_id, plan_name, push_location)
+
+    if end is None:
+        end = push_plan_index['recordCount'] - 1
+
+    # Clip to the plan, as a list slice would
+    start = max(start, 0)
+    end = min(end, push_plan_index['recordCount'] - 1)
+    if start > end:
+        return []
+
+    response = get_s3_client().get_object(
+        Bucket=bucket,
+        Key=f"{key_prefix}.jsonl",
+        Range=f"bytes={push_plan_index['byteOffsets'][start]}-{push_plan_index['byteOffsets'][end + 1] - 1}",
+    )
+
+    return list(map(
+        json.loads,
+        response['Body'].read().decode().splitlines()
+    ))
@@ -9,8 +9,8 @@ Given a list of json files, convert them into a single csv file and return as a
 # Imports
 import typing
 import json
-import boto3
-from typing import List, Optional, Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Any, Dict, Iterable, TypedDict
 from tempfile import TemporaryDirectory
 from pathlib import Path
 
@@ -25,15 +25,24 @@ import logging
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
-# Orcabus API tools
-from orcabus_api_tools.filemanager import (
-    get_presigned_url,
-    get_s3_object_id_from_s3_uri
-)
+# Local imports
+from .aws_helpers import get_boto3_client
+from .presigned_url_cache import get_presigned_urls
+
+# Globals
+# Every part bar the last must be at least 5 MiB
+MULTIPART_UPLOAD_PART_SIZE_BYTES = 8 * 1024 * 1024
+# boto3 clients keep a pool of 10 connections by default
+DEFAULT_LIST_MAX_WORKERS = 10
+
+
+class S3ObjectSummaryTypeDef(TypedDict):
+    size: int
+    eTag: str
 
 
 def get_s3_client() -> 'S3Client':
-    return boto3.client('s3')
+    return get_boto3_client('s3')
 
 
 def download_s3_file(s3_client: 'S3Client', bucket: str, key: str, file_path: Path):
@@ -47,6 +56,58 @@ def list_s3_objects(s3_client: 'S3Client', bucket: str, prefix: str) -> List['Ob
     return s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)['Contents']
 
 
+def list_s3_objects_in_folder(s3_client: 'S3Client', bucket: str, folder_prefix: str) -> Dict[str, S3ObjectSummaryTypeDef]:
+    """
+    List the objects directly under a folder prefix (not those in its sub folders)
+    :param s3_client:
+    :param bucket:
+    :param folder_prefix: Either empty (the root of the bucket) or ending in a '/'
+    :return: A dictionary of key to size and eTag
+    """
+    s3_object_summaries_by_key = {}
+    for page_iter_ in s3_client.get_paginator('list_objects_v2').paginate(
+            Bucket=bucket,
+            Prefix=folder_prefix,
+            Delimiter="/"
+    ):
+        for s3_object_iter_ in page_iter_.get('Contents', []):
+            s3_object_summaries_by_key[s3_object_iter_['Key']] = {
+                "size": s3_object_iter_['Size'],
+                "eTag": s3_object_iter_['ETag'],
+            }
+    return s3_object_summaries_by_key
+
+
+def list_s3_objects_in_folders(
+        bucket: str,
+        folder_prefix_list: Iterable[str],
+        max_workers: int = DEFAULT_LIST_MAX_WORKERS,
+        s3_client: Optional['S3Client'] = None
+) -> Dict[str, S3ObjectSummaryTypeDef]:
+    """
+    List the objects in a set of folders, one ListObjectsV2 paginator per folder, run concurrently.
+    Listing each folder with a '/' delimiter partitions the keys, so no object is listed twice
+    and a single large folder does not hold up the rest.
+    :param bucket:
+    :param folder_prefix_list: Folder prefixes, each either empty (the root of the bucket) or ending in a '/'
+    :param max_workers:
+    :param s3_client:
+    :return: A dictionary of key to size and eTag
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    s3_object_summaries_by_key = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for folder_summaries_iter_ in executor.map(
+                lambda folder_prefix_iter_: list_s3_objects_in_folder(s3_client, bucket, folder_prefix_iter_),
+                sorted(set(folder_prefix_list))
+        ):
+            s3_object_summaries_by_key.update(folder_summaries_iter_)
+
+    return s3_object_summaries_by_key
+
+
 def download_all_s3_objects(s3_client: 'S3Client', bucket: str, prefix: str) -> Path:
     logging.info(f"Downloading all files in s3://{bucket}/{prefix}")
     with TemporaryDirectory(delete=False) as temp_dir:
@@ -103,6 +164,80 @@ def upload_str_to_s3(data: str, bucket: str, key: str, s3_client: Optional['S3Cl
         upload_file_to_s3(s3_client, file_path, bucket, key)
 
 
+def upload_str_iter_to_s3(
+        str_iter: Iterable[str],
+        bucket: str,
+        key: str,
+        part_size: int = MULTIPART_UPLOAD_PART_SIZE_BYTES,
+        s3_client: Optional['S3Client'] = None
+):
+    """
+    Stream an iterable of strings to s3, one part at a time, so only a single part is ever held in memory.
+    Small objects (a single part) are uploaded with a plain put_object.
+    The multipart upload is aborted if the iterable (or an upload) raises.
+    :param str_iter:
+    :param bucket:
+    :param key:
+    :param part_size: Bytes per part, at least 5 MiB
+    :param s3_client:
+    :return:
+    """
+    if s3_client is None:
+        s3_client = get_s3_client()
+
+    upload_id = None
+    part_list = []
+    buffer = []
+    buffer_size = 0
+
+    def _upload_part(body: bytes):
+        part_number = len(part_list) + 1
+        part_list.append({
+            "PartNumber": part_number,
+            "ETag": s3_client.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body,
+            )['ETag']
+        })
+
+    try:
+        for str_iter_ in str_iter:
+            encoded_str = str_iter_.encode()
+            buffer.append(encoded_str)
+            buffer_size += len(encoded_str)
+
+            if buffer_size < part_size:
+                continue
+
+            if upload_id is None:
+                upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+            _upload_part(b"".join(buffer))
+            buffer = []
+            buffer_size = 0
+
+        if upload_id is None:
+            s3_client.put_object(Bucket=bucket, Key=key, Body=b"".join(buffer))
+            return
+
+        if buffer_size > 0:
+            _upload_part(b"".join(buffer))
+
+        s3_client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": part_list}
+        )
+    except Exception:
+        if upload_id is not None:
+            logger.warning(f"Aborting multipart upload of s3://{bucket}/{key}")
+            s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
 def delete_s3_obj(bucket: str, key: str, s3_client: Optional['S3Client'] = None):
     if s3_client is None:
         s3_client = get_s3_client()
@@ -116,19 +251,23 @@ def generate_presigned_url(
 ) -> str:
     """
     Generate a presigned URL for an S3 object using the Orcabus filemanager.
+    A cached url is returned if it is still valid for most of its lifetime.
     :param bucket: The name of the S3 bucket that contains the object.
     :type bucket: str
     :param key: The object key (path) within the S3 bucket.
     :type key: str
     :param expiration: The desired validity duration of the presigned URL in seconds.
         This parameter is currently not forwarded to the underlying implementation,
-        but is reserved for future use. Defaults to 604800 (7 days).
+        the filemanager applies its own expiry (7 days). Defaults to 604800 (7 days).
     :type expiration: Optional[int]
     :return: The generated presigned URL for the specified S3 object.
     :rtype: str
     """
-    return get_presigned_url(
-        s3_object_id=get_s3_object_id_from_s3_uri(
-            s3_uri=f"s3://{bucket}/{key}",
-        )
-    )
+    return get_presigned_urls(
+        [
+            {
+                "bucket": bucket,
+                "key": key,
+            }
+        ]
+    )[0]['presignedUrl']
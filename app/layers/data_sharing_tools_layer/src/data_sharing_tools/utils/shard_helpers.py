@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+Shard planning for s3 pushes
+
+Split the files of a package into shards of (roughly) equal cost, where the cost of a file is its size
+plus a fixed per-object overhead (so that a shard of thousands of small qc files is not treated as free).
+
+Files are placed largest first onto the currently cheapest shard (longest processing time first scheduling),
+which keeps the most expensive shard within 4/3 of the optimum, so the push wall time approaches
+the total bytes over the aggregate bandwidth of the shards.
+"""
+
+# Standard imports
+import heapq
+from math import ceil
+from typing import List, Iterable, Optional
+
+# Globals
+# Each object copy has a fixed startup cost, roughly the time to copy 64 MiB
+DEFAULT_PER_OBJECT_OVERHEAD_BYTES = 64 * 2 ** 20
+DEFAULT_TARGET_SHARD_BYTES = 100 * 2 ** 30
+DEFAULT_MAX_SHARD_COUNT = 10
+
+
+def get_file_cost(size: Optional[int], per_object_overhead_bytes: int = DEFAULT_PER_OBJECT_OVERHEAD_BYTES) -> int:
+    return (size or 0) + per_object_overhead_bytes
+
+
+def get_shard_count(
+        size_list: Iterable[Optional[int]],
+        max_shard_count: int = DEFAULT_MAX_SHARD_COUNT,
+        target_shard_bytes: int = DEFAULT_TARGET_SHARD_BYTES,
+        per_object_overhead_bytes: int = DEFAULT_PER_OBJECT_OVERHEAD_BYTES,
+) -> int:
+    """
+    Get the number of shards for a list of file sizes,
+    enough shards to keep each near the target size, but no more than the max shard count or the number of files
+    :param size_list:
+    :param max_shard_count:
+    :param target_shard_bytes:
+    :param per_object_overhead_bytes:
+    :return: The number of shards, 0 if there are no files
+    """
+    cost_list = list(map(
+        lambda size_iter_: get_file_cost(size_iter_, per_object_overhead_bytes),
+        size_list
+    ))
+
+    if len(cost_list) == 0:
+        return 0
+
+    return max(1, min(
+        max_shard_count,
+        len(cost_list),
+        ceil(sum(cost_list) / target_shard_bytes)
+    ))
+
+
+def assign_shards(
+        size_list: List[Optional[int]],
+        shard_count: int,
+        per_object_overhead_bytes: int = DEFAULT_PER_OBJECT_OVERHEAD_BYTES,
+) -> List[int]:
+    """
+    Bin-pack files into shards by cost
+    :param size_list: The size of each file, in bytes
+    :param shard_count:
+    :param per_object_overhead_bytes:
+    :return: The shard index of each file, in the same order as the size list
+    """
+    if shard_count < 1:
+        raise ValueError(f"Shard count must be at least 1, got {shard_count}")
+
+    shard_index_list = [0] * len(size_list)
+
+    # Heap of (cost, object count, shard index), ties go to the shard with fewer objects
+    shard_heap = list(map(lambda shard_index_iter_: (0, 0, shard_index_iter_), range(shard_count)))
+
+    for file_index_iter_ in sorted(
+            range(len(size_list)),
+            key=lambda file_index_iter_: size_list[file_index_iter_] or 0,
+            reverse=True
+    ):
+        shard_cost, shard_object_count, shard_index = heapq.heappop(shard_heap)
+        shard_index_list[file_index_iter_] = shard_index
+        heapq.heappush(
+            shard_heap,
+            (
+                shard_cost + get_file_cost(size_list[file_index_iter_], per_object_overhead_bytes),
+                shard_object_count + 1,
+                shard_index
+            )
+        )
+
+    return shard_index_list
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+s3 steps copy manifests
+
+s3 steps copy takes either
+
+  * a jsonl manifest, one {sourceBucket, sourceKey, destinationRelativeFolderKey} object per line, or
+  * a headerless csv manifest, one bucket,key row per line
+
+We stream the lines of either straight onto a (multipart) upload,
+so a manifest is never held in memory (or on disk) in full.
+"""
+
+# Standard imports
+import csv
+import json
+from io import StringIO
+from typing import Dict, Any, Iterable, Iterator, Tuple, TypedDict
+
+# Local imports
+from .s3_helpers import upload_str_iter_to_s3
+
+
+class StepsCopyJsonlRecordTypeDef(TypedDict):
+    sourceBucket: str
+    sourceKey: str
+    destinationRelativeFolderKey: str
+
+
+def get_destination_relative_folder_key(relative_path: str) -> str:
+    """
+    The parent folder of a relative path, with a trailing slash,
+    i.e. str(Path(relative_path).parent) + "/" without the cost of a Path per file
+    :param relative_path:
+    :return:
+    """
+    # Equivalent to PurePosixPath(relative_path).parts, as in tree_helpers.build_tree
+    parts = [part_iter_ for part_iter_ in str(relative_path).split("/") if part_iter_ not in ("", ".")]
+    return ("/".join(parts[:-1]) or ".") + "/"
+
+
+def split_s3_uri(s3_uri: str) -> Tuple[str, str]:
+    """
+    Split an s3 uri into its bucket and key.
+    Unlike urlparse, a '?' or '#' in the key is kept as part of the key
+    :param s3_uri:
+    :return:
+    """
+    if not s3_uri.startswith("s3://"):
+        raise ValueError(f"Error: {s3_uri} is not a valid s3 uri, it does not start with s3://")
+    bucket, _, key = s3_uri[len("s3://"):].partition("/")
+    if not bucket:
+        raise ValueError(f"Error: {s3_uri} is not a valid s3 uri, it does not have a bucket name")
+    return bucket, key.lstrip("/")
+
+
+def get_steps_copy_jsonl_record(file_object: Dict[str, Any]) -> StepsCopyJsonlRecordTypeDef:
+    return {
+        "sourceBucket": file_object['bucket'],
+        "sourceKey": file_object['key'],
+        "destinationRelativeFolderKey": get_destination_relative_folder_key(file_object['relativePath']),
+    }
+
+
+def iter_steps_copy_jsonl_lines(file_object_iter: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    :param file_object_iter: File objects with (at least) their bucket, key and relativePath
+    :return:
+    """
+    for file_object_iter_ in file_object_iter:
+        yield json.dumps(get_steps_copy_jsonl_record(file_object_iter_), separators=(",", ":")) + "\n"
+
+
+def iter_steps_copy_csv_lines(source_uri_iter: Iterable[str]) -> Iterator[str]:
+    """
+    :param source_uri_iter: s3 uris
+    :return:
+    """
+    line_buffer = StringIO()
+    csv_writer = csv.writer(line_buffer, lineterminator="\n")
+    for source_uri_iter_ in source_uri_iter:
+        csv_writer.writerow(split_s3_uri(source_uri_iter_))
+        yield line_buffer.getvalue()
+        line_buffer.seek(0)
+        line_buffer.truncate()
+
+
+def _upload_lines(line_iter: Iterable[str], bucket: str, key: str) -> int:
+    """
+    Stream lines to s3, counting them as they go
+    :param line_iter:
+    :param bucket:
+    :param key:
+    :return: The number of lines written
+    """
+    line_count = 0
+
+    def _count_lines() -> Iterator[str]:
+        nonlocal line_count
+        for line_iter_ in line_iter:
+            line_count += 1
+            yield line_iter_
+
+    upload_str_iter_to_s3(
+        _count_lines(),
+        bucket=bucket,
+        key=key,
+    )
+
+    return line_count
+
+
+def upload_steps_copy_jsonl_manifest(
+        file_object_iter: Iterable[Dict[str, Any]],
+        bucket: str,
+        key: str,
+) -> int:
+    """
+    Stream a jsonl manifest to s3
+    :param file_object_iter: File objects with (at least) their bucket, key and relativePath
+    :param bucket:
+    :param key:
+    :return: The number of lines written
+    """
+    return _upload_lines(iter_steps_copy_jsonl_lines(file_object_iter), bucket, key)
+
+
+def upload_steps_copy_csv_manifest(
+        source_uri_iter: Iterable[str],
+        bucket: str,
+        key: str,
+) -> int:
+    """
+    Stream a csv manifest to s3
+    :param source_uri_iter: s3 uris
+    :param bucket:
+    :param key:
+    :return: The number of lines written
+    """
+    return _upload_lines(iter_steps_copy_csv_lines(source_uri_iter), bucket, key)
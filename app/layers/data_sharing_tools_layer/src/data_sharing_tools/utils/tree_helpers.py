@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+Render a directory tree from a list of relative paths, entirely in memory.
+
+Output is identical to that of directory_tree.DisplayTree(root, stringRep=True)
+over a directory holding an (empty) file at each relative path, i.e.
+
+  * entries are sorted case-insensitively, directories and files interleaved
+  * hidden entries (those whose stem starts with a '.') are skipped, alongside everything underneath them
+  * directories have a trailing '/'
+
+A summarised mode (max_depth / max_entries_per_directory) keeps the tree readable,
+and the script small, for very large packages.
+Collapsed directories and truncated entries are annotated with the number of files they hold.
+"""
+
+# Standard imports
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Union, Iterable
+
+# Globals
+TREE_NODE_PREFIX_MIDDLE = "├── "
+TREE_NODE_PREFIX_LAST = "└── "
+TREE_PARENT_PREFIX_MIDDLE = "│   "
+TREE_PARENT_PREFIX_LAST = "    "
+
+# A directory is a dictionary of its entries, a file is None
+TreeNodeType = Dict[str, Optional["TreeNodeType"]]
+
+
+def build_tree(rel_path_list: Iterable[Union[str, PurePosixPath]]) -> TreeNodeType:
+    """
+    Build a prefix tree from a list of relative paths
+    :param rel_path_list:
+    :return:
+    """
+    root: TreeNodeType = {}
+
+    for rel_path_iter_ in rel_path_list:
+        # Equivalent to PurePosixPath(rel_path).parts, less the root, at a fraction of the cost
+        parts = [part_iter_ for part_iter_ in str(rel_path_iter_).split("/") if part_iter_ not in ("", ".")]
+        if len(parts) == 0:
+            continue
+
+        node = root
+        for part_iter_ in parts[:-1]:
+            # A file that is also the parent of another path is treated as a directory
+            if node.get(part_iter_, None) is None:
+                node[part_iter_] = {}
+            node = node[part_iter_]
+        node.setdefault(parts[-1], None)
+
+    return root
+
+
+def _is_hidden(name: str) -> bool:
+    # The stem of a name starts with a '.' if and only if the name does
+    return name.startswith(".")
+
+
+def _get_display_name(name: str, node: Optional[TreeNodeType]) -> str:
+    return name + "/" if node is not None else name
+
+
+def _get_sorted_entries(node: TreeNodeType) -> List[str]:
+    return sorted(
+        filter(lambda name_iter_: not _is_hidden(name_iter_), node.keys()),
+        # Names that only differ by case are left in directory listing order by DisplayTree,
+        # we break the tie by name so the output is deterministic
+        key=lambda name_iter_: (name_iter_.lower(), name_iter_)
+    )
+
+
+def count_files(node: Optional[TreeNodeType]) -> int:
+    """
+    Count the (visible) files under a node
+    :param node:
+    :return:
+    """
+    if node is None:
+        return 1
+    return sum(map(
+        lambda name_iter_: count_files(node[name_iter_]),
+        _get_sorted_entries(node)
+    ))
+
+
+def _render_entries(
+        node: TreeNodeType,
+        parent_prefix: str,
+        depth: int,
+        lines: List[str],
+        max_depth: Optional[int],
+        max_entries_per_directory: Optional[int],
+):
+    entries = _get_sorted_entries(node)
+
+    hidden_entries = []
+    if max_entries_per_directory is not None and len(entries) > max_entries_per_directory:
+        hidden_entries = entries[max_entries_per_directory:]
+        entries = entries[:max_entries_per_directory]
+
+    for index_iter_, name_iter_ in enumerate(entries):
+        is_last = index_iter_ == len(entries) - 1 and len(hidden_entries) == 0
+        child = node[name_iter_]
+        node_prefix = TREE_NODE_PREFIX_LAST if is_last else TREE_NODE_PREFIX_MIDDLE
+
+        # Collapse directories beyond the max depth
+        if child is not None and max_depth is not None and depth + 1 >= max_depth:
+            lines.append(
+                f"{parent_prefix}{node_prefix}{_get_display_name(name_iter_, child)} ({count_files(child)} files)"
+            )
+            continue
+
+        lines.append(f"{parent_prefix}{node_prefix}{_get_display_name(name_iter_, child)}")
+
+        if child is not None:
+            _render_entries(
+                child,
+                parent_prefix + (TREE_PARENT_PREFIX_LAST if is_last else TREE_PARENT_PREFIX_MIDDLE),
+                depth + 1,
+                lines,
+                max_depth,
+                max_entries_per_directory
+            )
+
+    if len(hidden_entries) > 0:
+        lines.append(
+            f"{parent_prefix}{TREE_NODE_PREFIX_LAST}... {len(hidden_entries)} more entries "
+            f"({sum(map(lambda name_iter_: count_files(node[name_iter_]), hidden_entries))} files)"
+        )
+
+
+def render_tree(
+        rel_path_list: Iterable[Union[str, PurePosixPath]],
+        root_name: str,
+        max_depth: Optional[int] = None,
+        max_entries_per_directory: Optional[int] = None,
+) -> str:
+    """
+    Render the directory tree of a list of relative paths
+    :param rel_path_list:
+    :param root_name: Name of the root directory, the first line of the tree
+    :param max_depth: Summarise directories at this depth (the root is depth 0) by their file count
+    :param max_entries_per_directory: Summarise the entries of a directory beyond this number by their file count
+    :return: The tree, one line per entry, each terminated by a newline
+    """
+    lines = [root_name + "/"]
+
+    _render_entries(
+        build_tree(rel_path_list),
+        parent_prefix="",
+        depth=0,
+        lines=lines,
+        max_depth=max_depth,
+        max_entries_per_directory=max_entries_per_directory,
+    )
+
+    return "\n".join(lines) + "\n"
@@ -110,6 +110,13 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiFuncti
   props.packagingDynamoDbApiTable.grantReadWriteData(lambdaApiFunction);
   props.pushJobDynamoDbApiTable.grantReadWriteData(lambdaApiFunction);
 
+  // Presigned urls are cached in the packaging lookup table
+  props.packagingLookUpTable.grantReadWriteData(lambdaApiFunction);
+  lambdaApiFunction.addEnvironment(
+    'PRESIGNED_URL_CACHE_TABLE_NAME',
+    props.packagingLookUpTable.tableName
+  );
+
   // Lambda needs read access to the packaging bucket in order to generate the presigned urls
   props.packagingLookUpBucket.grantRead(
     lambdaApiFunction,
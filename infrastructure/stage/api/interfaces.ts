@@ -22,6 +22,7 @@ export interface LambdaApiFunctionProps {
   // Tables
   packagingDynamoDbApiTable: ITableV2;
   pushJobDynamoDbApiTable: ITableV2;
+  packagingLookUpTable: ITableV2;
 }
 
 /** API Interfaces */
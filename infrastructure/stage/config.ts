@@ -13,6 +13,7 @@ import {
   s3CopyStepsBucket,
   s3CopyStepsFunctionArn,
   SSM_ROOT_PREFIX,
+  WORKFLOW_FILE_SELECTION_REGISTRY,
   autoPushSfnArn,
 } from './constants';
 import {
@@ -28,12 +29,14 @@ import * as path from 'path';
 export const getSsmParameterValues = (stage: StageName): SsmParameterValues => {
   return {
     fileManagerBucketsList: FILE_MANAGER_BUCKETS[stage],
+    workflowFileSelectionRegistry: WORKFLOW_FILE_SELECTION_REGISTRY,
   };
 };
 
 export const getSsmParameterPaths = (): SsmParameterPaths => {
   return {
     fileManagerBucketsList: path.join(SSM_ROOT_PREFIX, 'filemanager-buckets-list'),
+    workflowFileSelectionRegistry: path.join(SSM_ROOT_PREFIX, 'workflow-file-selection-registry'),
   };
 };
 
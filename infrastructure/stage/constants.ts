@@ -5,6 +5,7 @@ import {
   REGION,
   StageName,
 } from '@orcabus/platform-cdk-constructs/shared-config/accounts';
+import { WorkflowFileSelectionRegistry } from './ssm/interfaces';
 
 // Directory constants
 export const APP_ROOT = path.join(__dirname, '../../app');
@@ -37,15 +38,39 @@ export const PUSH_JOB_API_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES = [
 ];
 // Indexes - Packaging Lookup Table
 export const CONTEXT_INDEX_NAME = 'context';
-export const CONTENT_INDEX_NAME = 'content';
+// All content queries go through this index, it also projects the file attributes
+export const CONTENT_INDEX_NAME = 'content_attributes';
+// The original content index, without the projected file attributes.
+// CloudFormation cannot change the projection of an existing index,
+// and only adds or removes one index per update, so the wider projection lives in a new index.
+// Nothing reads from this index anymore, remove it in a following deploy.
+export const LEGACY_CONTENT_INDEX_NAME = 'content';
 export const INDEX_PARTITION_KEY = 'context';
 export const PACKAGING_LOOKUP_SECONDARY_INDEX_NAMES = [CONTEXT_INDEX_NAME, CONTENT_INDEX_NAME];
+// Fastq and file content is stored as zstd compressed json, one of 'json', 'gzip' or 'zstd'
+export const PACKAGING_CONTENT_ENCODING = 'zstd';
+// Must match PROJECTED_ATTRIBUTES_BY_CONTEXT in the data sharing tools layer
+export const PACKAGING_LOOKUP_PROJECTED_FILE_ATTRIBUTE_NAMES = [
+  'ingestId',
+  'bucket',
+  'key',
+  'size',
+  'relativePath',
+];
 export const PACKAGING_LOOKUP_TABLE_GLOBAL_SECONDARY_INDEX_NAMES_BY_INDEX: Record<
   string,
   string[]
 > = {
   [CONTEXT_INDEX_NAME]: ['job_id'],
-  [CONTENT_INDEX_NAME]: ['job_id', 'content', 'presigned_url', 'presigned_expiry'],
+  [LEGACY_CONTENT_INDEX_NAME]: ['job_id', 'content', 'presigned_url', 'presigned_expiry'],
+  [CONTENT_INDEX_NAME]: [
+    'job_id',
+    'content',
+    'presigned_url',
+    'presigned_expiry',
+    // Projected file attributes, written alongside the content by the batch writer
+    ...PACKAGING_LOOKUP_PROJECTED_FILE_ATTRIBUTE_NAMES,
+  ],
 };
 
 // Event stuff
@@ -67,6 +92,7 @@ export const STACK_PREFIX = 'data-sharing';
 // S3 Stuff
 export const DATA_SHARING_BUCKET_NAME = 'data-sharing-artifacts-__ACCOUNT_ID__-__REGION__';
 export const DATA_SHARING_BUCKET_PREFIX = 'packages';
+export const PACKAGE_MANIFEST_PREFIX = 'manifests/';
 
 // External S3 Steps Copy Service
 /*
@@ -128,3 +154,31 @@ export const MART_BUCKET_PREFIX = 'athena-query-results/';
 
 // SSM Stuff
 export const SSM_ROOT_PREFIX = '/orcabus/data-sharing/';
+
+// Workflow file selection
+// Rules for the archived workflows (umccrise, tumor-normal, wts) are built into the
+// get files list from portal run id lambda, and only need a rule here to override them.
+// Large intermediates of the current workflows are dropped,
+// alignments, variant calls and their indexes are always kept regardless of size.
+export const FILE_SELECTION_MAX_FILE_SIZE_BYTES = 50 * 2 ** 30;
+export const FILE_SELECTION_INTERMEDIATE_PATTERNS = [
+  // Nextflow work directories and any temporary files
+  '/work/',
+  '/\\.nextflow',
+  '/tmp/',
+  '\\.tmp$',
+];
+export const FILE_SELECTION_MAX_FILE_SIZE_EXEMPT_PATTERNS = [
+  '\\.(bam|cram)$',
+  '\\.(bai|crai|csi|tbi)$',
+  '\\.vcf\\.gz$',
+];
+export const WORKFLOW_FILE_SELECTION_REGISTRY: WorkflowFileSelectionRegistry = {
+  version: '1',
+  rules: ['dragen-*', 'oncoanalyser-*', 'sash', 'rnasum'].map((workflowName) => ({
+    workflowName: workflowName,
+    excludePatterns: FILE_SELECTION_INTERMEDIATE_PATTERNS,
+    maxFileSizeBytes: FILE_SELECTION_MAX_FILE_SIZE_BYTES,
+    maxFileSizeExemptPatterns: FILE_SELECTION_MAX_FILE_SIZE_EXEMPT_PATTERNS,
+  })),
+};
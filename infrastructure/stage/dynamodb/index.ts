@@ -11,6 +11,7 @@ import {
   CONTENT_INDEX_NAME,
   CONTEXT_INDEX_NAME,
   INDEX_PARTITION_KEY,
+  LEGACY_CONTENT_INDEX_NAME,
   PACKAGING_JOB_API_GLOBAL_SECONDARY_INDEX_NAMES,
   PACKAGING_JOB_API_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES,
   PACKAGING_LOOKUP_TABLE_GLOBAL_SECONDARY_INDEX_NAMES_BY_INDEX,
@@ -87,7 +88,7 @@ function getPackagingLookUpTableSecondaryIndexes(
 ): GlobalSecondaryIndexPropsV2[] {
   const secondaryIndexList: GlobalSecondaryIndexPropsV2[] = [];
 
-  for (const indexName of [CONTEXT_INDEX_NAME, CONTENT_INDEX_NAME]) {
+  for (const indexName of [CONTEXT_INDEX_NAME, LEGACY_CONTENT_INDEX_NAME, CONTENT_INDEX_NAME]) {
     const nonKeyAttributes =
       PACKAGING_LOOKUP_TABLE_GLOBAL_SECONDARY_INDEX_NAMES_BY_INDEX[indexName];
     // Which other elements are in the list depends on which index we are building
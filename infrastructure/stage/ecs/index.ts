@@ -9,7 +9,7 @@ import {
   FargateEcsTaskConstructProps,
 } from '@orcabus/platform-cdk-constructs/ecs';
 import * as path from 'path';
-import { CONTENT_INDEX_NAME, ECS_DIR } from '../constants';
+import { CONTENT_INDEX_NAME, ECS_DIR, PACKAGE_MANIFEST_PREFIX } from '../constants';
 import { BuildRMarkdownFargateEcsProps } from './interfaces';
 import { NagSuppressions } from 'cdk-nag';
 import * as cdk from 'aws-cdk-lib';
@@ -50,6 +50,12 @@ export function buildRMarkdownFargateTask(
     `${props.packagingLookUpPrefix}*`
   );
 
+  // Read the package manifest snapshot written by the packaging state machine
+  props.packagingLookUpBucket.grantRead(
+    ecsTask.taskDefinition.taskRole,
+    `${PACKAGE_MANIFEST_PREFIX}*`
+  );
+
   // Needs access to the database
   props.packagingLookUpTable.grantReadData(ecsTask.taskDefinition.taskRole);
 
@@ -70,6 +76,11 @@ export function buildRMarkdownFargateTask(
     props.packagingLookUpTable.tableName
   );
   ecsTask.containerDefinition.addEnvironment('DYNAMODB_INDEX_NAME', CONTENT_INDEX_NAME);
+  ecsTask.containerDefinition.addEnvironment(
+    'PACKAGE_MANIFEST_BUCKET_NAME',
+    props.packagingLookUpBucket.bucketName
+  );
+  ecsTask.containerDefinition.addEnvironment('PACKAGE_MANIFEST_PREFIX', PACKAGE_MANIFEST_PREFIX);
 
   // Add suppressions for the task role
   // Since the task role needs to access the S3 bucket prefix
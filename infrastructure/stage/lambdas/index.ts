@@ -21,6 +21,8 @@ import {
   LAYERS_DIR,
   MART_BUCKET_PREFIX,
   MART_ENV_VARS,
+  PACKAGE_MANIFEST_PREFIX,
+  PACKAGING_CONTENT_ENCODING,
   PACKAGING_LOOKUP_SECONDARY_INDEX_NAMES,
   SLACK_BOT_TOKEN_SECRET_NAME,
   SLACK_CONFIG_SECRET_NAME,
@@ -30,6 +32,7 @@ import { NagSuppressions } from 'cdk-nag';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as cdk from 'aws-cdk-lib';
 import * as secretsmanager from 'aws-cdk-lib/aws-secretsmanager';
+import * as ssm from 'aws-cdk-lib/aws-ssm';
 import { PythonLayerVersion } from '@aws-cdk/aws-lambda-python-alpha';
 
 function buildLambdaFunction(scope: Construct, props: LambdaProps): LambdaObject {
@@ -72,6 +75,12 @@ function buildLambdaFunction(scope: Construct, props: LambdaProps): LambdaObject
     lambdaObject.addEnvironment('CONTEXT_INDEX_NAME', CONTEXT_INDEX_NAME);
   }
 
+  if (lambdaRequirements.needsDbWritePermissions) {
+    props.packagingLookUpTable.grantWriteData(lambdaObject);
+    lambdaObject.addEnvironment('PACKAGING_TABLE_NAME', props.packagingLookUpTable.tableName);
+    lambdaObject.addEnvironment('PACKAGING_CONTENT_ENCODING', PACKAGING_CONTENT_ENCODING);
+  }
+
   if (lambdaRequirements.needsMartLayer) {
     /* Add env vars and nag suppressions for mart access */
     // Iterate over the MART_ENV_VARS key, value pairs and add them as environment variables to the lambda function
@@ -112,6 +121,37 @@ function buildLambdaFunction(scope: Construct, props: LambdaProps): LambdaObject
     );
   }
 
+  if (
+    lambdaRequirements.needsPackageManifestReadPermissions ||
+    lambdaRequirements.needsPackageManifestWritePermissions
+  ) {
+    // Package manifest snapshots live under their own prefix of the packaging bucket
+    if (lambdaRequirements.needsPackageManifestWritePermissions) {
+      props.packagingLookUpBucket.grantReadWrite(
+        lambdaObject,
+        path.join(PACKAGE_MANIFEST_PREFIX, '*')
+      );
+    } else {
+      props.packagingLookUpBucket.grantRead(lambdaObject, path.join(PACKAGE_MANIFEST_PREFIX, '*'));
+    }
+    lambdaObject.addEnvironment(
+      'PACKAGE_MANIFEST_BUCKET_NAME',
+      props.packagingLookUpBucket.bucketName
+    );
+    lambdaObject.addEnvironment('PACKAGE_MANIFEST_PREFIX', PACKAGE_MANIFEST_PREFIX);
+    NagSuppressions.addResourceSuppressions(
+      lambdaObject,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason:
+            'Lambda needs asterisk across the package manifest prefix, lambda object uses asterisk on permissions when versions not used',
+        },
+      ],
+      true
+    );
+  }
+
   if (lambdaRequirements.needsStepsS3DownloadPermissions) {
     props.s3StepsCopyBucket.grantRead(lambdaObject, path.join(props.s3StepsCopyBucketPrefix, '*'));
     NagSuppressions.addResourceSuppressions(
@@ -145,6 +185,57 @@ function buildLambdaFunction(scope: Construct, props: LambdaProps): LambdaObject
     );
   }
 
+  if (lambdaRequirements.needsPresignedUrlCachePermissions) {
+    // Presigned urls are cached in the packaging lookup table
+    props.packagingLookUpTable.grantReadWriteData(lambdaObject);
+    lambdaObject.addEnvironment(
+      'PRESIGNED_URL_CACHE_TABLE_NAME',
+      props.packagingLookUpTable.tableName
+    );
+  }
+
+  if (lambdaRequirements.needsInstrumentRunProjectCachePermissions) {
+    // The project ids of each instrument run are cached in the packaging lookup table
+    props.packagingLookUpTable.grantReadWriteData(lambdaObject);
+    lambdaObject.addEnvironment(
+      'INSTRUMENT_RUN_PROJECT_CACHE_TABLE_NAME',
+      props.packagingLookUpTable.tableName
+    );
+  }
+
+  if (lambdaRequirements.needsFileSelectionRegistryPermissions) {
+    // Workflow file selection rules are read from the registry parameter
+    ssm.StringParameter.fromStringParameterName(
+      scope,
+      `${props.lambdaName}FileSelectionRegistryParameter`,
+      props.ssmParameterPaths.workflowFileSelectionRegistry
+    ).grantRead(lambdaObject);
+    lambdaObject.addEnvironment(
+      'FILE_SELECTION_REGISTRY_SSM_PARAMETER_NAME',
+      props.ssmParameterPaths.workflowFileSelectionRegistry
+    );
+  }
+
+  if (lambdaRequirements.needsPushDestinationListPermissions) {
+    // Delta pushes list the destination to skip files that have already been pushed
+    lambdaObject.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ['s3:ListBucket'],
+        resources: ['arn:aws:s3:::*'],
+      })
+    );
+    NagSuppressions.addResourceSuppressions(
+      lambdaObject,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'Lambda needs to list the contents of any bucket a package is pushed to',
+        },
+      ],
+      true
+    );
+  }
+
   // Allow the notifier Lambda to read the Slack bot token and config secrets at runtime
   if (props.lambdaName === 'notifySlack') {
     const slackBotToken = secretsmanager.Secret.fromSecretNameV2(
@@ -2,6 +2,7 @@ import { PythonFunction } from '@aws-cdk/aws-lambda-python-alpha';
 import { ILayerVersion } from 'aws-cdk-lib/aws-lambda';
 import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
 import { IBucket } from 'aws-cdk-lib/aws-s3';
+import { SsmParameterPaths } from '../ssm/interfaces';
 
 export type LambdaName =
   | 'createCsvForS3StepsCopy'
@@ -34,7 +35,10 @@ export type LambdaName =
   | 'checkProjectInInstrumentRun'
   | 'notifySlack'
   | 'extractSlackActionContext'
-  | 'verifySlackRequest';
+  | 'verifySlackRequest'
+  | 'writePackageManifestSnapshot'
+  | 'resolveLegacyWorkflows'
+  | 'batchWritePackagingRecords';
 
 export const lambdaNameList: LambdaName[] = [
   'createCsvForS3StepsCopy',
@@ -68,6 +72,9 @@ export const lambdaNameList: LambdaName[] = [
   'notifySlack',
   'extractSlackActionContext',
   'verifySlackRequest',
+  'writePackageManifestSnapshot',
+  'resolveLegacyWorkflows',
+  'batchWritePackagingRecords',
 ];
 
 export interface Requirements {
@@ -75,13 +82,22 @@ export interface Requirements {
   needsDataSharingToolsLayer?: boolean;
   needsMartLayer?: boolean;
   needsDbPermissions?: boolean;
+  needsDbWritePermissions?: boolean;
   needsStepsS3UploadPermissions?: boolean;
   needsStepsS3DownloadPermissions?: boolean;
   needsPackagingBucketPermissions?: boolean;
+  needsPackageManifestReadPermissions?: boolean;
+  needsPackageManifestWritePermissions?: boolean;
+  needsPresignedUrlCachePermissions?: boolean;
+  needsInstrumentRunProjectCachePermissions?: boolean;
+  needsFileSelectionRegistryPermissions?: boolean;
+  needsPushDestinationListPermissions?: boolean;
 }
 
 export const lambdaRequirementsMap: { [key in LambdaName]: Requirements } = {
   createCsvForS3StepsCopy: {
+    needsDataSharingToolsLayer: true,
+    needsOrcabusApiToolsLayer: true,
     needsStepsS3UploadPermissions: true,
   },
   createScriptFromPresignedUrlsList: {
@@ -92,8 +108,11 @@ export const lambdaRequirementsMap: { [key in LambdaName]: Requirements } = {
   },
   generatePresignedUrlsForDataObjects: {
     needsOrcabusApiToolsLayer: true,
+    needsDataSharingToolsLayer: true,
+    needsPresignedUrlCachePermissions: true,
   },
   getFastqObjectFromFastqId: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
   },
   getFileAndRelativePathFromS3AttributeId: {
@@ -105,25 +124,32 @@ export const lambdaRequirementsMap: { [key in LambdaName]: Requirements } = {
     needsOrcabusApiToolsLayer: true,
   },
   getLibraryObjectFromLibraryOrcabusId: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
   },
   getS3DestinationAndSourceUriMappings: {
     needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
     needsDbPermissions: true,
+    needsPackageManifestWritePermissions: true,
   },
   getWorkflowFromPortalRunId: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
     needsMartLayer: true,
+    needsPackageManifestReadPermissions: true,
   },
   handleWorkflowInputs: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
   },
   getFastqsFromLibraryIdAndInstrumentRunIdList: {
     needsOrcabusApiToolsLayer: true,
   },
   getFilesListFromPortalRunId: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
+    needsFileSelectionRegistryPermissions: true,
   },
   syncFilemanager: {
     needsOrcabusApiToolsLayer: true,
@@ -132,17 +158,25 @@ export const lambdaRequirementsMap: { [key in LambdaName]: Requirements } = {
     needsOrcabusApiToolsLayer: true,
     needsDataSharingToolsLayer: true,
     needsDbPermissions: true,
+    needsPackageManifestWritePermissions: true,
   },
   listPortalRunIdsInLibrary: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
+    needsMartLayer: true,
+    needsPackageManifestReadPermissions: true,
   },
   packageFileToJsonlData: {
     needsDbPermissions: true,
     needsStepsS3UploadPermissions: true,
     needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
+    needsPackageManifestReadPermissions: true,
+    needsPushDestinationListPermissions: true,
   },
   checkStepsCopyOutput: {
+    needsDataSharingToolsLayer: true,
+    needsOrcabusApiToolsLayer: true,
     needsStepsS3DownloadPermissions: true,
   },
   updatePackagingJobApi: {
@@ -160,9 +194,13 @@ export const lambdaRequirementsMap: { [key in LambdaName]: Requirements } = {
     needsDataSharingToolsLayer: true,
     needsPackagingBucketPermissions: true,
     needsOrcabusApiToolsLayer: true,
+    needsPackageManifestReadPermissions: true,
   },
   getDynamodbEvaluatedKeyList: {
+    needsDataSharingToolsLayer: true,
+    needsOrcabusApiToolsLayer: true,
     needsDbPermissions: true,
+    needsPackageManifestReadPermissions: true,
   },
   triggerPackaging: {
     needsOrcabusApiToolsLayer: true,
@@ -174,21 +212,45 @@ export const lambdaRequirementsMap: { [key in LambdaName]: Requirements } = {
     needsOrcabusApiToolsLayer: true,
   },
   checkProjectInInstrumentRun: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
+    needsInstrumentRunProjectCachePermissions: true,
   },
   notifySlack: {
     needsOrcabusApiToolsLayer: true,
   },
   updateIngestId: {
+    needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
   },
   getFastqsInPackagingJob: {
     needsDataSharingToolsLayer: true,
     needsOrcabusApiToolsLayer: true,
     needsDbPermissions: true,
+    // Backfills the fastq file index for packages written before it existed
+    needsDbWritePermissions: true,
+    needsPackageManifestReadPermissions: true,
   },
   extractSlackActionContext: {},
   verifySlackRequest: {},
+  writePackageManifestSnapshot: {
+    needsDataSharingToolsLayer: true,
+    needsOrcabusApiToolsLayer: true,
+    needsDbPermissions: true,
+    needsPackageManifestWritePermissions: true,
+  },
+  resolveLegacyWorkflows: {
+    needsDataSharingToolsLayer: true,
+    needsOrcabusApiToolsLayer: true,
+    needsDbPermissions: true,
+    needsMartLayer: true,
+    needsPackageManifestWritePermissions: true,
+  },
+  batchWritePackagingRecords: {
+    needsDataSharingToolsLayer: true,
+    needsOrcabusApiToolsLayer: true,
+    needsDbWritePermissions: true,
+  },
 };
 
 export interface LambdaProps {
@@ -204,6 +266,8 @@ export interface LambdaProps {
   s3StepsCopyBucketPrefix: string;
   // Athena
   athenaQueryResultsBucket: IBucket;
+  // SSM Stuff
+  ssmParameterPaths: SsmParameterPaths;
 }
 
 export type BuildAllLambdaProps = Omit<LambdaProps, 'lambdaName'>;
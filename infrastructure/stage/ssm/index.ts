@@ -15,4 +15,14 @@ export function buildSsmParameters(scope: Construct, props: SsmParameterProps) {
     parameterName: props.ssmParameterPaths.fileManagerBucketsList,
     stringValue: JSON.stringify(props.ssmParameterValues.fileManagerBucketsList),
   });
+
+  /**
+   * Workflow file selection registry
+   * Intelligent tiering, so the parameter is only upgraded to the advanced tier if it outgrows 4 KB
+   */
+  new ssm.StringParameter(scope, 'workflow-file-selection-registry', {
+    parameterName: props.ssmParameterPaths.workflowFileSelectionRegistry,
+    stringValue: JSON.stringify(props.ssmParameterValues.workflowFileSelectionRegistry),
+    tier: ssm.ParameterTier.INTELLIGENT_TIERING,
+  });
 }
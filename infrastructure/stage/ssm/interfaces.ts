@@ -1,10 +1,32 @@
+/*
+Workflow file selection, see data_sharing_tools.utils.file_selection_registry
+The first rule matching the workflow name and version (both globs) decides which files of a workflow run are packaged
+*/
+export interface WorkflowFileSelectionRule {
+  workflowName: string;
+  workflowVersion?: string;
+  // Regexes searched against the file key
+  includePatterns?: string[];
+  excludePatterns?: string[];
+  // Files larger than this are not packaged unless their key matches one of the exempt patterns
+  maxFileSizeBytes?: number;
+  maxFileSizeExemptPatterns?: string[];
+}
+
+export interface WorkflowFileSelectionRegistry {
+  version: string;
+  rules: WorkflowFileSelectionRule[];
+}
+
 export interface SsmParameterValues {
   // Payload defaults
   fileManagerBucketsList: string[];
+  workflowFileSelectionRegistry: WorkflowFileSelectionRegistry;
 }
 
 export interface SsmParameterPaths {
   fileManagerBucketsList: string;
+  workflowFileSelectionRegistry: string;
 }
 
 export interface SsmParameterProps {
@@ -129,6 +129,7 @@ export class StatelessApplicationStack extends cdk.Stack {
       s3StepsCopyBucket: s3StepsCopyBucket,
       s3StepsCopyBucketPrefix: props.s3StepsCopyPrefix,
       athenaQueryResultsBucket: athenaQueryResultsBucket,
+      ssmParameterPaths: props.ssmParameterPaths,
     });
 
     /*
@@ -191,6 +192,7 @@ export class StatelessApplicationStack extends cdk.Stack {
       eventBus: eventBusObj,
       packagingDynamoDbApiTable: packagingJobsTable,
       pushJobDynamoDbApiTable: pushJobsTable,
+      packagingLookUpTable: packagingLookUpTable,
     });
     const apiGateway = buildApiGateway(this, props.apiGatewayCognitoProps);
     const apiIntegration = buildApiIntegration({
@@ -37,11 +37,14 @@ export const lambdasInStepFunctions: Record<StepFunctionsName, LambdaName[]> = {
     'getFastqsFromLibraryIdAndInstrumentRunIdList',
     'getFastqObjectFromFastqId',
     'getFileAndRelativePathFromS3AttributeId',
+    'resolveLegacyWorkflows',
     'listPortalRunIdsInLibrary',
     'getWorkflowFromPortalRunId',
     'getFilesListFromPortalRunId',
     'getFilesAndRelativePathsFromS3AttributeIds',
+    'batchWritePackagingRecords',
     'updatePackagingJobApi',
+    'writePackageManifestSnapshot',
     'syncFilemanager',
   ],
   presigning: [
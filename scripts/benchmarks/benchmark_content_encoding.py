@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the packaging lookup table 'content' encodings
+
+Builds a synthetic package of filemanager-like file objects and reports,
+for each of the json / gzip / zstd encodings,
+
+  * the mean dynamodb item size
+  * the number of items returned per 1MB query page
+  * the read capacity units consumed to read the whole package through the content index
+
+Usage:
+    python3 scripts/benchmarks/benchmark_content_encoding.py [--num-files 50000]
+
+zstd requires python 3.14 or later, it is skipped on older interpreters.
+"""
+
+# Standard imports
+import argparse
+import importlib.util
+import random
+import sys
+from math import ceil
+from pathlib import Path
+from statistics import mean
+from time import perf_counter
+from typing import List, Dict, Any
+
+# Load the codec straight from the layer source,
+# the codec only uses the standard library so we skip the layer's package imports
+CONTENT_CODEC_PATH = (
+    Path(__file__).absolute().parents[2] /
+    "app" / "layers" / "data_sharing_tools_layer" / "src" / "data_sharing_tools" / "utils" / "content_codec.py"
+)
+_content_codec_spec = importlib.util.spec_from_file_location("content_codec", CONTENT_CODEC_PATH)
+content_codec = importlib.util.module_from_spec(_content_codec_spec)
+_content_codec_spec.loader.exec_module(content_codec)
+
+encode_content = content_codec.encode_content
+decode_content = content_codec.decode_content
+ContentEncodingType = content_codec.ContentEncodingType
+
+# Globals
+QUERY_PAGE_SIZE_BYTES = 1024 * 1024
+# Eventually consistent reads (all gsi reads are) cost 0.5 RCU per 4KB, summed across the page
+RCU_BYTES_PER_UNIT = 4 * 1024
+RCU_PER_UNIT = 0.5
+
+JOB_ID = "pkg.01JBENCHMARK0000000000000"
+
+
+def get_item_size(item: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Approximate dynamodb item size, attribute name lengths plus value lengths
+    :param item:
+    :return:
+    """
+    return sum(map(
+        lambda kv_iter_: len(kv_iter_[0]) + len(
+            kv_iter_[1]['B'] if 'B' in kv_iter_[1] else
+            str(list(kv_iter_[1].values())[0]).encode()
+        ),
+        item.items()
+    ))
+
+
+def build_file_object(index: int) -> Dict[str, Any]:
+    portal_run_id = f"2024{random.randint(10000000, 99999999)}"
+    key = (
+        f"byob-icav2/production/analysis/dragen-wgts-dna/{portal_run_id}/"
+        f"L24{index:05d}__L24{index + 1:05d}/L24{index:05d}.hard-filtered.vcf.gz"
+    )
+    return {
+        "s3ObjectId": f"0190{random.getrandbits(96):024x}",
+        "publicId": f"0190{random.getrandbits(96):024x}",
+        "ingestId": f"0190{random.getrandbits(96):024x}",
+        "bucket": "pipeline-prod-cache-503977275616-ap-southeast-2",
+        "key": key,
+        "relativePath": f"secondary-analysis/dragen-wgts-dna/{portal_run_id}/{Path(key).name}",
+        "size": random.randint(1_000, 100_000_000_000),
+        "eTag": f"\"{random.getrandbits(128):032x}-{random.randint(1, 2000)}\"",
+        "sha256": None,
+        "storageClass": random.choice(["Standard", "IntelligentTiering", "DeepArchive"]),
+        "sequencer": f"{random.getrandbits(72):018X}",
+        "versionId": None,
+        "eventTime": "2024-10-01T01:23:45Z",
+        "eventType": "Created",
+        "isDeleteMarker": False,
+        "isCurrentState": True,
+        "isAccessible": True,
+        "numberReordered": 0,
+        "numberDuplicateEvents": 0,
+        "lastModifiedDate": "2024-10-01T01:23:45Z",
+        "attributes": {
+            "portalRunId": portal_run_id,
+        },
+    }
+
+
+def build_item(file_object: Dict[str, Any], encoding: ContentEncodingType) -> Dict[str, Dict[str, Any]]:
+    return {
+        "id": {"S": file_object['ingestId']},
+        "job_id": {"S": JOB_ID},
+        "context": {"S": f"{JOB_ID}__file"},
+        "content": encode_content(file_object, encoding=encoding),
+        "expire_at": {"N": "1700000000"},
+    }
+
+
+def get_page_sizes(item_size_list: List[int]) -> List[int]:
+    """
+    Split items into 1MB query pages, return the total bytes of each page
+    :param item_size_list:
+    :return:
+    """
+    page_size_list = [0]
+    for item_size_iter_ in item_size_list:
+        if page_size_list[-1] + item_size_iter_ > QUERY_PAGE_SIZE_BYTES:
+            page_size_list.append(0)
+        page_size_list[-1] += item_size_iter_
+    return page_size_list
+
+
+def benchmark_encoding(file_object_list: List[Dict[str, Any]], encoding: ContentEncodingType) -> Dict[str, Any]:
+    start_time = perf_counter()
+    item_list = list(map(lambda file_obj_iter_: build_item(file_obj_iter_, encoding), file_object_list))
+    encode_seconds = perf_counter() - start_time
+
+    start_time = perf_counter()
+    for item_iter_ in item_list:
+        decode_content(item_iter_['content'])
+    decode_seconds = perf_counter() - start_time
+
+    item_size_list = list(map(get_item_size, item_list))
+    page_size_list = get_page_sizes(item_size_list)
+
+    return {
+        "encoding": encoding,
+        "meanItemBytes": round(mean(item_size_list)),
+        "itemsPerPage": round(len(item_list) / len(page_size_list)),
+        "pages": len(page_size_list),
+        "rcuPerPackage": sum(map(
+            lambda page_size_iter_: ceil(page_size_iter_ / RCU_BYTES_PER_UNIT) * RCU_PER_UNIT,
+            page_size_list
+        )),
+        "encodeMicrosPerItem": round(encode_seconds / len(item_list) * 1e6, 1),
+        "decodeMicrosPerItem": round(decode_seconds / len(item_list) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark packaging lookup table content encodings")
+    parser.add_argument("--num-files", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    file_object_list = list(map(build_file_object, range(args.num_files)))
+
+    encoding_list: List[ContentEncodingType] = ["json", "gzip"]
+    if content_codec.zstd is not None:
+        encoding_list.append("zstd")
+    else:
+        print("zstd is not available on this interpreter (requires python 3.14+), skipping", file=sys.stderr)
+
+    results_list = list(map(lambda encoding_iter_: benchmark_encoding(file_object_list, encoding_iter_), encoding_list))
+
+    columns = list(results_list[0].keys())
+    print("\t".join(columns))
+    for result_iter_ in results_list:
+        print("\t".join(map(lambda column_iter_: str(result_iter_[column_iter_]), columns)))
+
+
+if __name__ == "__main__":
+    main()
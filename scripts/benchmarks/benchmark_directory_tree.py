@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the download script directory tree renderers
+
+Builds a synthetic package of relative paths and compares
+
+  * the in-memory renderer (data_sharing_tools.utils.tree_helpers.render_tree)
+  * the in-memory renderer in summarised mode
+  * the previous approach, touching an empty file per path in a temporary directory
+    and walking it with directory_tree.DisplayTree
+
+reporting the wall time, the number of files created on disk and the size of the rendered tree,
+and checking the full in-memory tree is identical to the DisplayTree output.
+
+Usage:
+    python3 scripts/benchmarks/benchmark_directory_tree.py [--num-files 50000]
+
+The DisplayTree comparison requires the directory_tree package, it is skipped if it is not installed.
+"""
+
+# Standard imports
+import argparse
+import importlib.util
+import random
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import List, Dict, Any, Callable
+
+# Load the renderer straight from the layer source,
+# the renderer only uses the standard library so we skip the layer's package imports
+TREE_HELPERS_PATH = (
+    Path(__file__).absolute().parents[2] /
+    "app" / "layers" / "data_sharing_tools_layer" / "src" / "data_sharing_tools" / "utils" / "tree_helpers.py"
+)
+_tree_helpers_spec = importlib.util.spec_from_file_location("tree_helpers", TREE_HELPERS_PATH)
+tree_helpers = importlib.util.module_from_spec(_tree_helpers_spec)
+_tree_helpers_spec.loader.exec_module(tree_helpers)
+
+render_tree = tree_helpers.render_tree
+
+try:
+    from directory_tree import DisplayTree
+except ImportError:
+    DisplayTree = None
+
+# Globals
+TREE_ROOT_NAME = "<DOWNLOAD_PATH>"
+# Matches the summarised mode of the create script from presigned urls list lambda
+SUMMARY_MAX_DEPTH = 4
+SUMMARY_MAX_ENTRIES_PER_DIRECTORY = 100
+
+
+def build_rel_path_list(num_files: int) -> List[str]:
+    """
+    A mix of fastq and secondary analysis outputs, as laid out by the packaging sfn
+    :param num_files:
+    :return:
+    """
+    rel_path_list = []
+    for index_iter_ in range(num_files):
+        library_id = f"L24{index_iter_ // 8:05d}"
+        if random.random() < 0.5:
+            rel_path_list.append(
+                f"primary-data/instrument-run-id=2410{random.randint(10, 30)}_A01052_0{random.randint(100, 999)}/"
+                f"{library_id}/{library_id}_S{index_iter_ % 96 + 1}_L00{index_iter_ % 4 + 1}_R{index_iter_ % 2 + 1}_001.fastq.ora"
+            )
+        else:
+            rel_path_list.append(
+                f"secondary-analysis/{random.choice(['dragen-wgts-dna', 'dragen-wgts-rna', 'oncoanalyser-wgts-dna'])}/"
+                f"2024{index_iter_ // 16:08d}/{library_id}/{library_id}.{index_iter_ % 16}.vcf.gz"
+            )
+    return rel_path_list
+
+
+def render_with_display_tree(rel_path_list: List[str]) -> str:
+    with TemporaryDirectory() as temp_dir:
+        root_path = Path(temp_dir) / TREE_ROOT_NAME
+        for rel_path_iter_ in rel_path_list:
+            (root_path / rel_path_iter_).parent.mkdir(parents=True, exist_ok=True)
+            (root_path / rel_path_iter_).touch()
+        return DisplayTree(root_path, stringRep=True)
+
+
+def benchmark_renderer(
+        name: str,
+        renderer: Callable[[List[str]], str],
+        rel_path_list: List[str],
+        files_on_disk: int
+) -> Dict[str, Any]:
+    start_time = perf_counter()
+    tree = renderer(rel_path_list)
+    duration_seconds = perf_counter() - start_time
+
+    return {
+        "renderer": name,
+        "seconds": round(duration_seconds, 3),
+        "filesOnDisk": files_on_disk,
+        "treeLines": tree.count("\n"),
+        "treeBytes": len(tree.encode()),
+        "tree": tree,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark download script directory tree renderers")
+    parser.add_argument("--num-files", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    rel_path_list = build_rel_path_list(args.num_files)
+
+    results_list = [
+        benchmark_renderer(
+            "in-memory",
+            lambda rel_path_list_: render_tree(rel_path_list_, root_name=TREE_ROOT_NAME),
+            rel_path_list,
+            files_on_disk=0,
+        ),
+        benchmark_renderer(
+            "in-memory-summarised",
+            lambda rel_path_list_: render_tree(
+                rel_path_list_,
+                root_name=TREE_ROOT_NAME,
+                max_depth=SUMMARY_MAX_DEPTH,
+                max_entries_per_directory=SUMMARY_MAX_ENTRIES_PER_DIRECTORY,
+            ),
+            rel_path_list,
+            files_on_disk=0,
+        ),
+    ]
+
+    if DisplayTree is not None:
+        results_list.append(
+            benchmark_renderer(
+                "display-tree",
+                render_with_display_tree,
+                rel_path_list,
+                files_on_disk=len(set(rel_path_list)),
+            )
+        )
+        if results_list[0]['tree'] != results_list[-1]['tree']:
+            print("In-memory tree does not match the DisplayTree output", file=sys.stderr)
+            sys.exit(1)
+    else:
+        print("directory_tree is not installed, skipping the DisplayTree comparison", file=sys.stderr)
+
+    columns = ["renderer", "seconds", "filesOnDisk", "treeLines", "treeBytes"]
+    print("\t".join(columns))
+    for result_iter_ in results_list:
+        print("\t".join(map(lambda column_iter_: str(result_iter_[column_iter_]), columns)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the workflow file filters of the get files list from portal run id lambda
+
+Builds a synthetic set of output keys for a workflow and compares
+
+  * the previous approach, searching each key with each of the workflow's compiled patterns in turn
+  * the compiled key filter (data_sharing_tools.utils.file_filter_helpers.compile_file_filter)
+
+reporting the wall time of each, the number of matching keys and the speedup,
+and checking both select exactly the same keys.
+
+The patterns are read from the lambda source (REGEX_FILES_BY_WORKFLOW_NAME),
+so the benchmark always runs against the current pattern lists.
+
+Usage:
+    python3 scripts/benchmarks/benchmark_file_filters.py [--workflow-name umccrise] [--num-files 50000]
+"""
+
+# Standard imports
+import argparse
+import ast
+import importlib.util
+import random
+import re
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import List, Dict, Any, Callable
+
+# Load the filter helpers straight from the layer source,
+# the helpers only use the standard library so we skip the layer's package imports
+REPO_ROOT = Path(__file__).absolute().parents[2]
+FILE_FILTER_HELPERS_PATH = (
+    REPO_ROOT /
+    "app" / "layers" / "data_sharing_tools_layer" / "src" / "data_sharing_tools" / "utils" / "file_filter_helpers.py"
+)
+GET_FILES_LIST_LAMBDA_PATH = (
+    REPO_ROOT /
+    "app" / "lambdas" / "get_files_list_from_portal_run_id_py" / "get_files_list_from_portal_run_id.py"
+)
+_file_filter_helpers_spec = importlib.util.spec_from_file_location("file_filter_helpers", FILE_FILTER_HELPERS_PATH)
+file_filter_helpers = importlib.util.module_from_spec(_file_filter_helpers_spec)
+_file_filter_helpers_spec.loader.exec_module(file_filter_helpers)
+
+compile_file_filter = file_filter_helpers.compile_file_filter
+
+# Globals
+OUTPUT_FILE_SUFFIX_LIST = [
+    # Kept by the tumor-normal / wts filters
+    "tumor.bam", "normal.bam.bai", "quant.genes.sf", "fusion_candidates.final",
+    # Kept by the umccrise filters
+    "multiqc_report.html", "somatic.pcgr.html", "cancer_report.html",
+    "somatic-PASS.vcf.gz", "somatic-PASS.vcf.gz.tbi", "manta.vcf.gz",
+    "purple.cnv.gene.tsv", ".amber.baf.pcf", ".cobalt.ratio.tsv", "-snv_2015.tsv.gz",
+    # Dropped by the umccrise filters
+    "bam", "bam.bai", "log", "json", "txt", "sv.prioritised.vcf.gz", "pcgr.json.gz",
+    "hmf.purple.segment.tsv", "conpair.concordance.txt", "work/0a/cmd.sh",
+]
+
+
+def load_patterns_by_workflow_name() -> Dict[str, List[str]]:
+    """
+    Read the REGEX_FILES_BY_WORKFLOW_NAME literal from the lambda source,
+    without importing the lambda (and therefore its layers)
+    :return:
+    """
+    for node_iter_ in ast.parse(GET_FILES_LIST_LAMBDA_PATH.read_text()).body:
+        if (
+                isinstance(node_iter_, ast.Assign) and
+                any(map(
+                    lambda target_iter_: isinstance(target_iter_, ast.Name) and target_iter_.id == "REGEX_FILES_BY_WORKFLOW_NAME",
+                    node_iter_.targets
+                ))
+        ):
+            return ast.literal_eval(node_iter_.value)
+    raise ValueError(f"Could not find REGEX_FILES_BY_WORKFLOW_NAME in {GET_FILES_LIST_LAMBDA_PATH}")
+
+
+def build_key_list(num_files: int) -> List[str]:
+    """
+    Output keys of a portal run, laid out as in the analysis archive
+    :param num_files:
+    :return:
+    """
+    key_list = []
+    for index_iter_ in range(num_files):
+        sample_name = f"SBJ{index_iter_ // 500:05d}__PRJ24{index_iter_ // 1000:04d}"
+        key_list.append(
+            f"v1/year=2024/month=01/202401075d94d609/L2301517__L2301512/{sample_name}/"
+            f"{random.choice(['small_variants', 'structural', 'purple', 'amber', 'cobalt', 'work'])}/"
+            f"{sample_name}-{index_iter_}{random.choice(['.', '-'])}{random.choice(OUTPUT_FILE_SUFFIX_LIST)}"
+        )
+    return key_list
+
+
+def get_per_pattern_filter(pattern_list: List[str]) -> Callable[[str], bool]:
+    """
+    The previous approach, one search per pattern until a match
+    :param pattern_list:
+    :return:
+    """
+    compiled_pattern_list = list(map(re.compile, pattern_list))
+
+    def _key_filter(key: str) -> bool:
+        for compiled_pattern_iter_ in compiled_pattern_list:
+            if compiled_pattern_iter_.search(key):
+                return True
+        return False
+
+    return _key_filter
+
+
+def benchmark_filter(
+        name: str,
+        key_filter: Callable[[str], bool],
+        key_list: List[str],
+        num_repeats: int,
+) -> Dict[str, Any]:
+    start_time = perf_counter()
+    for _ in range(num_repeats):
+        matching_key_list = list(filter(key_filter, key_list))
+    duration_seconds = (perf_counter() - start_time) / num_repeats
+
+    return {
+        "filter": name,
+        "seconds": round(duration_seconds, 4),
+        "numKeys": len(key_list),
+        "numMatches": len(matching_key_list),
+        "matchingKeyList": matching_key_list,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the workflow file filters")
+    parser.add_argument("--workflow-name", default="umccrise")
+    parser.add_argument("--num-files", type=int, default=50000)
+    parser.add_argument("--num-repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    patterns_by_workflow_name = load_patterns_by_workflow_name()
+    if args.workflow_name not in patterns_by_workflow_name:
+        print(
+            f"Unknown workflow name {args.workflow_name}, expected one of {list(patterns_by_workflow_name.keys())}",
+            file=sys.stderr
+        )
+        sys.exit(1)
+    pattern_list = patterns_by_workflow_name[args.workflow_name]
+
+    random.seed(args.seed)
+    key_list = build_key_list(args.num_files)
+
+    results_list = [
+        benchmark_filter(
+            "per-pattern",
+            get_per_pattern_filter(pattern_list),
+            key_list,
+            args.num_repeats,
+        ),
+        benchmark_filter(
+            "compiled",
+            compile_file_filter(pattern_list),
+            key_list,
+            args.num_repeats,
+        ),
+    ]
+
+    if results_list[0]['matchingKeyList'] != results_list[1]['matchingKeyList']:
+        print("Compiled filter does not select the same keys as the per-pattern filter", file=sys.stderr)
+        sys.exit(1)
+
+    columns = ["filter", "seconds", "numKeys", "numMatches", "speedup"]
+    print("\t".join(columns))
+    for result_iter_ in results_list:
+        result_iter_['speedup'] = round(results_list[0]['seconds'] / result_iter_['seconds'], 1)
+        print("\t".join(map(lambda column_iter_: str(result_iter_[column_iter_]), columns)))
+
+
+if __name__ == "__main__":
+    main()
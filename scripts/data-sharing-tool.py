@@ -108,6 +108,7 @@ class PushJobRequestResponseDict(TypedDict):
     startTime: str
     packageId: str
     shareDestination: str
+    deltaPush: bool
     logUri: str
     endTime: Optional[str]
     errorMessage: Optional[str]
@@ -332,11 +333,12 @@ def get_package_report(package_id: str) -> str:
     return response.text
 
 
-def push_package(package_id: str, location_uri: str) -> str:
+def push_package(package_id: str, location_uri: str, delta_push: bool = False) -> str:
     response = requests.post(
         headers=get_default_post_headers(),
         json={
             "shareDestination": location_uri,
+            "deltaPush": delta_push,
         },
         url=f"{get_base_api()}/api/v1/package/{package_id}:push"
     )
@@ -695,6 +697,7 @@ class PushPackageSubCommand(Command):
         data-sharing-tool push-package --help
         data-sharing-tool push-package (--package-id=<package_id>)
                                        (--share-location=<share_location>)
+                                       [--delta]
                                        [--wait]
 
     Description:
@@ -704,6 +707,8 @@ class PushPackageSubCommand(Command):
     Options:
       --package-id=<package_id>              The package id to push
       --share-location=<share_location>      The location to push the package to
+      --delta                                Only push the files that are missing or have changed at the destination,
+                                             i.e. when re-pushing a package, or retrying a failed push (s3 destinations only)
       --wait                                 Don't terminate the command until the push job is complete
 
       --help                                 Show this help message and exit
@@ -713,6 +718,7 @@ class PushPackageSubCommand(Command):
 
     Example:
         data-sharing-tool push-package --package-id 'pkg.12345678910' --share-location s3://bucket/path/to/dest/prefix/
+        data-sharing-tool push-package --package-id 'pkg.12345678910' --share-location s3://bucket/path/to/dest/prefix/ --delta
     """
 
     def __init__(self, command_argv):
@@ -720,12 +726,14 @@ class PushPackageSubCommand(Command):
         # Import args
         self.package_id = self.cli_args['--package-id']
         self.share_location = self.cli_args['--share-location']
+        self.delta_push = self.cli_args['--delta']
         self.wait = self.cli_args['--wait']
 
         # Generate the package report presigned url
         push_job_id = push_package(
             package_id=self.package_id,
-            location_uri=self.share_location
+            location_uri=self.share_location,
+            delta_push=self.delta_push
         )
 
         if self.wait:
@@ -0,0 +1,38 @@
+import * as fs from 'fs';
+import * as path from 'path';
+
+/*
+The content codec is shipped both in the data sharing tools layer and in the report image,
+the report image cannot import from the layer, so we keep a copy and check the two never drift apart
+*/
+
+const APP_DIR = path.join(__dirname, '..', 'app');
+
+const LAYER_CONTENT_CODEC_PATH = path.join(
+  APP_DIR,
+  'layers',
+  'data_sharing_tools_layer',
+  'src',
+  'data_sharing_tools',
+  'utils',
+  'content_codec.py'
+);
+
+const REPORT_CONTENT_CODEC_PATH = path.join(
+  APP_DIR,
+  'ecs',
+  'tasks',
+  'generate_data_summary_report',
+  'data_summary_reporting_tools',
+  'src',
+  'data_summary_reporting_tools',
+  'content_codec.py'
+);
+
+describe('content-codec', () => {
+  test(`report image content codec matches the data sharing tools layer`, () => {
+    expect(fs.readFileSync(REPORT_CONTENT_CODEC_PATH, 'utf-8')).toEqual(
+      fs.readFileSync(LAYER_CONTENT_CODEC_PATH, 'utf-8')
+    );
+  });
+});